@@ -2,7 +2,16 @@
 
 import streamlit as st
 import json
+import uuid
 from vanna_lgx.core.graph import build_s5_graph # Import our final agent graph
+from vanna_lgx.core.resources import get_resources
+from vanna_lgx.config import WARM_UP_IN_BACKGROUND, SESSIONS_ENABLED, RESULT_PAGE_ROWS
+from vanna_lgx.utils.cancellation import CancelToken, cancellable
+from vanna_lgx.utils.db_utils import get_pool
+from vanna_lgx.utils.instrumentation import record_run
+from vanna_lgx.utils.query_executor import ResultHandle
+from vanna_lgx.utils.result_store import EXPORT_FORMATS
+from vanna_lgx.utils.sessions import SessionCheckpointer, session_config
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -26,14 +35,129 @@ Enter a question below and watch the agent's reasoning process unfold in real-ti
 @st.cache_resource
 def get_agent_app():
     print("--- Initializing Vanna-LGX Agent ---")
-    return build_s5_graph()
+    # Clients and collections are built lazily; warm them up so the first question does not pay for it
+    get_resources().warm_up(background=WARM_UP_IN_BACKGROUND)
+    # One checkpointer for all browser sessions; each holds its conversation under its own thread id
+    return build_s5_graph(SessionCheckpointer() if SESSIONS_ENABLED else None)
 
 app = get_agent_app()
 
+# --- Conversation ---
+# Every question is the next turn of this browser session's conversation, so follow-ups
+# ("now only for London") refine the previous answer instead of starting over.
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+    st.session_state.turns = []
+session = session_config(st.session_state.session_id) if app.checkpointer is not None else None
+
+def close_result():
+    """
+    Removes the spooled result and exports of the last answer. The session checkpointer still
+    references its handle, so it would not be garbage collected (and its spool not removed) yet.
+    """
+    if (handle := st.session_state.get("result_handle")) is not None:
+        handle.close()
+    st.session_state.result_handle = None
+    st.session_state.result_exports = {}
+
+with st.sidebar:
+    st.subheader("Conversation")
+    for number, asked in enumerate(st.session_state.turns, 1):
+        st.caption(f"{number}. {asked}")
+    if st.button("New conversation"):
+        if app.checkpointer is not None:
+            app.checkpointer.delete_thread(st.session_state.session_id)
+        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.turns = []
+        st.session_state.last_answer = None
+        close_result()
+        st.rerun()
+
+def render_summary(node_output):
+    """ Renders the text summary as soon as it arrives. """
+    with summary_placeholder.container():
+        st.markdown(node_output['summary'])
+
+def render_chart(node_output):
+    """ Renders the optional chart as soon as it arrives, independently of the summary. """
+    if vis_spec := node_output.get('visualization_spec'):
+        with chart_placeholder.container():
+            st.markdown("---")
+            st.subheader("Visualization")
+            try:
+                st.vega_lite_chart(vis_spec, use_container_width=True)
+            except Exception as e:
+                st.error(f"Failed to render chart: {e}")
+                st.json(vis_spec)
+
+def render_result_table():
+    """
+    Shows the complete result of the last answer one page at a time. Rows are fetched into
+    Arrow segments only as far as the viewed page, and exports stream from the segments to a
+    file, so large results never have to be held by the page (or the process) at once.
+    """
+    handle = st.session_state.get("result_handle")
+    if handle is None:
+        return
+    st.markdown("---")
+    st.subheader("Result")
+    number = st.session_state.get("result_page", 1)
+    try:
+        result = handle.arrow()
+        page = result.page(number - 1, RESULT_PAGE_ROWS)
+        total = result.num_rows
+        pages = max(1, -(-total // RESULT_PAGE_ROWS)) if total is not None else None
+        if pages is not None and number > pages:
+            # The end of the result was only found while fetching this page
+            number = st.session_state.result_page = pages
+            page = result.page(number - 1, RESULT_PAGE_ROWS)
+    except Exception as e:
+        st.error(f"Failed to fetch the result: {e}")
+        return
+    first = (number - 1) * RESULT_PAGE_ROWS
+    page.index = range(first + 1, first + len(page) + 1)
+    st.dataframe(page, use_container_width=True)
+    st.number_input("Page", min_value=1, max_value=pages, step=1, key="result_page")
+    st.caption(f"Rows {first + 1 if len(page) else first}-{first + len(page)} of "
+               f"{total if total is not None else f'at least {result.rows_fetched}'}.")
+
+    exports = st.session_state.setdefault("result_exports", {})
+    for column, (file_format, (extension, mime)) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        with column:
+            if file_format not in exports and st.button(f"Export {file_format}", key=f"export_{file_format}"):
+                try:
+                    with st.spinner(f"Writing the complete result as {file_format}..."):
+                        exports[file_format] = result.export(file_format=file_format)
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+            if file_format in exports:
+                with open(exports[file_format], "rb") as f:
+                    st.download_button(f"Download {file_format}", f, file_name=f"result{extension}", mime=mime,
+                                       key=f"download_{file_format}")
+
 # Get user input from a text box
 user_question = st.text_input("Ask a question about your database:", placeholder="e.g., how many ont per vendor?")
 
-if user_question:
+# Keys of the final state kept to redraw the last answer
+ANSWER_KEYS = ("sql_query", "summary", "visualization_spec")
+last_answer = st.session_state.get("last_answer")
+
+if user_question and last_answer is not None and last_answer["question"] == user_question:
+    # A rerun of the page (e.g. after a widget click) shows the last answer instead of asking it again,
+    # whether or not conversation sessions are enabled
+    last_turn = last_answer["state"]
+    st.subheader("Final Answer")
+    if sql := last_turn.get('sql_query'):
+        st.code(sql, language="sql")
+    st.markdown(last_turn.get('summary') or "")
+    if vis_spec := last_turn.get('visualization_spec'):
+        st.vega_lite_chart(vis_spec, use_container_width=True)
+    render_result_table()
+
+elif user_question:
+    st.session_state.turns.append(user_question)
+    st.session_state.result_page = 1
+    close_result()
     st.subheader("Agent's Thought Process")
     
     # --- THIS IS THE FIX ---
@@ -49,7 +173,9 @@ if user_question:
         sql_placeholder = st.empty()
     
     st.subheader("Final Answer")
-    final_result_container = st.container()
+    # Summary and chart are produced by parallel branches; whichever finishes first is shown first.
+    summary_placeholder = st.empty()
+    chart_placeholder = st.empty()
 
     # The initial state for the graph
     inputs = {
@@ -63,15 +189,71 @@ if user_question:
     judge_placeholder.info("Waiting for previous Agent...")
     sql_placeholder.info("Waiting for previous Agent...")
     
+    # Partial LLM output per node, rendered into the node's placeholder as tokens arrive
+    partial_outputs, ttft_by_node = {}, {}
+    run_metrics, repair_attempts = [], 0
+    result_handle, final_state = None, {}
+
+    def render_token_event(event):
+        node = event["node"]
+        if event.get("done"):
+            ttft_by_node[node] = event["ttft_ms"]
+            partial_outputs.pop(node, None)
+            return
+        text = partial_outputs[node] = partial_outputs.get(node, "") + event["token"]
+        if node == "query_rewriter":
+            rewriter_placeholder.markdown(f"**Rewriting question...**\n\n{text}▌")
+        elif node == "synthesize_sql":
+            sql_placeholder.code(text, language="sql")
+        elif node == "summarize_result":
+            summary_placeholder.markdown(text + "▌")
+
+    cancel = CancelToken()
     try:
         with st.spinner("The agent is thinking... This may take a moment."):
             # --- LangGraph Streaming ---
-            for event in app.stream(inputs):
+            for mode, event in app.stream(inputs, cancellable(session, cancel), stream_mode=["updates", "custom"]):
+                if mode == "custom":
+                    render_token_event(event)
+                    continue
                 node_name = list(event.keys())[0]
                 node_output = event[node_name]
+                run_metrics.extend(node_output.get("metrics", []))
+                repair_attempts = node_output.get("repair_attempts", repair_attempts)
+                result_handle = node_output.get("result_handle") or result_handle
+                final_state.update({key: node_output[key] for key in ANSWER_KEYS if key in node_output})
 
                 # Update the UI with the output from each node
-                if node_name == "query_rewriter":
+                if node_name == "start_turn":
+                    if node_output.get("follow_up"):
+                        st.info(f"Follow-up to: \"{node_output['previous_turn']['question']}\"")
+                        rewriter_placeholder.info("Skipped: refining the previous turn's SQL.")
+
+                elif node_name == "reuse_context":
+                    retriever_placeholder.info("Skipped: reusing the previous turn's context.")
+                    with judge_placeholder.container():
+                        clean_context = node_output.get('clean_context', {})
+                        st.markdown(f"**Reused {len(clean_context.get('ddl', []))} DDLs, {len(clean_context.get('examples', []))} examples, "
+                                    f"and {len(clean_context.get('docs', []))} docs from the previous turn.**")
+                    sql_placeholder.info("Refining the previous SQL...")
+
+                elif node_name == "answer_cache_lookup":
+                    if node_output.get("cache_hit"):
+                        st.success(f"Answer served from cache (similarity {node_output['cache_similarity']:.3f}, "
+                                   f"matched question: \"{node_output['cached_question']}\").")
+                        for placeholder in (rewriter_placeholder, retriever_placeholder, judge_placeholder):
+                            placeholder.info("Skipped: answer served from cache.")
+                        with sql_placeholder.container():
+                            st.markdown("**Cached SQL Query:**")
+                            st.code(node_output.get('sql_query', ''), language="sql")
+                        render_summary(node_output)
+                        render_chart(node_output)
+                        # Cached answers carry no handle; the SQL is re-run only if the result is paged or exported
+                        result_handle = ResultHandle(node_output['sql_query'])
+                    else:
+                        st.caption("Answer cache miss - running the full agent.")
+
+                elif node_name == "query_rewriter":
                     with rewriter_placeholder.container():
                         st.markdown("**Original Question:**")
                         st.info(node_output['question'])
@@ -84,6 +266,10 @@ if user_question:
                         st.markdown(f"**Retrieved {len(node_output['db_schema'].split('CREATE TABLE')) - 1} DDLs, {len(node_output['retrieved_examples'])} examples, and {len(node_output['retrieved_docs'])} docs.**")
                         with st.popover("View Retrieved DDL"):
                             st.code(node_output['db_schema'], language="sql")
+                        for table, pruning in (node_output.get('schema_pruning') or {}).items():
+                            st.caption(f"{table}: {len(pruning['kept_columns'])} of {pruning['total_columns']} columns sent to the model.")
+                        if timings := node_output.get('retrieval_timings'):
+                            st.caption("Retrieval latency: " + ", ".join(f"{label} {ms:.0f} ms" for label, ms in timings.items()))
                     judge_placeholder.info("Judging the retrieved context...")
 
                 elif node_name == "rerank_and_judge":
@@ -93,6 +279,9 @@ if user_question:
                         ex_count = len(clean_context.get('examples', []))
                         doc_count = len(clean_context.get('docs', []))
                         st.markdown(f"**Judge decided to keep {ddl_count} DDLs, {ex_count} examples, and {doc_count} docs.**")
+                        if rerank := node_output.get('rerank'):
+                            st.caption(f"Reranked {rerank['candidates']} candidates locally; "
+                                       f"{rerank['judged']} ambiguous (LLM judge: {rerank['judge']}).")
                         if node_output.get("error"):
                             st.error(f"Judge Error: {node_output['error']}")
                     sql_placeholder.info("Synthesizing SQL from clean context...")
@@ -102,23 +291,69 @@ if user_question:
                         if sql := node_output.get('sql_query'):
                             st.markdown("**Final SQL Query:**")
                             st.code(sql, language="sql")
+                        if packing := node_output.get('context_packing'):
+                            st.caption(f"Prompt context: {packing['used_tokens']}/{packing['budget']} tokens, "
+                                       f"{len(packing['truncated'])} truncated, {len(packing['dropped'])} dropped.")
                         if error := node_output.get('error'):
                             st.error(error)
                         if error := node_output.get('validation_error'):
                             st.warning(f"SQL Validation Error: {error} - Attempting to repair.")
+                            for issue in node_output.get('validation_issues') or []:
+                                if issue['suggestions']:
+                                    st.markdown(f"- `{issue['reference']}`: did you mean {', '.join(issue['suggestions'])}?")
                 
-                # The final state is in the last node's output
-                elif node_name == "summarize_and_visualize":
-                    with final_result_container:
-                        st.markdown(node_output['summary'])
-                        if vis_spec := node_output.get('visualization_spec'):
-                            st.markdown("---")
-                            st.subheader("Visualization")
-                            try:
-                                st.vega_lite_chart(vis_spec, use_container_width=True)
-                            except Exception as e:
-                                st.error(f"Failed to render chart: {e}")
-                                st.json(vis_spec)
+                # The final answer arrives from two parallel branches
+                elif node_name == "summarize_result":
+                    render_summary(node_output)
+
+                elif node_name == "visualize_result":
+                    render_chart(node_output)
+        st.session_state.last_answer = {"question": user_question, "state": final_state}
 
     except Exception as e:
+        cancel.cancel()
         st.error(f"An unexpected error occurred during the agent run: {e}")
+    except BaseException:
+        cancel.cancel()  # Streamlit stops the script for a rerun; the run's sync nodes must stop with it
+        raise
+
+    st.session_state.result_handle = result_handle
+    render_result_table()
+
+    if run_metrics:
+        run_summary = record_run(run_metrics, user_question, repair_attempts)
+        with st.expander("⏱️ Instrumentation: where the time went", expanded=False):
+            st.markdown(f"**{run_summary['node_ms'] / 1000:.2f}s in nodes, {run_summary['llm_calls']} LLM calls, "
+                        f"{run_summary['prompt_tokens']} prompt / {run_summary['completion_tokens']} completion tokens, "
+                        f"{run_summary['repair_attempts']} repair attempt(s).**")
+            st.dataframe(
+                [{"node": node, **stats} for node, stats in sorted(run_summary["nodes"].items(), key=lambda item: -item[1]["ms"])],
+                use_container_width=True,
+            )
+            st.markdown("**External calls**")
+            st.dataframe(
+                [{"node": record["node"], **call} for record in run_metrics for call in record["calls"]],
+                use_container_width=True,
+            )
+            st.caption(f"Run id {run_summary['run_id']}.")
+
+    if ttft_by_node:
+        st.caption("Time to first token: " + ", ".join(f"{node} {ms:.0f} ms" for node, ms in ttft_by_node.items()))
+    if (answer_cache := get_resources().answer_cache) is not None:
+        stats = answer_cache.stats()
+        st.caption(f"Answer cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+    if (result_cache := get_resources().result_cache) is not None:
+        stats = result_cache.stats()
+        st.caption(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries, "
+                   f"{stats['bytes'] / 2**20:.1f} MiB.")
+    if (sql_templates := get_resources().sql_templates) is not None:
+        stats = sql_templates.stats()
+        st.caption(f"SQL templates: {stats['matches']} matches, {stats['misses']} misses, "
+                   f"{stats['templates']} from examples, {stats['learned']} learned.")
+    if app.checkpointer is not None:
+        stats = app.checkpointer.stats()
+        st.caption(f"Sessions: {stats['sessions']} held, {stats['bytes'] / 2**20:.1f} MiB, "
+                   f"{stats['evictions']} evicted, {stats['expirations']} expired.")
+    pool = get_pool().stats()
+    st.caption(f"DB pool: {pool['in_use']}/{pool['max_size']} in use, {pool['idle']} idle, "
+               f"{pool['waits']} waits, healthy={pool['healthy']}.")
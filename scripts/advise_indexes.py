@@ -0,0 +1,88 @@
+# scripts/advise_indexes.py
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from vanna_lgx.config import DB_PATH, SQL_WORKLOAD_LOG_PATH, INDEX_ADVISOR_MAX_COLUMNS
+from vanna_lgx.utils.db_utils import get_readonly_connection
+from vanna_lgx.utils.index_advisor import load_workload, advise, create_indexes, query_plan
+
+
+def schema_info(conn: sqlite3.Connection) -> dict:
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")]
+    return {table: {row[1] for row in conn.execute(f'PRAGMA table_info("{table}");')} for table in tables}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proposes (and optionally builds) indexes for the SQL the agent has executed.")
+    parser.add_argument("--log", default=SQL_WORKLOAD_LOG_PATH, help="Workload log written by execute_sql.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--days", type=float, help="Only consider statements logged in the last N days.")
+    parser.add_argument("--top", type=int, default=5, help="Number of proposals shown (and built with --apply).")
+    parser.add_argument("--min-benefit-ms", type=float, default=0.0,
+                        help="Skip proposals whose statements took less than this in total.")
+    parser.add_argument("--max-columns", type=int, default=INDEX_ADVISOR_MAX_COLUMNS)
+    parser.add_argument("--apply", action="store_true", help="Build the proposed indexes and run ANALYZE.")
+    parser.add_argument("--yes", "-y", action="store_true", help="Skip the confirmation prompt of --apply.")
+    parser.add_argument("--output", help="Write the proposals as JSON to this file.")
+    args = parser.parse_args()
+
+    print("🛠️  Vanna-LGX Index Advisor")
+    print("---------------------------")
+    since = time.time() - args.days * 86400 if args.days else None
+    workload = load_workload(args.log, since)
+    if not workload:
+        sys.exit(f"No statements logged in {args.log}; run some questions first.")
+    print(f"   - {len(workload)} distinct statements, {sum(e['count'] for e in workload)} executions, "
+          f"{sum(e['total_ms'] for e in workload) / 1000:.1f}s in total.")
+
+    conn = get_readonly_connection(args.db)
+    try:
+        proposals = advise(workload, conn, schema_info(conn), args.max_columns)
+    finally:
+        conn.close()
+    proposals = [p for p in proposals if p["estimated_benefit_ms"] >= args.min_benefit_ms][:args.top]
+    if not proposals:
+        print("\n✅ No table scans an index would remove.")
+        return
+
+    print()
+    for rank, p in enumerate(proposals, 1):
+        print(f"{rank}. {p['table']}({', '.join(p['columns'])}){' covering' if p['covering'] else ''}: "
+              f"~{p['estimated_benefit_ms']:.0f} ms over {p['executions']} executions of {p['statements']} statement(s)")
+        print(f"   {p['sql']}")
+        for example in p["examples"]:
+            print(f"     e.g. {' '.join(example.split())[:110]}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(proposals, f, indent=2)
+        print(f"\n   - Proposals written to {args.output}")
+
+    if not args.apply:
+        print("\nRe-run with --apply to build them.")
+        return
+    if not args.yes:
+        confirm = input(f"\nThis will build {len(proposals)} index(es) on {args.db}, which locks it for writing while it runs.\nContinue? (yes/no): ")
+        if confirm.lower() != 'yes':
+            print("Aborted by user."); return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        for built in create_indexes(proposals, conn):
+            print(f"   - Built {built['name']} in {built['seconds']:.2f}s")
+        for p in proposals:
+            for example in p["examples"][:1]:
+                print(f"   - Plan now: {'; '.join(query_plan(example, conn))}")
+    finally:
+        conn.close()
+    print("\n✅ Indexes built. Cached results and answers are invalidated by the database change.")
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
@@ -0,0 +1,234 @@
+# scripts/benchmark_pipeline.py
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vanna_lgx.config import SYNTHESIS_MODEL, EMBEDDING_MODEL
+from vanna_lgx.core.graph import build_s5_graph
+from vanna_lgx.core.resources import AgentResources, set_resources
+from vanna_lgx.utils.cancellation import CancelToken, cancellable
+from vanna_lgx.utils.db_utils import get_readonly_connection
+from vanna_lgx.utils.instrumentation import record_run
+from vanna_lgx.utils.query_executor import execute_bounded
+
+# --- Configuration ---
+QUESTIONS_PATH = "knowledge/benchmarks/questions.jsonl"
+SQL_EXAMPLES_PATH = "knowledge/sql_examples/examples.json"
+PERCENTILES = (50, 95, 99)
+FLOAT_DIGITS = 6
+
+
+def seed_questions(path: str):
+    """Writes a question set (JSONL with gold SQL) from the curated SQL examples."""
+    with open(SQL_EXAMPLES_PATH, "r") as f:
+        examples = json.load(f)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        for i, ex in enumerate(examples):
+            f.write(json.dumps({"id": f"example_{i}", "question": ex["question"], "gold_sql": ex["sql"]}) + "\n")
+    print(f"   - Wrote {len(examples)} questions to {path}")
+
+
+def load_questions(path: str, limit: Optional[int] = None) -> List[Dict]:
+    with open(path, "r") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    for i, q in enumerate(questions):
+        q.setdefault("id", f"q{i}")
+    return questions[:limit] if limit else questions
+
+
+def _normalize_rows(df, ordered: bool) -> List[tuple]:
+    """Rows as comparable tuples: column names are ignored and floats rounded."""
+    rows = [
+        tuple(round(v, FLOAT_DIGITS) if isinstance(v, float) else v for v in row)
+        for row in df.itertuples(index=False, name=None)
+    ]
+    return rows if ordered else sorted(rows, key=repr)
+
+
+def execution_match(predicted_df, gold_sql: str, conn) -> Optional[bool]:
+    """
+    True when the predicted result equals the gold query's result (as a multiset of rows,
+    or as a sequence when the gold query has an ORDER BY). None if the gold SQL fails.
+    """
+    try:
+        gold_df, _ = execute_bounded(gold_sql, conn)
+    except Exception:
+        return None
+    if predicted_df is None:
+        return False
+    ordered = "order by" in gold_sql.lower()
+    return _normalize_rows(predicted_df, ordered) == _normalize_rows(gold_df, ordered)
+
+
+def run_question(app, item: Dict) -> Dict:
+    start = time.perf_counter()
+    try:
+        state = app.invoke({"question": item["question"], "repair_attempts": 0}, config=cancellable(None, CancelToken()))
+        error = state.get("error") or state.get("validation_error")
+    except Exception as e:
+        state, error = {}, f"{type(e).__name__}: {e}"
+    total_ms = (time.perf_counter() - start) * 1000
+    # Node latencies and LLM calls come from the graph's own instrumentation (the state's `metrics`)
+    run = record_run(state.get("metrics", []), item["question"], state.get("repair_attempts", 0))
+
+    conn = get_readonly_connection()
+    try:
+        match = execution_match(state.get("result"), item["gold_sql"], conn) if item.get("gold_sql") else None
+    finally:
+        conn.close()
+
+    return {
+        "id": item["id"],
+        "question": item["question"],
+        "sql_query": state.get("sql_query"),
+        "execution_match": match,
+        "error": error,
+        "repair_attempts": state.get("repair_attempts", 0),
+        "cache_hit": bool(state.get("cache_hit")),
+        "total_ms": round(total_ms, 2),
+        "run_id": run["run_id"],
+        "node_ms": {node: round(stats["ms"], 2) for node, stats in run["nodes"].items()},
+        "llm_calls": {node: stats["llm_calls"] for node, stats in run["nodes"].items() if stats["llm_calls"]},
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+
+
+def summarize(records: List[Dict], wall_seconds: float) -> Dict:
+    scored = [r for r in records if r["execution_match"] is not None]
+    node_values = defaultdict(list)
+    llm_calls = Counter()
+    for r in records:
+        for node, ms in r["node_ms"].items():
+            node_values[node].append(ms)
+        llm_calls.update(r["llm_calls"])
+    return {
+        "questions": len(records),
+        "execution_match_accuracy": round(sum(r["execution_match"] for r in scored) / len(scored), 4) if scored else None,
+        "scored_questions": len(scored),
+        "error_rate": round(sum(1 for r in records if r["error"]) / len(records), 4),
+        "repair_loop_rate": round(sum(1 for r in records if r["repair_attempts"] > 0) / len(records), 4),
+        "mean_repair_attempts": round(sum(r["repair_attempts"] for r in records) / len(records), 4),
+        "latency_ms": {
+            "end_to_end": _percentiles([r["total_ms"] for r in records]),
+            "nodes": {node: _percentiles(values) for node, values in sorted(node_values.items())},
+        },
+        "llm_calls": {"total": sum(llm_calls.values()), "per_question": round(sum(llm_calls.values()) / len(records), 2),
+                      "by_node": dict(sorted(llm_calls.items()))},
+        "throughput_qps": round(len(records) / wall_seconds, 3) if wall_seconds else None,
+    }
+
+
+def _flatten(d: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path: str, summary: Dict):
+    """Prints every summary metric next to the baseline report's value."""
+    with open(baseline_path, "r") as f:
+        baseline = _flatten(json.load(f)["summary"])
+    current = _flatten(summary)
+    print(f"\n📊 Compared to {baseline_path}:")
+    for key in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(key), current.get(key)
+        delta = f"{new - old:+.4g}" if old is not None and new is not None else "n/a"
+        print(f"   - {key}: {old} -> {new} ({delta})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the text-to-SQL graph over a question set and reports accuracy and latency.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="JSONL file with {id, question, gold_sql} per line.")
+    parser.add_argument("--seed", action="store_true", help=f"(Re)write the question set from {SQL_EXAMPLES_PATH} first.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of questions run concurrently.")
+    parser.add_argument("--limit", type=int, help="Only run the first N questions.")
+    parser.add_argument("--use-answer-cache", action="store_true",
+                        help="Keep the answer cache on (off by default so every question runs the full pipeline).")
+    parser.add_argument("--use-result-cache", action="store_true",
+                        help="Keep the SQL result cache on (off by default so every query is executed).")
+    parser.add_argument("--use-sql-templates", action="store_true",
+                        help="Keep the SQL templates on (off by default: the question set is seeded from the examples they are built from).")
+    parser.add_argument("--output", help="Write the JSON report (summary plus per-question records) to this file.")
+    parser.add_argument("--compare", help="A previous JSON report to print metric deltas against.")
+    args = parser.parse_args()
+
+    print("🚀 Vanna-LGX Pipeline Benchmark")
+    print("-------------------------------")
+    if args.seed or not os.path.exists(args.questions):
+        seed_questions(args.questions)
+    questions = load_questions(args.questions, args.limit)
+
+    overrides = {}
+    if not args.use_answer_cache:
+        overrides["answer_cache"] = None
+    if not args.use_result_cache:
+        overrides["result_cache"] = None
+    if not args.use_sql_templates:
+        overrides["sql_templates"] = None
+    if overrides:
+        set_resources(AgentResources(**overrides))
+    app = build_s5_graph()
+
+    print(f"   - Running {len(questions)} questions with {args.workers} worker(s)...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        records = list(pool.map(lambda item: run_question(app, item), questions))
+    wall_seconds = time.perf_counter() - start
+
+    for r in records:
+        status = {True: "✅", False: "❌", None: "➖"}[r["execution_match"]]
+        print(f"   {status} {r['id']}: {r['total_ms']:.0f} ms, {r['repair_attempts']} repair(s)"
+              + (f", error: {r['error']}" if r["error"] else ""))
+
+    summary = summarize(records, wall_seconds)
+    report = {
+        "meta": {
+            "questions_path": args.questions,
+            "workers": args.workers,
+            "answer_cache": args.use_answer_cache,
+            "result_cache": args.use_result_cache,
+            "sql_templates": args.use_sql_templates,
+            "synthesis_model": SYNTHESIS_MODEL,
+            "embedding_model": EMBEDDING_MODEL,
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - wall_seconds)),
+            "wall_seconds": round(wall_seconds, 3),
+        },
+        "summary": summary,
+        "records": records,
+    }
+    print("\n✅ Summary:")
+    print(json.dumps(summary, indent=2, sort_keys=True))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True, default=str)
+        print(f"\n   - Report written to {args.output}")
+    if args.compare:
+        compare(args.compare, summary)
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
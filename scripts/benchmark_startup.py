@@ -0,0 +1,69 @@
+# scripts/benchmark_startup.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so that every measurement is a true cold start.
+CHILD_CODE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import vanna_lgx.core.nodes
+t1 = time.perf_counter()
+from vanna_lgx.core.graph import build_s5_graph
+from vanna_lgx.core.resources import get_resources
+app = build_s5_graph()
+t2 = time.perf_counter()
+timings = {"import_nodes_s": t1 - t0, "build_graph_s": t2 - t1}
+if sys.argv[1] == "warm":
+    get_resources().warm_up(background=False)
+    timings["warm_up_s"] = time.perf_counter() - t2
+if sys.argv[2]:
+    t3 = time.perf_counter()
+    app.invoke({"question": sys.argv[2], "repair_attempts": 0})
+    timings["first_answer_s"] = time.perf_counter() - t3
+timings["total_s"] = time.perf_counter() - t0
+print("BENCHMARK_RESULT " + json.dumps(timings))
+"""
+
+
+def run_once(question: str, warm: bool) -> dict:
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [project_root, os.environ.get("PYTHONPATH")]))}
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, "warm" if warm else "cold", question],
+        capture_output=True, text=True, env=env,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCHMARK_RESULT "):
+            return json.loads(line[len("BENCHMARK_RESULT "):])
+    raise RuntimeError(f"Benchmark run failed:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures Vanna-LGX import time and time to first answer.")
+    parser.add_argument("--question", default="how many ont per vendor?",
+                        help="Question used for the time-to-first-answer measurement.")
+    parser.add_argument("--no-answer", action="store_true", help="Only measure import and graph build time.")
+    parser.add_argument("--warm-up", action="store_true", help="Run a blocking warm-up before the first question.")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print("🚀 Vanna-LGX Startup Benchmark")
+    print("------------------------------")
+    runs = []
+    for i in range(args.runs):
+        result = run_once("" if args.no_answer else args.question, args.warm_up)
+        runs.append(result)
+        print(f"   - Run {i + 1}: " + ", ".join(f"{k}={v:.3f}" for k, v in result.items()))
+
+    summary = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    print("\n✅ Median over runs:")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# scripts/benchmark_vector_store.py
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+# Each backend is measured in a fresh interpreter, so import cost and memory are its own.
+CHILD_CODE = r"""
+import json, resource, sys, time
+import numpy as np
+
+def rss_mb(field="VmRSS"):
+    # /proc gives this process' own values; ru_maxrss would include the parent's peak on Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+backend, path, queries_path = sys.argv[1], sys.argv[2], sys.argv[3]
+requests = json.loads(sys.argv[4])
+queries = np.load(queries_path).tolist()
+rss_start = rss_mb()
+t0 = time.perf_counter()
+from vanna_lgx.utils.vector_store import open_vector_store
+from vanna_lgx.utils.retrieval import query_collections
+store = open_vector_store(backend, path)
+collections = {name: (store.get_collection(name), k) for name, k in requests.items()}
+open_ms = (time.perf_counter() - t0) * 1000
+query_collections(queries[0], collections)  # First query: loads indexes / maps the matrices
+first_ms = (time.perf_counter() - t0) * 1000 - open_ms
+latencies, top_ids = [], []
+for query in queries:
+    start = time.perf_counter()
+    results, _ = query_collections(query, collections)
+    latencies.append((time.perf_counter() - start) * 1000)
+    top_ids.append({name: results[name]["ids"][0] for name in requests})
+print("BENCHMARK_RESULT " + json.dumps({
+    "import_and_open_ms": open_ms, "first_query_ms": first_ms, "latencies_ms": latencies,
+    "peak_rss_mb": rss_mb("VmHWM"), "rss_growth_mb": rss_mb() - rss_start, "top_ids": top_ids,
+}))
+"""
+
+# The per-question retrieval of `retrieve_context`
+DEFAULT_REQUESTS = {"ddl": 3, "sql_examples": 3, "docs": 3, "columns": 15}
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def prepare_stores(source_backend: str, workdir: str, names, synthetic: int, seed: int):
+    """Copies the knowledge base into fresh Chroma and NumPy stores, padded with `synthetic` random entries per collection."""
+    from vanna_lgx.utils.vector_store import open_vector_store, copy_collections
+    source = open_vector_store(source_backend)
+    paths = {"chroma": os.path.join(workdir, "chroma"), "numpy": os.path.join(workdir, "vector_index")}
+    dim = None
+    for backend, path in paths.items():
+        target = open_vector_store(backend, path)
+        copy_collections(source, target, names)
+        for name in names:
+            collection = target.get_collection(name)
+            vectors = collection.get(include=["embeddings"])["embeddings"]
+            if len(vectors):
+                dim = dim or len(vectors[0])
+            if synthetic:
+                padding = np.random.default_rng(seed + len(name)).normal(size=(synthetic, dim)).astype(np.float32)
+                for start in range(0, synthetic, 500):
+                    chunk = padding[start:start + 500]
+                    collection.upsert(ids=[f"synthetic_{start + i}" for i in range(len(chunk))], embeddings=chunk.tolist(),
+                                      documents=["synthetic"] * len(chunk), metadatas=[{"synthetic": True}] * len(chunk))
+    return paths, dim
+
+
+def run_backend(backend: str, path: str, queries_path: str, requests) -> dict:
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [project_root, os.environ.get("PYTHONPATH")]))}
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, backend, path, queries_path, json.dumps(requests)],
+        capture_output=True, text=True, env=env,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCHMARK_RESULT "):
+            return json.loads(line[len("BENCHMARK_RESULT "):])
+    raise RuntimeError(f"Benchmark run for {backend} failed:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares query latency and memory of the Chroma and NumPy vector stores.")
+    parser.add_argument("--source", choices=["chroma", "numpy"], default=None,
+                        help="Store holding the knowledge base to copy (defaults to VECTOR_STORE_BACKEND).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Random entries added to every collection, to measure larger knowledge bases.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    from vanna_lgx.config import VECTOR_STORE_BACKEND
+    from vanna_lgx.utils.vector_store import open_vector_store
+    source_backend = args.source or VECTOR_STORE_BACKEND
+
+    print("🚀 Vanna-LGX Vector Store Benchmark")
+    print("-----------------------------------")
+    available = set(open_vector_store(source_backend).list_collections())
+    requests = {name: k for name, k in DEFAULT_REQUESTS.items() if name in available}
+    if not requests:
+        sys.exit(f"No knowledge collections found in the '{source_backend}' store; run scripts.refresh_knowledge_base first.")
+
+    workdir = tempfile.mkdtemp(prefix="vanna_lgx_vector_bench_")
+    try:
+        paths, dim = prepare_stores(source_backend, workdir, list(requests), args.synthetic, args.seed)
+        queries_path = os.path.join(workdir, "queries.npy")
+        np.save(queries_path, np.random.default_rng(args.seed).normal(size=(args.queries, dim)).astype(np.float32))
+        print(f"   - Collections: {', '.join(f'{n} (top {k})' for n, k in requests.items())}; "
+              f"{args.synthetic} synthetic entries each; {args.queries} queries of dimension {dim}.")
+
+        report = {"collections": requests, "synthetic_per_collection": args.synthetic, "queries": args.queries, "backends": {}}
+        runs = {}
+        for backend, path in paths.items():
+            runs[backend] = run_backend(backend, path, queries_path, requests)
+            latencies = runs[backend]["latencies_ms"]
+            report["backends"][backend] = {
+                "import_and_open_ms": round(runs[backend]["import_and_open_ms"], 1),
+                "first_query_ms": round(runs[backend]["first_query_ms"], 3),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "peak_rss_mb": round(runs[backend]["peak_rss_mb"], 1),
+                "rss_growth_mb": round(runs[backend]["rss_growth_mb"], 1),
+            }
+
+        # The NumPy search is exact, so its top-k is the reference for Chroma's approximate (HNSW) one
+        overlaps = [
+            len(set(chroma[name]) & set(exact[name])) / max(len(exact[name]), 1)
+            for chroma, exact in zip(runs["chroma"]["top_ids"], runs["numpy"]["top_ids"]) for name in requests
+        ]
+        report["chroma_recall_vs_exact"] = round(float(np.mean(overlaps)), 4)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n   - Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
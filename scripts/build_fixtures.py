@@ -0,0 +1,148 @@
+# scripts/build_fixtures.py
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import urllib.request
+from datetime import datetime, timedelta
+
+# --- Configuration ---
+FIXTURES_DIR = os.path.join("fixtures", "build")
+DEFAULT_ROWS = 20000
+DEFAULT_STANDIN_URL = "http://127.0.0.1:11435"
+
+MANUFACTURERS = ["ALU", "Huawei", "ZTE", "Nokia", "Calix"]
+REGIONS = ["London", "Manchester", "Birmingham", "Leeds", "Glasgow", "Bristol"]
+ONT_MODELS = ["G-240W-F", "HG8245H", "F660", "XS-2426G", "GP1100X"]
+
+FIXTURE_DDL = """CREATE TABLE unoc_data (
+    ont_serial_number TEXT PRIMARY KEY,
+    ont_model TEXT,
+    ont_status TEXT,
+    ont_power_reading_dbm REAL,
+    olt_name TEXT NOT NULL,
+    olt_manufacturer TEXT NOT NULL,
+    olt_region TEXT NOT NULL,
+    olt_port TEXT,
+    nms_registered_at TIMESTAMP,
+    nms_last_seen_at TIMESTAMP
+)"""
+
+
+def fixture_env(fixtures_dir: str, base_url: str, vector_store: str = "chroma") -> dict:
+    """The VANNA_LGX_* environment that points the agent at the fixtures and the stand-in server."""
+    fixtures_dir = os.path.abspath(fixtures_dir)
+    return {
+        "VANNA_LGX_OLLAMA_BASE_URL": base_url,
+        "VANNA_LGX_DB_PATH": os.path.join(fixtures_dir, "unoc_fixture.db"),
+        "VANNA_LGX_VECTOR_STORE": vector_store,
+        "VANNA_LGX_CHROMA_PATH": os.path.join(fixtures_dir, "chroma"),
+        "VANNA_LGX_VECTOR_INDEX_PATH": os.path.join(fixtures_dir, "vector_index"),
+        # Separate caches: stand-in embeddings must never mix with real ones of the same model name.
+        "VANNA_LGX_EMBEDDING_CACHE_PATH": os.path.join(fixtures_dir, "embedding_cache.db"),
+        "VANNA_LGX_ANSWER_CACHE_PATH": os.path.join(fixtures_dir, "answer_cache.db"),
+        "VANNA_LGX_METRICS_JSONL_PATH": os.path.join(fixtures_dir, "metrics.jsonl"),
+        "VANNA_LGX_SQL_WORKLOAD_LOG_PATH": os.path.join(fixtures_dir, "sql_workload.jsonl"),
+        "VANNA_LGX_SQL_TEMPLATE_PATH": os.path.join(fixtures_dir, "sql_templates.json"),
+        "VANNA_LGX_RESULT_SPOOL_PATH": os.path.join(fixtures_dir, "result_spool"),
+    }
+
+
+def build_database(path: str, rows: int, seed: int = 0):
+    """Creates a small, deterministic stand-in for the UNOC database (OLT/ONT inventory)."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    olts = [
+        (f"OLT-{region}-{i:03d}", rng.choice(MANUFACTURERS), region)
+        for region in REGIONS for i in range(1, 9)
+    ]
+    olts.append(("OLT-CityA-123", "ALU", "London"))  # Referenced by the curated SQL examples
+    now = datetime(2025, 1, 19)
+
+    def make_row(i):
+        olt_name, manufacturer, region = rng.choice(olts)
+        registered = now - timedelta(days=rng.randint(0, 900))
+        last_seen = min(now, registered + timedelta(days=rng.randint(0, 900)))
+        return (
+            f"{manufacturer[:3].upper()}{i:09d}", rng.choice(ONT_MODELS),
+            rng.choices(["online", "offline", "dying_gasp"], weights=[90, 8, 2])[0],
+            round(rng.gauss(-21.0, 3.0), 2), olt_name, manufacturer, region,
+            f"{rng.randint(0, 15)}/{rng.randint(0, 15)}",
+            registered.strftime("%Y-%m-%d %H:%M:%S"), last_seen.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(FIXTURE_DDL)
+        conn.executemany("INSERT INTO unoc_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (make_row(i) for i in range(rows)))
+    conn.close()
+    print(f"   - Wrote {rows} rows ({len(olts)} OLTs) to {path}")
+
+
+def standin_running(base_url: str) -> bool:
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/version", timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the offline fixtures: a small SQLite DB and its vector store.")
+    parser.add_argument("--dir", default=FIXTURES_DIR, help="Where the fixtures are written.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default="chroma",
+                        help="Vector store backend the knowledge base is built in.")
+    parser.add_argument("--base-url", default=DEFAULT_STANDIN_URL,
+                        help="Ollama (stand-in) used to embed the knowledge base. Started in-process if not running.")
+    args = parser.parse_args()
+
+    print("🧪 Vanna-LGX Offline Fixtures")
+    print("-----------------------------")
+    os.makedirs(args.dir, exist_ok=True)
+    env = fixture_env(args.dir, args.base_url, args.vector_store)
+    for key in ("VANNA_LGX_CHROMA_PATH", "VANNA_LGX_VECTOR_INDEX_PATH", "VANNA_LGX_EMBEDDING_CACHE_PATH", "VANNA_LGX_ANSWER_CACHE_PATH",
+                "VANNA_LGX_SQL_TEMPLATE_PATH", "VANNA_LGX_RESULT_SPOOL_PATH"):
+        path = env[key]
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    build_database(env["VANNA_LGX_DB_PATH"], args.rows, args.seed)
+
+    server = None
+    if not standin_running(args.base_url):
+        from scripts.ollama_standin import start_standin
+        host, port = args.base_url.rsplit("//", 1)[-1].rsplit(":", 1)
+        server = start_standin(host, int(port))
+        print(f"   - Started an in-process Ollama stand-in on {args.base_url}")
+
+    # The knowledge base is built by the regular refresh script, pointed at the fixtures.
+    print(f"   - Building the {args.vector_store} vector store with scripts.refresh_knowledge_base...")
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-m", "scripts.refresh_knowledge_base", "--yes", "--full"],
+        cwd=project_root, env={**os.environ, **env},
+    )
+    if server is not None:
+        server.shutdown()
+    if completed.returncode != 0:
+        sys.exit(completed.returncode)
+
+    print("\n✅ Fixtures ready. Start the stand-in and point the agent at the fixtures with:")
+    print("   python -m scripts.ollama_standin --profile gpu &")
+    for key, value in env.items():
+        print(f"   export {key}={value}")
+    print("   python -m scripts.benchmark_pipeline --workers 4")
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
@@ -0,0 +1,65 @@
+# scripts/check_answer_cache.py
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from vanna_lgx.utils.answer_cache import AnswerCache
+from vanna_lgx.utils.db_utils import get_schema_info
+from vanna_lgx.utils.sql_templates import TemplateLibrary
+
+CACHED = "How many ONTs are offline in Leeds?"
+# (question, cache hit expected); every question gets the cached question's embedding, as if the
+# embedding model put them all above the similarity threshold
+LOOKUPS = [
+    ("How many ONTs are offline in London?", False),
+    ("How many ONTs are online in Leeds?", False),
+    ("How many ONTs are offline in Leeds in the last 7 days?", False),
+    ("Count the offline ONTs in Leeds.", True),
+    ("how many ONTs are offline in Leeds", True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that the answer cache serves near-duplicate questions only when they name the same "
+                    "values, and keeps the truncation of cached results. Run it against the fixtures (VANNA_LGX_DB_PATH).")
+    parser.parse_args()
+
+    print("🧪 Vanna-LGX Answer Cache Check")
+    print("-------------------------------")
+    with tempfile.TemporaryDirectory() as directory:
+        templates = TemplateLibrary(get_schema_info(), path=os.path.join(directory, "sql_templates.json"))
+        cache = AnswerCache(path=os.path.join(directory, "answer_cache.db"), question_values=templates.question_values)
+        embedding = np.random.default_rng(0).normal(size=768).tolist()
+        result_info = {"rows": 1, "truncated": True, "truncation_reason": "row budget", "approx_bytes": 8,
+                       "elapsed_ms": 1.0, "cached": False}
+        cache.put(CACHED, embedding, {"sql_query": "SELECT 1;", "result": pd.DataFrame({"count": [1]}),
+                                      "result_info": result_info, "summary": "1 ONT.", "visualization_spec": None})
+
+        failures = []
+        for question, expected in LOOKUPS:
+            cached = cache.get(question, embedding)
+            print(f"   - {question} {templates.question_values(question)}\n     -> "
+                  + (f"hit (similarity {cached['cache_similarity']:.3f})" if cached else "miss"))
+            if (cached is not None) != expected:
+                failures.append(question)
+            elif cached is not None and cached["result_info"] != result_info:
+                failures.append(f"{question} (result_info {cached['result_info']})")
+        without_values = AnswerCache(path=os.path.join(directory, "answer_cache.db"))
+        if without_values.get(LOOKUPS[3][0], embedding) is not None:
+            failures.append(f"{LOOKUPS[3][0]} (near-duplicate served without question_values)")
+
+    if failures:
+        sys.exit(f"\n❌ {len(failures)} lookup(s) went wrong: " + "; ".join(failures))
+    print("\n✅ Near-duplicates with other values miss; cached results keep their truncation.")
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
@@ -0,0 +1,73 @@
+# scripts/check_service_cancellation.py
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+from vanna_lgx.config import OLLAMA_BASE_URL, OLLAMA_MAX_CONCURRENCY
+from vanna_lgx.core.resources import AgentResources, get_resources, set_resources
+from vanna_lgx.service import QueryService
+from vanna_lgx.utils.llm_utils import free_ollama_slots
+from scripts.benchmark_pipeline import QUESTIONS_PATH, load_questions
+from scripts.ollama_standin import start_standin
+
+
+async def run_check(args) -> bool:
+    questions = list(itertools.islice(itertools.cycle(q["question"] for q in load_questions(args.questions)), args.requests))
+    service = QueryService(workers=args.workers, request_timeout=args.timeout)
+    await service.start()
+    try:
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(service.ask(question) for question in questions))
+        statuses = [answer["status"] for answer in answers]
+        print(f"   - {len(answers)} requests answered in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{s} x{statuses.count(s)}" for s in sorted(set(statuses))))
+        await asyncio.sleep(args.grace)
+        free = free_ollama_slots()
+        print(f"   - Ollama slots free {args.grace:.2f}s later: {free}/{OLLAMA_MAX_CONCURRENCY}")
+        ok = statuses == ["timeout"] * len(questions) and free == OLLAMA_MAX_CONCURRENCY
+
+        # With fast generation again, a new request must not wait for the abandoned ones
+        args.server.profile["ttft_ms"] = 0
+        start = time.perf_counter()
+        answer = await service.ask(questions[0])
+        print(f"   - Next request: {answer['status']} in {time.perf_counter() - start:.2f}s")
+        return ok and answer["status"] == "done"
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that timed-out service requests release their Ollama slots at once. Starts its own "
+                    "stand-in server at VANNA_LGX_OLLAMA_BASE_URL, so run it against the fixtures with nothing "
+                    "else listening there.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--requests", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=1.0, help="Request timeout of the service, in seconds.")
+    parser.add_argument("--ttft-ms", type=float, default=3000, help="Stand-in time to first token; above the timeout.")
+    parser.add_argument("--grace", type=float, default=0.1, help="Seconds after the last answer the slots must be free.")
+    args = parser.parse_args()
+
+    print("🧪 Vanna-LGX Service Cancellation Check")
+    print("---------------------------------------")
+    url = urlparse(OLLAMA_BASE_URL)
+    args.server = start_standin(url.hostname, url.port, ttft_ms=args.ttft_ms)
+    # Every request has to reach the LLM, so nothing may be answered from a cache or a template
+    set_resources(AgentResources(answer_cache=None, result_cache=None, sql_templates=None))
+    get_resources().warm_up(background=False)
+
+    if not asyncio.run(run_check(args)):
+        sys.exit("\n❌ Timed-out requests kept their slots or stalled the next request.")
+    print("\n✅ Timed-out requests released their slots.")
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
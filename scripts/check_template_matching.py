@@ -0,0 +1,51 @@
+# scripts/check_template_matching.py
+
+import argparse
+import os
+import sys
+import tempfile
+
+from vanna_lgx.utils.db_utils import get_schema_info
+from vanna_lgx.utils.sql_templates import EXAMPLES_PATH, TemplateLibrary
+
+# Template questions with a filter the template does not have: answering them from it would drop the filter
+MUST_NOT_MATCH = [
+    "Count the number of distinct offline ONTs registered in the last 7 days.",
+    "What is the average power reading for offline ONTs connected to 'OLT-London-002'?",
+]
+# The same questions without the extra filter, which the verified examples answer
+MUST_MATCH = [
+    "Count the number of distinct ONTs registered in the last 7 days.",
+    "What is the average power reading for ONTs connected to 'OLT-London-002'?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that questions with a filter no SQL template has are not answered from a template. "
+                    "Run it against the fixtures (VANNA_LGX_DB_PATH).")
+    parser.add_argument("--examples", default=EXAMPLES_PATH)
+    args = parser.parse_args()
+
+    print("🧪 Vanna-LGX SQL Template Matching Check")
+    print("----------------------------------------")
+    with tempfile.TemporaryDirectory() as directory:
+        # Only the verified examples: templates learned from earlier answers must not decide the check
+        library = TemplateLibrary(get_schema_info(), path=os.path.join(directory, "sql_templates.json"),
+                                  examples_path=args.examples)
+        failures = []
+        for question, expected in [(q, False) for q in MUST_NOT_MATCH] + [(q, True) for q in MUST_MATCH]:
+            match = library.match(question)
+            print(f"   - {question}\n     -> {match['sql'] if match else 'no template'}")
+            if (match is not None) != expected:
+                failures.append(question)
+
+    if failures:
+        sys.exit(f"\n❌ {len(failures)} question(s) matched wrongly: " + "; ".join(failures))
+    print("\n✅ Extra filters prevent template matches.")
+
+
+if __name__ == "__main__":
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    main()
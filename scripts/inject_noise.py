@@ -1,8 +1,8 @@
 # scripts/inject_noise.py
 
-import chromadb
-from langchain_ollama import OllamaEmbeddings
-from vanna_lgx.config import CHROMA_PATH, EMBEDDING_MODEL
+from vanna_lgx.config import VECTOR_STORE_BACKEND, EMBEDDING_MODEL
+from vanna_lgx.utils.embedding_cache import get_cached_embeddings
+from vanna_lgx.utils.vector_store import open_vector_store
 
 # --- Define our "noisy" data ---
 
@@ -48,12 +48,12 @@ def main():
 
     # 1. Initialize components
     print(f"   - Initializing embedding model '{EMBEDDING_MODEL}'...")
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
+    embeddings = get_cached_embeddings(model=EMBEDDING_MODEL)
 
-    print(f"   - Setting up ChromaDB client at '{CHROMA_PATH}'...")
-    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-    ddl_collection = chroma_client.get_or_create_collection(name="ddl")
-    sql_collection = chroma_client.get_or_create_collection(name="sql_examples")
+    print(f"   - Opening the '{VECTOR_STORE_BACKEND}' vector store...")
+    store = open_vector_store()
+    ddl_collection = store.get_or_create_collection(name="ddl")
+    sql_collection = store.get_or_create_collection(name="sql_examples")
 
     # --- Inject Noisy DDLs ---
     print(f"\n💉 Injecting {len(NOISY_DDLS)} noisy DDL documents...")
@@ -0,0 +1,316 @@
+# scripts/ollama_standin.py
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# --- Configuration ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 11435
+DEFAULT_RESPONSES_PATH = "fixtures/standin_responses.json"
+DEFAULT_EMBEDDING_DIM = 1024  # Same as mxbai-embed-large
+FALLBACK_RESPONSE = "OK."
+
+# Latency and throughput profiles. `parallel` emulates OLLAMA_NUM_PARALLEL: requests beyond
+# it queue, like on a real server (0 = unbounded).
+PROFILES = {
+    "instant": {"ttft_ms": 0, "tokens_per_second": 0, "embed_ms": 0, "parallel": 0, "jitter": 0.0},
+    "gpu": {"ttft_ms": 150, "tokens_per_second": 60, "embed_ms": 10, "parallel": 4, "jitter": 0.1},
+    "cpu": {"ttft_ms": 800, "tokens_per_second": 12, "embed_ms": 60, "parallel": 1, "jitter": 0.1},
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _tokens(text: str) -> List[str]:
+    """Splits a completion into word-sized stream chunks that concatenate back to the text."""
+    return re.findall(r"\s*\S+|\s+", text) or [""]
+
+
+@lru_cache(maxsize=65536)
+def _feature_vector(feature: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(feature.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim)
+
+
+def hash_embedding(text: str, dim: int = DEFAULT_EMBEDDING_DIM) -> List[float]:
+    """
+    A deterministic, unit-length embedding built by feature hashing the text's words and
+    word bigrams. Texts sharing words get similar vectors, so retrieval behaves plausibly.
+    """
+    words = re.findall(r"\w+", text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dim)
+    for feature in features or [""]:
+        vector += _feature_vector(feature, dim)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class Responder:
+    """
+    Chooses completions: exact recorded prompts first, then the first scripted rule whose
+    regex matches the prompt (its named groups can be used in the response as \\g<name>),
+    then a fixed fallback. With an upstream URL, unrecorded prompts are forwarded to a real
+    Ollama and the answers are appended to the recordings file.
+    """
+
+    def __init__(self, responses_path: Optional[str] = None, recordings_path: Optional[str] = None,
+                 upstream: Optional[str] = None):
+        self.rules = []
+        self.recordings: Dict[str, str] = {}
+        self.recordings_path = recordings_path
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self._lock = threading.Lock()
+        if responses_path:
+            with open(responses_path, "r") as f:
+                self.rules = [(re.compile(rule["match"], re.DOTALL), rule["response"]) for rule in json.load(f)]
+        if recordings_path:
+            try:
+                with open(recordings_path, "r") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self.recordings[entry["prompt_sha256"]] = entry["response"]
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def respond(self, model: str, prompt: str) -> str:
+        key = self._key(model, prompt)
+        if key in self.recordings:
+            return self.recordings[key]
+        if self.upstream:
+            return self._record(model, prompt, key)
+        for pattern, response in self.rules:
+            if match := pattern.search(prompt):
+                return match.expand(response)
+        return FALLBACK_RESPONSE
+
+    def _record(self, model: str, prompt: str, key: str) -> str:
+        request = urllib.request.Request(
+            f"{self.upstream}/api/generate",
+            data=json.dumps({"model": model, "prompt": prompt, "stream": False}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as upstream_response:
+            text = json.load(upstream_response)["response"]
+        with self._lock:
+            self.recordings[key] = text
+            if self.recordings_path:
+                with open(self.recordings_path, "a") as f:
+                    f.write(json.dumps({"prompt_sha256": key, "model": model, "response": text}) + "\n")
+        return text
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Speaks the subset of the Ollama HTTP API used by langchain_ollama."""
+
+    server_version = "OllamaStandin/1.0"
+
+    def log_message(self, format, *args):  # Keep benchmark output clean
+        pass
+
+    # --- Helpers ---
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sleep(self, ms: float):
+        if ms > 0:
+            jitter = self.server.profile["jitter"]
+            time.sleep(ms / 1000 * (1 + random.uniform(-jitter, jitter)))
+
+    # --- Routes ---
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-standin"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [{"name": m, "model": m, "modified_at": _now(), "size": 0, "digest": ""}
+                                        for m in self.server.models]})
+        elif self.path in ("/", "/api/stats"):
+            self._send_json(dict(self.server.stats))
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_POST(self):
+        try:
+            body = self._body()
+        except json.JSONDecodeError:
+            return self._send_json({"error": "invalid JSON body"}, 400)
+        routes = {
+            "/api/generate": self._generate,
+            "/api/chat": self._chat,
+            "/api/embed": self._embed,
+            "/api/embeddings": self._embeddings,
+            "/api/show": self._show,
+        }
+        if self.path not in routes:
+            return self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+        self.server.count(self.path)
+        routes[self.path](body)
+
+    def _show(self, body: Dict):
+        self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}, "model_info": {},
+                         "capabilities": ["completion", "embedding"]})
+
+    def _generate(self, body: Dict):
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        if body.get("system"):
+            prompt = f"{body['system']}\n{prompt}"
+        self._complete(model, prompt, body.get("stream", True),
+                       lambda text, done: {"response": text, "done": done})
+
+    def _chat(self, body: Dict):
+        model = body.get("model", "")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        self._complete(model, prompt, body.get("stream", True),
+                       lambda text, done: {"message": {"role": "assistant", "content": text}, "done": done})
+
+    def _complete(self, model: str, prompt: str, stream: bool, shape):
+        text = self.server.responder.respond(model, prompt)
+        tokens = _tokens(text)
+        profile = self.server.profile
+        token_ms = 1000 / profile["tokens_per_second"] if profile["tokens_per_second"] else 0
+        start = time.perf_counter()
+
+        with self.server.slot():
+            self._sleep(profile["ttft_ms"])
+            final = {
+                "model": model, "created_at": _now(), "done_reason": "stop",
+                "prompt_eval_count": len(_tokens(prompt)), "eval_count": len(tokens),
+            }
+            if not stream:
+                self._sleep(token_ms * len(tokens))
+                final["total_duration"] = int((time.perf_counter() - start) * 1e9)
+                return self._send_json({**final, **shape(text, True)})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    self._sleep(token_ms)
+                chunk = {"model": model, "created_at": _now(), **shape(token, False)}
+                self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            final["total_duration"] = int((time.perf_counter() - start) * 1e9)
+            self.wfile.write((json.dumps({**final, **shape("", True)}) + "\n").encode("utf-8"))
+
+    def _embed(self, body: Dict):
+        inputs = body.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        with self.server.slot():
+            self._sleep(self.server.profile["embed_ms"] * max(1, len(inputs)))
+            vectors = [hash_embedding(text, self.server.embedding_dim) for text in inputs]
+        self._send_json({"model": body.get("model", ""), "embeddings": vectors,
+                         "prompt_eval_count": sum(len(_tokens(t)) for t in inputs)})
+
+    def _embeddings(self, body: Dict):
+        with self.server.slot():
+            self._sleep(self.server.profile["embed_ms"])
+            vector = hash_embedding(body.get("prompt", ""), self.server.embedding_dim)
+        self._send_json({"embedding": vector})
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, responder: Responder, profile: Dict, embedding_dim: int = DEFAULT_EMBEDDING_DIM,
+                 models: Optional[List[str]] = None):
+        super().__init__(address, StandinHandler)
+        self.responder = responder
+        self.profile = profile
+        self.embedding_dim = embedding_dim
+        self.models = models or []
+        self.stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(profile["parallel"]) if profile["parallel"] else None
+
+    def slot(self):
+        """A generation/embedding slot; requests beyond the profile's `parallel` wait here."""
+        return self._slots if self._slots is not None else nullcontext()
+
+    def count(self, path: str):
+        with self._stats_lock:
+            self.stats[path] = self.stats.get(path, 0) + 1
+
+
+def start_standin(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, profile: str = "instant",
+                  responses_path: Optional[str] = DEFAULT_RESPONSES_PATH, **overrides) -> StandinServer:
+    """Starts a stand-in server in a daemon thread (e.g. from a benchmark) and returns it."""
+    server = StandinServer((host, port), Responder(responses_path), {**PROFILES[profile], **overrides})
+    threading.Thread(target=server.serve_forever, name="ollama-standin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A local stand-in for the Ollama HTTP API, for offline performance tests.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant", help="Latency / throughput profile.")
+    parser.add_argument("--ttft-ms", type=float, help="Override the profile's time to first token.")
+    parser.add_argument("--tokens-per-second", type=float, help="Override the profile's generation speed (0 = instant).")
+    parser.add_argument("--embed-ms", type=float, help="Override the profile's per-text embedding latency.")
+    parser.add_argument("--parallel", type=int, help="Override the number of requests served concurrently (0 = unbounded).")
+    parser.add_argument("--jitter", type=float, help="Relative random jitter applied to every delay, e.g. 0.1.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the jitter.")
+    parser.add_argument("--responses", default=DEFAULT_RESPONSES_PATH, help="JSON list of {match, response} rules.")
+    parser.add_argument("--recordings", help="JSONL of recorded completions, looked up by model and exact prompt.")
+    parser.add_argument("--record-from", metavar="OLLAMA_URL",
+                        help="Forward unknown prompts to a real Ollama and append its answers to --recordings.")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    args = parser.parse_args()
+    if args.record_from and not args.recordings:
+        parser.error("--record-from needs --recordings")
+
+    random.seed(args.seed)
+    profile = dict(PROFILES[args.profile])
+    for key in ("ttft_ms", "tokens_per_second", "embed_ms", "parallel", "jitter"):
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+
+    responder = Responder(args.responses, args.recordings, args.record_from)
+    server = StandinServer((args.host, args.port), responder, profile, args.embedding_dim)
+    print(f"🧪 Ollama stand-in listening on http://{args.host}:{args.port} (profile: {args.profile}, {profile})")
+    print(f"   - {len(responder.rules)} scripted rules, {len(responder.recordings)} recorded completions.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
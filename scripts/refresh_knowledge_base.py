@@ -1,46 +1,74 @@
 import os
 import json
+import hashlib
 import sqlite3
-import chromadb
+import argparse
 import sys
-from langchain_ollama import OllamaEmbeddings, OllamaLLM as Ollama # Import the LLM
-from vanna_lgx.config import CHROMA_PATH, EMBEDDING_MODEL, DB_PATH, SYNTHESIS_MODEL, OLLAMA_BASE_URL
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from langchain_ollama import OllamaLLM as Ollama # Import the LLM
+from vanna_lgx.config import DB_PATH, SYNTHESIS_MODEL, EMBEDDING_MODEL, OLLAMA_BASE_URL, REFRESH_LLM_WORKERS, VECTOR_STORE_BACKEND
+from vanna_lgx.utils.embedding_cache import CachedEmbeddings, get_cached_embeddings
+from vanna_lgx.utils.db_utils import get_column_info
+from vanna_lgx.utils.vector_store import VectorStore, open_vector_store
+from vanna_lgx.utils.schema_index import sample_values, column_document, column_metadata
 
 # --- Configuration ---
 KNOWLEDGE_DOCS_PATH = "knowledge/docs"
 KNOWLEDGE_SQL_PATH = "knowledge/sql_examples/examples.json"
-COLLECTIONS_TO_REFRESH = ["ddl", "sql_examples", "docs"]
+COLLECTIONS_TO_REFRESH = ["ddl", "sql_examples", "docs", "columns"]
 
-# --- Modular Ingestion Functions ---
+# --- Incremental Sync ---
+
+def content_hash(*parts: str) -> str:
+    """Hash of everything an entry is derived from, models included, so switching a model re-ingests it."""
+    return hashlib.sha256("\x1f".join((SYNTHESIS_MODEL, EMBEDDING_MODEL) + parts).encode("utf-8")).hexdigest()
+
+def stored_hashes(collection) -> Dict[str, str]:
+    """Maps every id already in the collection to the content hash it was ingested with."""
+    stored = collection.get(include=["metadatas"])
+    return {id_: (metadata or {}).get("content_hash", "") for id_, metadata in zip(stored["ids"], stored["metadatas"])}
 
-def ingest_ddl(client: chromadb.Client, embeddings: OllamaEmbeddings, llm: Ollama):
+def changed_ids(collection, hashes: Dict[str, str]) -> List[str]:
+    """The ids of `hashes` that are new or whose content changed since the last refresh."""
+    current = stored_hashes(collection)
+    return [id_ for id_, hash_ in hashes.items() if current.get(id_) != hash_]
+
+def sync_collection(collection, embeddings: CachedEmbeddings, entries: Dict[str, Dict]) -> Dict[str, int]:
     """
-    S4.1 Upgrade: Deletes, re-creates, and populates the 'ddl' collection.
-    It now generates a natural language summary of each table for better embedding.
+    Brings a collection in line with `entries` ({id: {"hash", "document", "embed_text", "metadata"}}):
+    new and changed entries are embedded and upserted, ids that no longer exist are deleted and
+    unchanged entries are left alone (their document and embed_text are not used).
     """
-    print("--- Ingesting DDL (with Summary Generation) ---")
-    collection = client.get_or_create_collection(name="ddl")
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    conn.close()
+    current = stored_hashes(collection)
+    changed = [id_ for id_, entry in entries.items() if current.get(id_) != entry["hash"]]
+    stale = [id_ for id_ in current if id_ not in entries]
 
-    if not tables:
-        print("   - No tables found in the database.")
-        return
-
-    ddl_strings = [sql for _, sql in tables if sql]
-    table_names = [name for name, _ in tables if name]
-    
-    print(f"   - Found {len(ddl_strings)} tables. Generating summaries for embedding...")
-    
-    ddl_summaries = []
-    for i, ddl in enumerate(ddl_strings):
-        table_name = table_names[i]
-        print(f"     - Generating summary for table: {table_name}...")
-        prompt = f"""
+    if changed:
+        collection.upsert(
+            ids=changed,
+            documents=[entries[id_]["document"] for id_ in changed],
+            metadatas=[{**entries[id_].get("metadata", {}), "content_hash": entries[id_]["hash"]} for id_ in changed],
+            embeddings=embeddings.embed_documents([entries[id_]["embed_text"] for id_ in changed]),
+        )
+    if stale:
+        collection.delete(ids=stale)
+
+    stats = {
+        "added": sum(1 for id_ in changed if id_ not in current),
+        "updated": sum(1 for id_ in changed if id_ in current),
+        "deleted": len(stale),
+        "unchanged": len(entries) - len(changed),
+    }
+    print(f"   - {collection.name}: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {stats['unchanged']} unchanged.")
+    return stats
+
+# --- Modular Ingestion Functions ---
+
+def summarize_table(llm: Ollama, table_name: str, ddl: str) -> str:
+    """Generates the natural language summary of a table that is embedded in place of its DDL."""
+    prompt = f"""
 Here is a DDL statement for a table named '{table_name}'.
 Please provide a concise, one-paragraph natural language summary of this table's purpose and key columns.
 Focus on the business concepts it represents, such as telecom equipment, network operations, OLTs, and ONTs (also known as CPE or user modems).
@@ -50,76 +78,184 @@ DDL:
 
 Summary:
 """
-        summary = llm.invoke(prompt)
-        ddl_summaries.append(summary)
-        print(f"     - Summary for {table_name}: {summary[:80]}...")
+    summary = llm.invoke(prompt)
+    print(f"     - Summary for {table_name}: {summary[:80]}...")
+    return summary
+
+def ingest_ddl(store: VectorStore, embeddings: CachedEmbeddings, llm: Ollama, pool: ThreadPoolExecutor):
+    """
+    S4.1 Upgrade: Syncs the 'ddl' collection with the database tables.
+    A natural language summary of each table is embedded; summaries are only generated
+    for new or changed tables, concurrently on the LLM pool.
+    """
+    print("--- Ingesting DDL (with Summary Generation) ---")
+    collection = store.get_or_create_collection(name="ddl")
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table';")
+    tables = {name: sql for name, sql in cursor.fetchall() if name and sql}
+    conn.close()
+
+    if not tables:
+        print("   - No tables found in the database.")
+
+    hashes = {name: content_hash(sql) for name, sql in tables.items()}
+    to_summarize = changed_ids(collection, hashes)
+    print(f"   - Found {len(tables)} tables, {len(to_summarize)} new or changed. Generating summaries for embedding...")
+    summaries = dict(zip(to_summarize, pool.map(lambda name: summarize_table(llm, name, tables[name]), to_summarize)))
 
     # We EMBED the rich summary, but STORE the raw DDL as the document.
-    collection.add(
-        documents=ddl_strings, # The actual DDL is the document
-        ids=table_names,
-        embeddings=embeddings.embed_documents(ddl_summaries) # The summary is used for embedding
+    entries = {
+        name: {"hash": hashes[name], "document": sql, "embed_text": summaries.get(name, "")}
+        for name, sql in tables.items()
+    }
+    return sync_collection(collection, embeddings, entries)
+
+def describe_columns(llm: Ollama, table_name: str, columns: list, samples: dict) -> dict:
+    """Asks the LLM for a one-sentence description of every column of a table, in one call."""
+    column_lines = "\n".join(
+        f"- {c['name']} ({c['type'] or 'ANY'}), sample values: {', '.join(samples[c['name']]) or 'none'}" for c in columns
     )
-    print(f"   - Ingested {collection.count()} DDL documents with rich semantic embeddings.")
+    prompt = f"""
+Here are the columns of the table '{table_name}' in a telecom network operations database (OLTs, ONTs / CPEs).
+For every column, write a short, one-sentence description of what it holds, using business terms.
+
+Columns:
+{column_lines}
 
-def ingest_sql_examples(client: chromadb.Client, embeddings: OllamaEmbeddings):
-    """Populates the 'sql_examples' collection."""
+Return a JSON object that maps each column name to its description.
+
+JSON:
+"""
+    response = llm.invoke(prompt)
+    try:
+        descriptions = json.loads(response[response.find('{'):response.rfind('}') + 1])
+        return {str(k): str(v) for k, v in descriptions.items()} if isinstance(descriptions, dict) else {}
+    except json.JSONDecodeError:
+        print(f"     - Could not parse column descriptions for {table_name}; indexing names, types and samples only.")
+        return {}
+
+def ingest_columns(store: VectorStore, embeddings: CachedEmbeddings, llm: Ollama, pool: ThreadPoolExecutor):
+    """
+    Syncs the 'columns' collection: one entry per column with its name, type, a generated
+    description and sample values, so retrieval can send pruned DDL for wide tables.
+    Descriptions are requested per table, and only for tables with a new or changed column
+    definition (type, PK or FK); changed sample values alone do not trigger a re-description.
+    """
+    print("--- Ingesting Column Index ---")
+    collection = store.get_or_create_collection(name="columns")
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        column_info = get_column_info(conn)
+        samples = {
+            table_name: {c["name"]: sample_values(conn, table_name, c["name"]) for c in table_info["columns"]}
+            for table_name, table_info in column_info.items()
+        }
+    finally:
+        conn.close()
+
+    hashes, columns_by_id = {}, {}
+    for table_name, table_info in column_info.items():
+        for column in table_info["columns"]:
+            column_id = f"{table_name}.{column['name']}"
+            # Schema facts only: sample values of a live database change between runs
+            foreign_keys = [fk for fk in table_info["foreign_keys"] if fk["column"] == column["name"]]
+            hashes[column_id] = content_hash(table_name, json.dumps(column, sort_keys=True), json.dumps(foreign_keys, sort_keys=True))
+            columns_by_id[column_id] = (table_name, column)
+    to_describe = sorted({columns_by_id[column_id][0] for column_id in changed_ids(collection, hashes)})
+    print(f"   - Found {len(hashes)} columns in {len(column_info)} tables. Describing the columns of {len(to_describe)} new or changed table(s)...")
+    descriptions = dict(zip(to_describe, pool.map(
+        lambda name: describe_columns(llm, name, column_info[name]["columns"], samples[name]), to_describe
+    )))
+
+    entries = {}
+    for column_id, (table_name, column) in columns_by_id.items():
+        description = descriptions.get(table_name, {}).get(column["name"], "")
+        document = column_document(table_name, column, description, samples[table_name][column["name"]])
+        entries[column_id] = {
+            "hash": hashes[column_id],
+            "document": document,
+            "embed_text": document,
+            "metadata": column_metadata(table_name, column, description, samples[table_name][column["name"]]),
+        }
+    return sync_collection(collection, embeddings, entries)
+
+def ingest_sql_examples(store: VectorStore, embeddings: CachedEmbeddings):
+    """Syncs the 'sql_examples' collection. Ids derive from the question, so reordering the file changes nothing."""
     print("--- Ingesting SQL Examples ---")
-    collection = client.get_or_create_collection(name="sql_examples")
+    collection = store.get_or_create_collection(name="sql_examples")
     try:
         with open(KNOWLEDGE_SQL_PATH, 'r') as f:
             examples = json.load(f)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"   - Error loading {KNOWLEDGE_SQL_PATH}: {e}"); return
-    questions = [ex["question"] for ex in examples]
-    documents = [f"Question: {ex['question']}\nSQL: {ex['sql']}" for ex in examples]
-    ids = [f"example_{i}" for i in range(len(examples))]
-    collection.add(documents=documents, ids=ids, embeddings=embeddings.embed_documents(questions))
-    print(f"   - Ingested {collection.count()} SQL examples.")
-
-def ingest_docs(client: chromadb.Client, embeddings: OllamaEmbeddings):
-    """Populates the 'docs' collection."""
+    entries = {}
+    for ex in examples:
+        document = f"Question: {ex['question']}\nSQL: {ex['sql']}"
+        example_id = f"example_{hashlib.sha256(ex['question'].encode('utf-8')).hexdigest()[:16]}"
+        entries[example_id] = {"hash": content_hash(document), "document": document, "embed_text": ex["question"]}
+    return sync_collection(collection, embeddings, entries)
+
+def ingest_docs(store: VectorStore, embeddings: CachedEmbeddings):
+    """Syncs the 'docs' collection with the .txt files of the docs folder."""
     print("--- Ingesting Docs ---")
-    collection = client.get_or_create_collection(name="docs")
-    doc_contents, doc_ids = [], []
-    for filename in os.listdir(KNOWLEDGE_DOCS_PATH):
+    collection = store.get_or_create_collection(name="docs")
+    entries = {}
+    for filename in sorted(os.listdir(KNOWLEDGE_DOCS_PATH)):
         if filename.endswith(".txt"):
             filepath = os.path.join(KNOWLEDGE_DOCS_PATH, filename)
             with open(filepath, 'r') as f:
-                doc_contents.append(f.read())
-                doc_ids.append(filename)
-    if not doc_contents: print("   - No .txt documents found."); return
-    collection.add(documents=doc_contents, ids=doc_ids, embeddings=embeddings.embed_documents(doc_contents))
-    print(f"   - Ingested {collection.count()} doc files.")
+                content = f.read()
+            entries[filename] = {"hash": content_hash(content), "document": content, "embed_text": content}
+    if not entries: print("   - No .txt documents found.")
+    return sync_collection(collection, embeddings, entries)
 
 # --- Main Execution Logic ---
 
 def main():
-    print("🚀 Vanna-LGX Knowledge Base Refresh Script (v2 - with DDL Summaries)")
-    print("------------------------------------------------------------------")
-    confirm = input(f"This will DELETE and re-create all collections and will call an LLM to generate summaries for DDL. This may take a moment.\nContinue? (yes/no): ")
-    if confirm.lower() != 'yes':
-        print("Aborted by user."); return
+    parser = argparse.ArgumentParser(description="Syncs the vector store knowledge base with the database schema and the knowledge files.")
+    parser.add_argument("--yes", "-y", action="store_true", help="Skip the confirmation prompt (e.g. when run from cron after a migration).")
+    parser.add_argument("--full", action="store_true", help="Delete and re-create every collection instead of updating only what changed.")
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default=VECTOR_STORE_BACKEND,
+                        help="Backend to sync (defaults to VECTOR_STORE_BACKEND).")
+    parser.add_argument("--workers", type=int, default=REFRESH_LLM_WORKERS, help="Concurrent LLM calls for table summaries and column descriptions.")
+    args = parser.parse_args()
+
+    print("🚀 Vanna-LGX Knowledge Base Refresh Script (v3 - incremental)")
+    print("------------------------------------------------------------")
+    if not args.yes:
+        action = "DELETE and re-create all collections" if args.full else "update new and changed entries and delete stale ones"
+        confirm = input(f"This will {action} and will call an LLM to generate summaries for new or changed tables. This may take a moment.\nContinue? (yes/no): ")
+        if confirm.lower() != 'yes':
+            print("Aborted by user."); return
 
     # Initialize shared components
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
+    embeddings = get_cached_embeddings() # Unchanged documents are served from the embedding cache
     llm = Ollama(base_url=OLLAMA_BASE_URL, model=SYNTHESIS_MODEL) # Need an LLM for summaries
-    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-
-    for collection_name in COLLECTIONS_TO_REFRESH:
-        try:
-            print(f"   - Deleting collection '{collection_name}'...")
-            chroma_client.delete_collection(name=collection_name)
-        except Exception: pass
-
-    # Run all ingestion functions
-    ingest_ddl(chroma_client, embeddings, llm)
-    ingest_sql_examples(chroma_client, embeddings)
-    ingest_docs(chroma_client, embeddings)
-    
+    store = open_vector_store(args.vector_store)
+    print(f"   - Vector store: {args.vector_store}")
+
+    if args.full:
+        for collection_name in COLLECTIONS_TO_REFRESH:
+            try:
+                print(f"   - Deleting collection '{collection_name}'...")
+                store.delete_collection(name=collection_name)
+            except Exception: pass
+
+    # Run all ingestion functions; LLM calls within a collection run concurrently
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="refresh-llm") as pool:
+        ingest_ddl(store, embeddings, llm, pool)
+        ingest_sql_examples(store, embeddings)
+        ingest_docs(store, embeddings)
+        ingest_columns(store, embeddings, llm, pool)
+
+    stats = embeddings.stats()
+    print(f"\n   - Embedding cache: {stats['hits']} hits, {stats['misses']} new embeddings computed.")
+
     print("\n✅ Knowledge base refresh complete!")
 
 if __name__ == "__main__":
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.insert(0, project_root)
-    main()
\ No newline at end of file
+    main()
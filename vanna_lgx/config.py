@@ -1,15 +1,179 @@
 # config.py
 import os
 
+# The Ollama URL and the data paths can be overridden with VANNA_LGX_* environment variables,
+# e.g. to run against the offline fixtures built by scripts/build_fixtures.py.
+
 # --- LLM Configuration ---
-OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_BASE_URL = os.environ.get("VANNA_LGX_OLLAMA_BASE_URL", "http://localhost:11434")
 # The powerful model for SQL synthesis and summarization
 SYNTHESIS_MODEL = "gpt-oss:latest" 
 
 # --- Database Configuration ---
-DB_PATH = os.path.join("data", "database_19_jan.db")
+DB_PATH = os.environ.get("VANNA_LGX_DB_PATH", os.path.join("data", "database_19_jan.db"))
 
 # --- Vector Store Configuration (for future stages) ---
-CHROMA_PATH = "chroma"
+# "chroma" (Chroma persistent client at CHROMA_PATH) or "numpy" (in-process exact search over
+# memory-mapped float32 matrices at VECTOR_INDEX_PATH; no chromadb import at query time).
+VECTOR_STORE_BACKEND = os.environ.get("VANNA_LGX_VECTOR_STORE", "chroma")
+CHROMA_PATH = os.environ.get("VANNA_LGX_CHROMA_PATH", "chroma")
+VECTOR_INDEX_PATH = os.environ.get("VANNA_LGX_VECTOR_INDEX_PATH", os.path.join("data", "vector_index"))
 EMBEDDING_MODEL = "mxbai-embed-large:latest"
 KNOWLEDGE_BASE_PATH = "knowledge"
+
+# --- Answer Cache Configuration ---
+# Persistent cache of final answers, looked up before any LLM node runs.
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_PATH = os.environ.get("VANNA_LGX_ANSWER_CACHE_PATH", os.path.join("data", "answer_cache.db"))
+# Cosine similarity above which a previously answered question counts as a near-duplicate; it must
+# also name the same numbers, quoted strings and column values (exact matches only without SQL templates)
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+ANSWER_CACHE_MAX_ENTRIES = 500
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# --- Embedding Cache Configuration ---
+# Content-addressed (model, text hash) cache shared by the agent and the ingestion scripts.
+EMBEDDING_CACHE_PATH = os.environ.get("VANNA_LGX_EMBEDDING_CACHE_PATH", os.path.join("data", "embedding_cache.db"))
+EMBEDDING_CACHE_MEMORY_ITEMS = 2048
+# Cache misses are sent to the embedding endpoint in batches of this many texts.
+EMBEDDING_BATCH_SIZE = 64
+
+# --- Knowledge Base Refresh ---
+# Concurrent LLM calls (table summaries, column descriptions) during scripts.refresh_knowledge_base.
+REFRESH_LLM_WORKERS = 4
+
+# --- Retrieval Configuration ---
+# Threads used to query the knowledge collections concurrently (Chroma backend).
+RETRIEVAL_MAX_WORKERS = 8
+
+# --- Visualization Configuration ---
+# Chart specs are built by rules; set to True to ask the LLM for result shapes the rules do not cover.
+CHART_LLM_FALLBACK = False
+
+# --- Column Index ---
+# One knowledge entry per column ('columns' collection). When enabled, retrieval sends a pruned
+# DDL with only the key columns and the columns relevant to the question.
+COLUMN_INDEX_ENABLED = True
+COLUMN_RETRIEVAL_K = 15
+COLUMN_SAMPLE_VALUES = 5
+
+# --- Reranking ---
+# Retrieved examples and docs are scored locally (embedding cosine against the rewritten question
+# plus BM25 over table and column names); the LLM judge only sees the ambiguous ones.
+RERANK_EMBEDDING_WEIGHT = 0.7  # The lexical score gets the rest
+# Cosine similarity is mapped linearly from [FLOOR, CEILING] to [0, 1]; both depend on the embedding model.
+RERANK_COSINE_FLOOR = 0.3
+RERANK_COSINE_CEILING = 0.8
+RERANK_KEEP_THRESHOLD = 0.5
+# Candidates scoring within this margin of the threshold are sent to the LLM judge
+RERANK_AMBIGUITY_MARGIN = 0.1
+# Set to False to decide ambiguous candidates by the threshold alone (no judge LLM call at all)
+RERANK_LLM_JUDGE = True
+
+# --- Question Rewriting ---
+# Glossary aliases from the knowledge docs are replaced by their term without the LLM. The LLM
+# rewriter only runs when less than this share of the question's content words are table / column
+# names or glossary terms. Final rewrites are memoized per normalized question.
+REWRITE_FAST_PATH = True
+REWRITE_EXPLICITNESS_THRESHOLD = 0.6
+REWRITE_MEMO_ITEMS = 1024
+
+# --- SQL Templates ---
+# The verified SQL examples and successfully executed answers become parameterized SQL templates
+# whose literals are typed slots (a column's values, a day window, a number). A question matching
+# a template closely enough gets the filled-in SQL without retrieval or the synthesis LLM.
+SQL_TEMPLATES_ENABLED = True
+SQL_TEMPLATE_PATH = os.environ.get("VANNA_LGX_SQL_TEMPLATE_PATH", os.path.join("data", "sql_templates.json"))
+# Similarity of the question to the template question once the slot values are masked out
+SQL_TEMPLATE_MATCH_THRESHOLD = 0.9
+# Slot columns with more distinct values are only recognized by quotes or by the example value's shape
+SQL_TEMPLATE_MAX_SLOT_VALUES = 500
+SQL_TEMPLATE_MAX_LEARNED = 500
+
+# --- Sessions ---
+# The CLI and the Streamlit app run each question as the next turn of a session, checkpointed in
+# memory. A follow-up ("now only for London") refines the previous SQL with the previous turn's
+# judged context, without the answer cache, rewriting, retrieval or the judge. Idle sessions
+# expire; the least recently used ones are evicted beyond the count or the (estimated) byte budget.
+SESSIONS_ENABLED = True
+SESSION_MAX_SESSIONS = 256
+SESSION_MAX_BYTES = 256 * 1024 * 1024
+SESSION_TTL_SECONDS = 3600
+# Questions this short that open with "for", "in", "with"... count as follow-ups
+SESSION_FOLLOW_UP_MAX_WORDS = 8
+# Rows of the previous result shown to the model when it refines the previous SQL
+SESSION_PREVIOUS_ROWS = 5
+
+# --- SQL Prompt Context ---
+# Token budget for the schema, examples and docs packed into the SQL synthesis prompt.
+CONTEXT_TOKEN_BUDGET = 3000
+# DDL and docs that do not fit are truncated to whole lines only if at least this many tokens remain.
+CONTEXT_MIN_TRUNCATED_TOKENS = 200
+
+# --- Query Execution Limits ---
+QUERY_TIMEOUT_SECONDS = 30
+QUERY_MAX_ROWS = 10000
+QUERY_MAX_BYTES = 64 * 1024 * 1024
+QUERY_FETCH_CHUNK_ROWS = 1000
+# SQLite VM instructions between two timeout checks
+QUERY_PROGRESS_OPS = 10000
+
+# --- Result Export ---
+# Complete (untruncated) results are fetched lazily into Arrow IPC segments of this many rows under
+# RESULT_SPOOL_PATH, one directory per result, removed when the next answer replaces it. Pages shown in
+# the UI and Parquet / CSV / Arrow exports are read from the memory-mapped segments.
+RESULT_SPOOL_PATH = os.environ.get("VANNA_LGX_RESULT_SPOOL_PATH", os.path.join("data", "result_spool"))
+RESULT_SPOOL_BATCH_ROWS = 50000
+RESULT_PAGE_ROWS = 100
+
+# --- SQL Result Cache ---
+# Results of executed SQL, keyed on the normalized SQL and invalidated when the database file or
+# PRAGMA data_version changes. Held in memory column by column, LRU-evicted beyond the byte budget.
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Results larger than this share of the budget are not cached
+RESULT_CACHE_MAX_ENTRY_FRACTION = 0.25
+# SQL depending on the current time ('now', CURRENT_DATE...) is cached this long; random() is never cached
+RESULT_CACHE_TIME_DEPENDENT_TTL_SECONDS = 60
+
+# --- Index Advisor (python -m scripts.advise_indexes) ---
+# Every statement executed by the agent is appended here with its timing; the advisor proposes
+# indexes for the statements that scan tables.
+SQL_WORKLOAD_LOG_ENABLED = True
+SQL_WORKLOAD_LOG_PATH = os.environ.get("VANNA_LGX_SQL_WORKLOAD_LOG_PATH", os.path.join("data", "sql_workload.jsonl"))
+# Widest index proposed; covering indexes that would be wider keep only their key columns
+INDEX_ADVISOR_MAX_COLUMNS = 6
+
+# --- SQLite Connection Pool ---
+# Read-only connections shared across graph invocations and Streamlit sessions.
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT_SECONDS = 10
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 64 * 1024
+
+# --- Startup ---
+# Build the agent's clients and collections in a background thread at startup
+# instead of on the first question.
+WARM_UP_IN_BACKGROUND = True
+
+# --- Streaming ---
+# Stream LLM tokens from the rewriter, SQL synthesis and summary nodes to the UI / CLI.
+STREAM_TOKENS = True
+
+# --- Concurrency Limits ---
+# Maximum number of simultaneous requests sent to Ollama (generation and embeddings) per process.
+OLLAMA_MAX_CONCURRENCY = 4
+
+# --- Query Service (python -m vanna_lgx.service) ---
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 8
+SERVICE_QUEUE_SIZE = 64
+SERVICE_MAX_PENDING_PER_TENANT = 16
+SERVICE_REQUEST_TIMEOUT_SECONDS = 300
+SERVICE_MAX_RESULT_ROWS = 200
+
+# --- Instrumentation ---
+# Per-node records (wall time, tokens, LLM/embedding/vector store/SQLite calls) of every run are appended here.
+METRICS_JSONL_PATH = os.environ.get("VANNA_LGX_METRICS_JSONL_PATH", os.path.join("data", "metrics.jsonl"))
+METRICS_EXPORT_JSONL = True
@@ -2,7 +2,13 @@
 
 from langgraph.graph import StateGraph, END
 from .state import GraphState
+from vanna_lgx.utils.instrumentation import instrument_node
 from .nodes import (
+    start_turn,
+    reuse_context,
+    answer_cache_lookup,
+    answer_cache_store,
+    match_sql_template,
     query_rewriter,
     retrieve_context, 
     rerank_and_judge, 
@@ -10,7 +16,8 @@ from .nodes import (
     sql_linter_verifier, 
     auto_repair, 
     execute_sql, 
-    summarize_and_visualize,
+    summarize_result,
+    visualize_result,
     MAX_REPAIR_ATTEMPTS
 )
 
@@ -24,22 +31,72 @@ def should_continue(state: GraphState) -> str:
     else:
         return "execute"
 
-def build_s5_graph():
-    """Builds the final StateGraph for Stage S5."""
+def route_turn(state: GraphState) -> str:
+    """ Follow-ups refine the previous turn's SQL, reusing its judged context when there is one. """
+    if not state.get("follow_up"):
+        return "new"
+    return "reuse" if (state["previous_turn"].get("clean_context") or {}).get("ddl") else "retrieve"
+
+def route_after_cache(state: GraphState) -> str:
+    """ Skips every LLM node when the answer cache already holds the answer. """
+    return "hit" if state.get("cache_hit") else "miss"
+
+def route_after_template(state: GraphState) -> str:
+    """ Sends template-filled SQL straight to validation. """
+    return "template" if state.get("template") else "miss"
+
+def build_s5_graph(checkpointer=None):
+    """
+    Builds the final StateGraph for Stage S5. With a checkpointer (see utils.sessions),
+    invocations that pass the same thread_id are the turns of one session.
+    """
     workflow = StateGraph(GraphState)
 
-    # Add all nodes for the final agent
-    workflow.add_node("query_rewriter", query_rewriter)
-    workflow.add_node("retrieve_context", retrieve_context)
-    workflow.add_node("rerank_and_judge", rerank_and_judge)
-    workflow.add_node("synthesize_sql", synthesize_sql)
-    workflow.add_node("sql_linter_verifier", sql_linter_verifier)
-    workflow.add_node("auto_repair", auto_repair)
-    workflow.add_node("execute_sql", execute_sql)
-    workflow.add_node("summarize_and_visualize", summarize_and_visualize)
+    # Add all nodes for the final agent. Every node is instrumented (wall time, tokens and
+    # external calls are appended to the state's `metrics`).
+    workflow.add_node("start_turn", instrument_node("start_turn", start_turn, starts_run=True))
+    workflow.add_node("reuse_context", instrument_node("reuse_context", reuse_context))
+    workflow.add_node("answer_cache_lookup", instrument_node("answer_cache_lookup", answer_cache_lookup))
+    workflow.add_node("match_sql_template", instrument_node("match_sql_template", match_sql_template))
+    workflow.add_node("query_rewriter", instrument_node("query_rewriter", query_rewriter))
+    workflow.add_node("retrieve_context", instrument_node("retrieve_context", retrieve_context))
+    workflow.add_node("rerank_and_judge", instrument_node("rerank_and_judge", rerank_and_judge))
+    workflow.add_node("synthesize_sql", instrument_node("synthesize_sql", synthesize_sql))
+    workflow.add_node("sql_linter_verifier", instrument_node("sql_linter_verifier", sql_linter_verifier))
+    workflow.add_node("auto_repair", instrument_node("auto_repair", auto_repair))
+    workflow.add_node("execute_sql", instrument_node("execute_sql", execute_sql))
+    workflow.add_node("summarize_result", instrument_node("summarize_result", summarize_result))
+    workflow.add_node("visualize_result", instrument_node("visualize_result", visualize_result))
+    workflow.add_node("answer_cache_store", instrument_node("answer_cache_store", answer_cache_store))
 
     # Build the graph
-    workflow.set_entry_point("query_rewriter")
+    workflow.set_entry_point("start_turn")
+    workflow.add_conditional_edges(
+        "start_turn",
+        route_turn,
+        {
+            "new": "answer_cache_lookup",
+            "reuse": "reuse_context",
+            "retrieve": "retrieve_context"
+        }
+    )
+    workflow.add_edge("reuse_context", "synthesize_sql")
+    workflow.add_conditional_edges(
+        "answer_cache_lookup",
+        route_after_cache,
+        {
+            "hit": END,
+            "miss": "match_sql_template"
+        }
+    )
+    workflow.add_conditional_edges(
+        "match_sql_template",
+        route_after_template,
+        {
+            "template": "sql_linter_verifier",
+            "miss": "query_rewriter"
+        }
+    )
     workflow.add_edge("query_rewriter", "retrieve_context")
     workflow.add_edge("retrieve_context", "rerank_and_judge")
     workflow.add_edge("rerank_and_judge", "synthesize_sql")
@@ -51,13 +108,18 @@ def build_s5_graph():
         {
             "repair": "auto_repair",
             "execute": "execute_sql",
-            "end_with_error": "summarize_and_visualize" # Route errors to final summary
+            "end_with_error": "summarize_result" # Route errors to final summary
         }
     )
     
     workflow.add_edge("auto_repair", "synthesize_sql")
-    workflow.add_edge("execute_sql", "summarize_and_visualize")
-    workflow.add_edge("summarize_and_visualize", END)
+    # Summary and chart are independent LLM calls, so they run as parallel branches.
+    # Both finish in the same step, so the cache store below runs once.
+    workflow.add_edge("execute_sql", "summarize_result")
+    workflow.add_edge("execute_sql", "visualize_result")
+    workflow.add_edge("summarize_result", "answer_cache_store")
+    workflow.add_edge("visualize_result", "answer_cache_store")
+    workflow.add_edge("answer_cache_store", END)
 
-    app = workflow.compile()
+    app = workflow.compile(checkpointer=checkpointer)
     return app
\ No newline at end of file
@@ -1,56 +1,271 @@
 # vanna_lgx/core/nodes.py - S5.1 FINAL CORRECTED VERSION
 
-import chromadb
-import tiktoken
 import json
 import re
-import pandas as pd
-from langchain_ollama import OllamaLLM as Ollama
-from langchain_ollama import OllamaEmbeddings
+import uuid
+from typing import List
 
 from vanna_lgx.core.state import GraphState
-from vanna_lgx.utils.db_utils import get_db_connection, get_schema_info
+from vanna_lgx.core.resources import get_resources
+from vanna_lgx.utils.db_utils import get_pool
+from vanna_lgx.utils.cancellation import on_cancel
+from vanna_lgx.utils.query_executor import execute_bounded, ResultHandle
+from vanna_lgx.utils.index_advisor import log_statement
+from vanna_lgx.utils.sql_validator import validate_sql, format_issues
+from vanna_lgx.utils.chart_utils import build_chart_spec
+from vanna_lgx.utils.llm_utils import generate
+from vanna_lgx.utils.retrieval import query_collections, start_prefetch, take_prefetch, discard_prefetch, documents, distances
+from vanna_lgx.utils.context_packer import pack_context
+from vanna_lgx.utils.schema_index import prune_schema
+from vanna_lgx.utils.reranker import rerank_text, schema_vocabulary, score_candidates, split_candidates
+from vanna_lgx.utils.sessions import is_follow_up
 from vanna_lgx.config import (
-    OLLAMA_BASE_URL,
-    SYNTHESIS_MODEL,
-    EMBEDDING_MODEL,
-    CHROMA_PATH,
+    CHART_LLM_FALLBACK,
+    COLUMN_INDEX_ENABLED,
+    COLUMN_RETRIEVAL_K,
+    RERANK_KEEP_THRESHOLD,
+    RERANK_LLM_JUDGE,
+    REWRITE_FAST_PATH,
+    SESSION_PREVIOUS_ROWS,
+    SQL_WORKLOAD_LOG_ENABLED,
 )
 
-# --- Initialize Constants and Clients ---
-SCHEMA_INFO = get_schema_info()
+# --- Constants ---
+# Clients (LLM, embeddings, tokenizer, vector store, schema info, SQL templates, answer cache) are created lazily
+# by `get_resources()` on first use, so importing this module has no side effects.
 MAX_REPAIR_ATTEMPTS = 2
 
-llm = Ollama(base_url=OLLAMA_BASE_URL, model=SYNTHESIS_MODEL)
-embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-tokenizer = tiktoken.get_encoding("cl100k_base")
 
-chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-ddl_collection = chroma_client.get_collection(name="ddl")
-sql_collection = chroma_client.get_collection(name="sql_examples")
-docs_collection = chroma_client.get_collection(name="docs")
+# The keys a turn computes; they are cleared when a session's next turn starts
+TURN_DEFAULTS = {
+    "cache_hit": False, "cache_similarity": None, "cached_question": None, "question_embedding": None,
+    "rewrite": None, "template": None, "db_schema": "", "retrieved_examples": [], "retrieved_docs": [],
+    "clean_context": {}, "retrieval_timings": {}, "retrieval_distances": {}, "schema_pruning": {},
+    "rerank": None, "context_packing": None, "sql_query": "", "validation_error": None, "validation_issues": [],
+    "repair_feedback": "", "repair_attempts": 0, "result": None, "result_info": None, "result_handle": None,
+    "summary": None, "visualization_spec": None, "error": None,
+}
+
+
+def full_question(state: GraphState) -> str:
+    """The question including what a follow-up refines, e.g. for the SQL and summary prompts."""
+    if state.get("follow_up"):
+        return f"{state['previous_turn']['question']} Follow-up: {state['question']}"
+    return state['question']
+
+
+# --- Session Nodes ---
+def start_turn(state: GraphState) -> GraphState:
+    """
+    Entry Node: Starts a turn. In a session (a checkpointed thread) the state still holds the
+    previous turn: an answered one is kept in `previous_turn`, the per-turn keys are reset, and
+    a question that reads like a refinement of it is marked as a follow-up.
+    """
+    print("--- Session Node: Start Turn ---")
+    question = state['question']
+    turn = state.get("turn") or {}
+    previous_turn = state.get("previous_turn")
+    result_df = state.get("result")
+    answered = turn and state.get("sql_query") and result_df is not None and not (state.get("error") or state.get("validation_error"))
+    if answered:
+        previous_turn = {
+            "question": turn["question"],
+            "sql_query": state["sql_query"].strip(),
+            "clean_context": state.get("clean_context") or {},
+            "schema_pruning": state.get("schema_pruning") or {},
+            "retrieval_distances": state.get("retrieval_distances") or {},
+            "columns": [str(c) for c in result_df.columns],
+            "rows": len(result_df),
+            "preview": result_df.head(SESSION_PREVIOUS_ROWS).to_string(index=False),
+        }
+
+    follow_up = previous_turn is not None and is_follow_up(question)
+    state = {**state, **TURN_DEFAULTS, "rewritten_question": question, "llm_ttft": None, "run_id": uuid.uuid4().hex,
+             "turn": {"number": turn.get("number", 0) + 1, "question": question},
+             "previous_turn": previous_turn, "follow_up": follow_up}
+    if follow_up:
+        state["turn"]["question"] = state["rewritten_question"] = full_question(state)
+        print(f"   - Turn {state['turn']['number']}: follow-up to '{previous_turn['question']}'")
+    elif turn:
+        print(f"   - Turn {state['turn']['number']}: new question.")
+    return state
+
+
+def reuse_context(state: GraphState) -> GraphState:
+    """
+    Follow-up Node: Reuses the previous turn's judged context instead of rewriting, retrieving
+    and judging again. When its DDL was pruned, the columns the follow-up needs are added back
+    from a single column-index query.
+    """
+    print("--- Session Node: Reuse Context ---")
+    resources = get_resources()
+    previous = state['previous_turn']
+    clean_context = dict(previous['clean_context'])
+    retrieval_distances = dict(previous['retrieval_distances'])
+    schema_pruning = dict(previous['schema_pruning'])
+    timings = {}
+
+    columns_collection = resources.optional_collection("columns") if COLUMN_INDEX_ENABLED else None
+    if schema_pruning and columns_collection is not None:
+        embedding = resources.embeddings.embed_documents([state['question']])[0]
+        results, timings = query_collections(embedding, {"columns": (columns_collection, COLUMN_RETRIEVAL_K)})
+        column_hits = (results["columns"].get("metadatas") or [[]])[0]
+        pruned = []  # (position, table) of the DDLs the previous turn pruned
+        for i, ddl in enumerate(clean_context["ddl"]):
+            match = re.search(r"CREATE TABLE\s+[\"`\[]?(\w+)", ddl)
+            if match and match.group(1) in schema_pruning:
+                pruned.append((i, match.group(1)))
+        # Keep what the previous turn kept and used, plus what the follow-up asks for
+        mentioned = " ".join(c for report in schema_pruning.values() for c in report["kept_columns"])
+        ddls, report = prune_schema([table for _, table in pruned], [clean_context["ddl"][i] for i, _ in pruned],
+                                    column_hits, resources.column_info, f"{mentioned} {previous['sql_query']} {state['question']}")
+        clean_context["ddl"] = list(clean_context["ddl"])
+        for (i, _), ddl in zip(pruned, ddls):
+            retrieval_distances[ddl] = retrieval_distances.get(clean_context["ddl"][i])
+            clean_context["ddl"][i] = ddl
+        schema_pruning.update(report)
+        for table, table_report in report.items():
+            print(f"   - Re-pruned {table} to {len(table_report['kept_columns'])}/{table_report['total_columns']} columns.")
+
+    print(f"   - Reusing {len(clean_context.get('ddl', []))} DDLs, {len(clean_context.get('examples', []))} examples, "
+          f"{len(clean_context.get('docs', []))} docs from the previous turn.")
+    return {**state, "clean_context": clean_context, "db_schema": "\n\n".join(clean_context.get("ddl", [])),
+            "retrieval_distances": retrieval_distances, "schema_pruning": schema_pruning, "retrieval_timings": timings}
+
+
+# --- Answer Cache Nodes ---
+def answer_cache_lookup(state: GraphState) -> GraphState:
+    """
+    Entry Node: Serves exact or near-duplicate questions from the persistent answer cache.
+    The question embedding is kept in the state so the rewriter and the cache store can reuse it.
+    """
+    print("--- Cache Node: Answer Cache Lookup ---")
+    resources = get_resources()
+    question = state['question']
+    question_embedding = resources.embeddings.embed_documents([question])[0]
+    state = {**state, "question_embedding": question_embedding, "cache_hit": False}
+
+    # The rewriter's glossary lookup only needs this embedding, so it runs in the
+    # background while the cache is being searched; unless the LLM rewrite will be skipped.
+    if not REWRITE_FAST_PATH or resources.question_rewriter.needs_llm(question):
+        start_prefetch(state["run_id"], question_embedding, {"rewriter_docs": (resources.collection("docs"), 2)})
+
+    answer_cache = resources.answer_cache
+    if answer_cache is None:
+        return state
+
+    cached = answer_cache.get(question, question_embedding)
+    if cached is None:
+        print("   - Cache miss.")
+        return state
+
+    discard_prefetch(state["run_id"])
+    print(f"   - Cache hit (similarity {cached['cache_similarity']:.3f}) for: '{cached['cached_question']}'")
+    return {**state, **cached, "cache_hit": True, "error": None, "validation_error": None}
+
+
+def answer_cache_store(state: GraphState) -> GraphState:
+    """
+    Final Node: Stores successful, freshly computed answers in the answer cache, and learns
+    an SQL template from the synthesized SQL when it returned rows.
+    """
+    print("--- Cache Node: Answer Cache Store ---")
+    resources = get_resources()
+    if state.get("cache_hit") or state.get("follow_up"):
+        return state  # A follow-up's answer depends on the session, not only on its question
+    if state.get("error") or state.get("validation_error") or state.get("result") is None:
+        print("   - Skipping cache store for an unsuccessful answer.")
+        return state
+
+    sql_templates = resources.sql_templates
+    if sql_templates is not None and not state.get("template") and not state["result"].empty:
+        try:
+            if learned := sql_templates.learn(state['question'], state['sql_query']):
+                print(f"   - Learned an SQL template with {len(learned['slots'])} slot(s).")
+        except OSError as e:
+            print(f"   - Could not save the learned SQL template: {e}")
+
+    answer_cache = resources.answer_cache
+    if answer_cache is None:
+        return state
+    answer_cache.put(state['question'], state['question_embedding'], state)
+    print("   - Answer stored in cache.")
+    return state
+
+
+# --- SQL Template Node ---
+def match_sql_template(state: GraphState) -> GraphState:
+    """
+    Fast-path Node: Fills the SQL template (see utils.sql_templates) the question matches with
+    high confidence, so it goes straight to validation and execution without rewriting,
+    retrieval or the synthesis LLM. A filled SQL the validator rejects takes the normal path.
+    """
+    print("--- Template Node: Match SQL Template ---")
+    resources = get_resources()
+    sql_templates = resources.sql_templates
+    if sql_templates is None:
+        return {**state, "template": None}
+
+    question = state['question']
+    match = sql_templates.match(question)
+    if match is None:
+        print("   - No template matches closely enough.")
+        return {**state, "template": None}
+
+    with get_pool().connection() as conn:
+        issues = validate_sql(match["sql"], resources.schema_info, conn)
+    if issues:
+        print(f"   - Template SQL rejected ({format_issues(issues)}); synthesizing instead.")
+        return {**state, "template": None}
+
+    discard_prefetch(state["run_id"])
+    template = {key: match[key] for key in ("source", "template_question", "similarity", "slots")}
+    print(f"   - Matched {match['source']} template (similarity {match['similarity']:.2f}): '{match['template_question']}'")
+    print(f"Template SQL: {match['sql']}")
+    return {**state, "template": template, "sql_query": match["sql"], "rewritten_question": question,
+            "validation_error": None}
 
 
 # --- S5: NEW NODE - Query Rewriter (Your Idea!) ---
 def query_rewriter(state: GraphState) -> GraphState:
     """
     S5.1 Node: Rewrites the user's question for clarity and better retrieval.
-    It uses the 'docs' collection (glossary) to inform the rewrite.
+    Glossary aliases are expanded by rules first (see utils.question_rewriter); the LLM, informed
+    by the 'docs' collection (glossary), only rewrites questions that are still not explicit enough.
+    Rewrites are memoized per normalized question.
     """
     print("--- S5 Node: Query Rewriter ---")
+    resources = get_resources()
     question = state['question']
+    rewriter = resources.question_rewriter
+
+    memoized = rewriter.recall(question)
+    if memoized is not None:
+        discard_prefetch(state["run_id"])
+        print(f"   - Memoized {memoized['method']} rewrite: '{memoized['rewritten_question']}'")
+        return {**state, "rewritten_question": memoized["rewritten_question"],
+                "rewrite": {**memoized["rewrite"], "memoized": True}}
+
+    fast = rewriter.rewrite(question)
+    rewrite = {"method": "rules", "score": fast["score"], "expansions": fast["expansions"], "memoized": False}
+    print(f"   - Explicitness score {fast['score']:.2f}; expanded {[e['alias'] for e in fast['expansions']]}, unknown {fast['unknown']}")
+    if REWRITE_FAST_PATH and fast["confident"]:
+        discard_prefetch(state["run_id"])
+        print(f"   - Rewritten by rules, skipping the LLM: '{fast['question']}'")
+        rewriter.remember(question, {"method": "rules", "rewritten_question": fast["question"], "rewrite": rewrite})
+        return {**state, "rewritten_question": fast["question"], "rewrite": rewrite}
+
+    # The glossary lookup was normally prefetched by the cache lookup node; fall back to
+    # the robust, explicit embedding pattern when it was not.
+    prefetched = take_prefetch(state["run_id"])
+    if prefetched is None:
+        print("   - Generating embedding for docs retrieval...")
+        query_embedding_for_docs = state.get('question_embedding') or resources.embeddings.embed_documents([question])[0]
+        prefetched = query_collections(query_embedding_for_docs, {"rewriter_docs": (resources.collection("docs"), 2)})
+    docs_results, docs_timings = prefetched
+    print(f"   - Glossary lookup took {docs_timings['rewriter_docs']:.1f} ms.")
     
-    # --- THIS IS THE FIX ---
-    # We must use the robust, explicit embedding pattern to query the docs collection.
-    print("   - Generating embedding for docs retrieval...")
-    query_embedding_for_docs = embeddings.embed_documents([question])[0]
-    docs_results = docs_collection.query(
-        query_embeddings=[query_embedding_for_docs], 
-        n_results=2
-    )
-    # --- END OF FIX ---
-    
-    retrieved_docs = docs_results.get('documents', [[]])[0]
+    retrieved_docs = documents(docs_results["rewriter_docs"])
     docs_context = "\n".join(retrieved_docs)
 
     rewrite_prompt = f"""You are an expert system that rewrites a user's question to be more clear, specific, and optimized for a database query.
@@ -69,54 +284,82 @@ Rewrite the user's question. Do not answer it, just improve it by making it more
 **Rewritten Question:**
 """
     
-    rewritten_question = llm.invoke(rewrite_prompt).strip()
+    rewritten_question, ttft_ms = generate(resources.llm, rewrite_prompt, "query_rewriter")
+    rewritten_question = rewritten_question.strip()
     print(f"   - Original Question: '{question}'")
-    print(f"   - Rewritten Question: '{rewritten_question}'")
-    
-    return {**state, "rewritten_question": rewritten_question}
+    print(f"   - Rewritten Question: '{rewritten_question}' (first token after {ttft_ms:.0f} ms)")
+    if rewritten_question:
+        rewrite = {**rewrite, "method": "llm"}
+        rewriter.remember(question, {"method": "llm", "rewritten_question": rewritten_question, "rewrite": rewrite})
+    else:
+        rewritten_question = fast["question"]
+
+    return {
+        **state,
+        "rewritten_question": rewritten_question,
+        "rewrite": rewrite,
+        "llm_ttft": {"query_rewriter": ttft_ms},
+        "retrieval_timings": {"rewriter_docs": docs_timings["rewriter_docs"]},
+    }
 
 
 def retrieve_context(state: GraphState) -> GraphState:
     """ S5 Node: Retrieves context using the REWRITTEN question. """
     print("--- S5 Node: Retrieve Context ---")
+    resources = get_resources()
     question = state['rewritten_question']
     
     print("   - Generating explicit query embedding...")
-    query_embedding = embeddings.embed_documents([question])[0]
+    query_embedding = resources.embeddings.embed_documents([question])[0]
     
-    ddl_results = ddl_collection.query(query_embeddings=[query_embedding], n_results=3)
-    example_results = sql_collection.query(query_embeddings=[query_embedding], n_results=3)
-    docs_results = docs_collection.query(query_embeddings=[query_embedding], n_results=3)
-
-    retrieved_ddls = ddl_results.get('documents', [[]])[0]
-    retrieved_examples = example_results.get('documents', [[]])[0]
-    retrieved_docs = docs_results.get('documents', [[]])[0]
+    requests = {
+        "ddl": (resources.collection("ddl"), 3),
+        "sql_examples": (resources.collection("sql_examples"), 3),
+        "docs": (resources.collection("docs"), 3),
+    }
+    columns_collection = resources.optional_collection("columns") if COLUMN_INDEX_ENABLED else None
+    if columns_collection is not None:
+        requests["columns"] = (columns_collection, COLUMN_RETRIEVAL_K)
+    results, timings = query_collections(query_embedding, requests)
+
+    retrieved_ddls = documents(results["ddl"])
+    retrieved_examples = documents(results["sql_examples"])
+    retrieved_docs = documents(results["docs"])
+    retrieval_distances = {}
+    for label in ("ddl", "sql_examples", "docs"):
+        retrieval_distances.update(distances(results[label]))
+
+    # Wide tables: keep only the key columns and the columns relevant to the question
+    schema_pruning = {}
+    if "columns" in results:
+        tables = (results["ddl"].get("ids") or [[]])[0]
+        column_hits = (results["columns"].get("metadatas") or [[]])[0]
+        pruned_ddls, schema_pruning = prune_schema(tables, retrieved_ddls, column_hits, resources.column_info,
+                                                   "\n".join(retrieved_examples))
+        for full_ddl, pruned_ddl in zip(retrieved_ddls, pruned_ddls):
+            retrieval_distances[pruned_ddl] = retrieval_distances.get(full_ddl)
+        retrieved_ddls = pruned_ddls
+        for table, report in schema_pruning.items():
+            print(f"   - Pruned {table} to {len(report['kept_columns'])}/{report['total_columns']} columns.")
 
     print(f"   - Retrieved {len(retrieved_ddls)} DDLs, {len(retrieved_examples)} examples, {len(retrieved_docs)} docs.")
+    print("   - Retrieval timings: " + ", ".join(f"{label}={ms:.1f} ms" for label, ms in timings.items()))
     
     return {
         **state,
+        "retrieval_timings": {**state.get("retrieval_timings", {}), **timings},
         "db_schema": "\n\n".join(retrieved_ddls),
         "retrieved_examples": retrieved_examples,
-        "retrieved_docs": retrieved_docs
+        "retrieved_docs": retrieved_docs,
+        "retrieval_distances": retrieval_distances,
+        "schema_pruning": schema_pruning,
     }
 
 
-def rerank_and_judge(state: GraphState) -> GraphState:
-    """ S5 Node: Robust, index-based judge that always keeps retrieved DDL. """
-    print("--- S5 Node: Rerank and Judge ---")
-    question = state['rewritten_question']
-    
-    retrieved_ddls = state['db_schema'].split("\n\n")
-    other_docs = state['retrieved_docs'] + state['retrieved_examples']
-    other_docs = [doc for doc in other_docs if doc.strip()]
-
-    if not other_docs:
-        clean_context = {"ddl": retrieved_ddls, "examples": [], "docs": []}
-        return {**state, "clean_context": clean_context}
-
+def _judge(question: str, docs: List[str]) -> List[int]:
+    """Asks the LLM which of the (ambiguous) documents to keep; raises when the answer is unusable."""
     indexed_context = ""
-    for i, doc in enumerate(other_docs):
+    for i, doc in enumerate(docs):
         indexed_context += f"--- Document {i} ---\n{doc}\n\n"
 
     judge_prompt = f"""You are a data analyst acting as a context judge. The user wants to query a telecom database. The primary table schema has been automatically included. Your task is to evaluate additional documents (SQL examples, business rules) and decide if they are relevant for answering the user's question.
@@ -130,49 +373,117 @@ def rerank_and_judge(state: GraphState) -> GraphState:
 
 **Your JSON Response:**
 """
-    try:
-        print("   - Asking LLM Judge to evaluate Examples and Docs...")
-        response_str = llm.invoke(judge_prompt)
-        json_start = response_str.find('{'); json_end = response_str.rfind('}') + 1
-        judgement = json.loads(response_str[json_start:json_end])
-        keep_indices = judgement.get('keep_indices', [])
-        
-        print(f"   - Judge decided to keep indices: {keep_indices}")
-        
-        kept_docs = [other_docs[i] for i in keep_indices if i < len(other_docs)]
-        
-        clean_context = {
-            "ddl": retrieved_ddls, 
-            "examples": [doc for doc in kept_docs if doc.strip().upper().startswith("QUESTION:")],
-            "docs": [doc for doc in kept_docs if not doc.strip().upper().startswith("QUESTION:")]
-        }
-        
-        print(f"   - Assembled {len(clean_context['ddl'])} DDLs, {len(clean_context['examples'])} examples, {len(clean_context['docs'])} docs.")
-        return {**state, "clean_context": clean_context}
-    except Exception as e:
-        print(f"Error during context judgement: {e}")
-        clean_context = { "ddl": retrieved_ddls, "examples": state["retrieved_examples"], "docs": state["retrieved_docs"]}
-        return {**state, "error": "LLM Judge failed.", "clean_context": clean_context}
+    response_str, _ = generate(get_resources().llm, judge_prompt, "rerank_and_judge", stream=False)
+    json_start = response_str.find('{'); json_end = response_str.rfind('}') + 1
+    keep_indices = json.loads(response_str[json_start:json_end]).get('keep_indices')
+    if not isinstance(keep_indices, list):
+        raise ValueError(f"no keep_indices list in {response_str[:80]!r}")
+    return [i for i in keep_indices if isinstance(i, int) and 0 <= i < len(docs)]
+
+
+def rerank_and_judge(state: GraphState) -> GraphState:
+    """
+    S5 Node: Always keeps the retrieved DDL and reranks the examples and docs locally, by
+    embedding cosine and BM25 over table and column names (see utils.reranker). Only the
+    candidates scoring close to the keep threshold are sent to the LLM judge. The scores are
+    stored in `clean_context["scores"]` for the context packer.
+    """
+    print("--- S5 Node: Rerank and Judge ---")
+    resources = get_resources()
+    question = state['rewritten_question']
+    
+    retrieved_ddls = state['db_schema'].split("\n\n")
+    other_docs = state['retrieved_docs'] + state['retrieved_examples']
+    other_docs = [doc for doc in other_docs if doc.strip()]
+
+    if not other_docs:
+        clean_context = {"ddl": retrieved_ddls, "examples": [], "docs": [], "scores": {}}
+        return {**state, "clean_context": clean_context, "rerank": {"candidates": 0, "judged": 0, "judge": "skipped"}}
+
+    # The rewritten question was embedded for retrieval and the candidates at ingestion, so these are cache hits
+    vectors = resources.embeddings.embed_documents([question] + [rerank_text(doc) for doc in other_docs])
+    scored = score_candidates(question, vectors[0], other_docs, vectors[1:], schema_vocabulary(resources.schema_info))
+    keep, drop, ambiguous = split_candidates(scored)
+    for i, (doc, s) in enumerate(zip(other_docs, scored)):
+        print(f"   - [{i}] score {s['score']:.2f} (semantic {s['semantic']:.2f}, lexical {s['lexical']:.2f}): {doc.strip().splitlines()[0][:60]}")
+    print(f"   - Keeping {len(keep)}, dropping {len(drop)}, {len(ambiguous)} ambiguous.")
+
+    judge = "skipped"
+    if ambiguous and RERANK_LLM_JUDGE:
+        try:
+            print("   - Asking LLM Judge about the ambiguous candidates...")
+            kept_indices = _judge(question, [other_docs[i] for i in ambiguous])
+            print(f"   - Judge decided to keep indices: {kept_indices}")
+            keep += [ambiguous[i] for i in kept_indices]
+            judge = "ok"
+        except Exception as e:
+            print(f"   - LLM judge failed ({e}); deciding the ambiguous candidates by the threshold.")
+            judge = "failed"
+    if ambiguous and judge != "ok":
+        keep += [i for i in ambiguous if scored[i]["score"] >= RERANK_KEEP_THRESHOLD]
+
+    kept_docs = [other_docs[i] for i in sorted(set(keep))]
+    clean_context = {
+        "ddl": retrieved_ddls, 
+        "examples": [doc for doc in kept_docs if doc.strip().upper().startswith("QUESTION:")],
+        "docs": [doc for doc in kept_docs if not doc.strip().upper().startswith("QUESTION:")],
+        "scores": {doc: s["score"] for doc, s in zip(other_docs, scored)},
+    }
+    print(f"   - Assembled {len(clean_context['ddl'])} DDLs, {len(clean_context['examples'])} examples, {len(clean_context['docs'])} docs.")
+    return {**state, "clean_context": clean_context,
+            "rerank": {"candidates": len(other_docs), "judged": len(ambiguous), "judge": judge}}
 
 
 def synthesize_sql(state: GraphState) -> GraphState:
     """ S5 Node: Generates or refines SQL using rewritten question and judged context. """
     if state.get("repair_attempts", 0) > 0:
         print("--- S5 Node: Refine SQL (Repair Attempt) ---")
-        error_context = f"The previous SQL had an error: '{state['validation_error']}'. Please fix it."
+        error_context = f"""The previous SQL query was rejected before execution:
+```sql
+{state.get('sql_query', '')}
+```
+Problems found:
+{state.get('repair_feedback') or state['validation_error']}
+Please fix these problems."""
         prompt_title = "**Corrected SQL Query:**"
     else:
         print("--- S5 Node: Synthesize SQL ---")
         error_context = ""
         prompt_title = "**SQL Query:**"
 
-    question = state['rewritten_question']
+    if state.get("follow_up"):
+        previous = state['previous_turn']
+        follow_up_context = f"""This question follows up on: "{previous['question']}"
+That question was answered with this SQL query:
+```sql
+{previous['sql_query']}
+```
+It returned {previous['rows']} row(s) with the columns {', '.join(previous['columns'])}, e.g.:
+{previous['preview']}
+Refine this query for the follow-up instead of starting over.
+"""
+        question = state['question']
+    else:
+        follow_up_context = ""
+        question = state['rewritten_question']
+    resources = get_resources()
+    # Fit schema, examples and docs into the token budget, most relevant first
     clean_context = state.get('clean_context', {})
-    db_schema = "\n\n".join(clean_context.get("ddl", []))
-    examples = "\n\n".join(clean_context.get("examples", []))
+    packed, packing = pack_context(clean_context, resources.tokenizer, state.get('retrieval_distances'),
+                                   clean_context.get('scores'))
+    db_schema = "\n\n".join(packed["ddl"])
+    examples = "\n\n".join(packed["examples"])
+    docs = "\n\n".join(packed["docs"])
+    print(f"   - Packed context: {packing['used_tokens']}/{packing['budget']} tokens "
+          f"({packing['input_tokens']} retrieved), {len(packing['truncated'])} truncated, {len(packing['dropped'])} dropped.")
 
     if not db_schema:
-        return {**state, "sql_query": "", "error": "Judge discarded all DDL context."}
+        return {**state, "sql_query": "", "error": "Judge discarded all DDL context.", "context_packing": packing}
+    docs_section = f"""**Business Rules / Glossary:**
+---
+{docs}
+---
+""" if docs else ""
 
     prompt = f"""You are an expert SQLite analyst. Create a single, executable query.
 {error_context}
@@ -186,115 +497,168 @@ Use the verified context below to answer the user's question.
 ---
 {examples}
 ---
-**User Question:**
+{docs_section}{follow_up_context}**User Question:**
 {question}
 
 {prompt_title}
 """
-    token_count = len(tokenizer.encode(prompt))
+    token_count = len(resources.tokenizer.encode(prompt))
     print(f"   - Prompt token count: {token_count}")
     try:
-        sql_query = llm.invoke(prompt)
+        sql_query, ttft_ms = generate(resources.llm, prompt, "synthesize_sql")
         cleaned_sql = sql_query.strip().replace("```sql", "").replace("```", "")
         print(f"Generated SQL: {cleaned_sql}")
-        return {**state, "sql_query": cleaned_sql, "validation_error": None}
+        print(f"   - First token after {ttft_ms:.0f} ms")
+        return {**state, "sql_query": cleaned_sql, "validation_error": None, "context_packing": packing,
+                "llm_ttft": {"synthesize_sql": ttft_ms}}
     except Exception as e:
-        return {**state, "error": f"Failed to generate SQL: {e}"}
+        return {**state, "error": f"Failed to generate SQL: {e}", "context_packing": packing}
 
 
 def sql_linter_verifier(state: GraphState) -> GraphState:
-    """ S4 Node: Performs static checks on the SQL for common errors. """
-    print("--- S4 Node: SQL Linter/Verifier ---")
+    """
+    S6 Node: Validates the SQL before execution. Table, alias and column references are
+    resolved against the schema (including aliases and CTEs), then the statement is compiled
+    with EXPLAIN on a read-only connection, without running it. Problems are returned as
+    structured `validation_issues` for the repair loop.
+    """
+    print("--- S6 Node: SQL Validator ---")
     if state.get("error"): return state
     
     sql = state.get("sql_query", "").strip()
     if not sql:
-        return {**state, "validation_error": None}
+        return {**state, "validation_error": None, "validation_issues": []}
 
-    used_tables = re.findall(r'FROM\s+([`"\']?\w+[`"\']?)|JOIN\s+([`"\']?\w+[`"\']?)', sql, re.IGNORECASE)
-    used_tables_flat = {t.strip('`"\'') for pair in used_tables for t in pair if t}
-    
-    for table in used_tables_flat:
-        if table not in SCHEMA_INFO:
-            error = f"Validation Error: Table '{table}' does not exist."
-            print(f"   - {error}")
-            return {**state, "validation_error": error}
+    with get_pool().connection() as conn:
+        issues = validate_sql(sql, get_resources().schema_info, conn)
+
+    if issues:
+        error = "Validation Error: " + " ".join(issue["message"] for issue in issues)
+        print(f"   - {error}")
+        return {**state, "validation_error": error, "validation_issues": issues}
     
-    print("   - SQL passed basic static checks.")
-    return {**state, "validation_error": None}
+    print("   - SQL resolved against the schema and compiled successfully.")
+    return {**state, "validation_error": None, "validation_issues": []}
 
 
 def auto_repair(state: GraphState) -> GraphState:
-    """ S4 Node: Increments the repair counter. """
-    print("--- S4 Node: Auto-Repair ---")
+    """ S6 Node: Increments the repair counter and turns the validation issues into repair feedback. """
+    print("--- S6 Node: Auto-Repair ---")
     attempts = state.get("repair_attempts", 0) + 1
     print(f"   - Repair attempt #{attempts}")
-    return {**state, "repair_attempts": attempts}
+    issues = state.get("validation_issues") or []
+    repair_feedback = format_issues(issues) if issues else state.get("validation_error", "")
+    return {**state, "repair_attempts": attempts, "repair_feedback": repair_feedback}
 
 
 def execute_sql(state: GraphState) -> GraphState:
-    """ S4 Node: Executes the final SQL query. """
-    print("--- S4 Node: Execute SQL ---")
+    """
+    S7 Node: Executes the final SQL query under a timeout and a row / memory budget.
+    SQL that normalizes to an already executed statement is served from the result cache
+    while the database is unchanged. Truncation is reported in `result_info`; the complete
+    result stays available through the lazy `result_handle` for exports.
+    """
+    print("--- S7 Node: Execute SQL ---")
     if state.get("error"): return state
     sql_query = state.get('sql_query')
     if not sql_query: 
         return {**state, "summary": "No SQL query was generated to execute."}
 
-    conn = get_db_connection()
     try:
-        result_df = pd.read_sql_query(sql_query, conn)
-        print(f"Execution successful. Result shape: {result_df.shape}")
-        return {**state, "result": result_df}
+        result_cache = get_resources().result_cache
+        # A cancelled run interrupts its statement, so the pooled connection is freed at once
+        with get_pool().connection() as conn, on_cancel(conn.interrupt):
+            if result_cache is not None:
+                result_df, result_info = result_cache.execute(sql_query, conn)
+            else:
+                result_df, result_info = execute_bounded(sql_query, conn)
+        if SQL_WORKLOAD_LOG_ENABLED and not result_info.get("cached"):
+            try:
+                log_statement(sql_query, result_info)
+            except OSError as e:
+                print(f"   - Could not log the statement for the index advisor: {e}")
+        source = " (result cache)" if result_info.get("cached") else ""
+        print(f"Execution successful. Result shape: {result_df.shape} in {result_info['elapsed_ms']:.1f} ms{source}")
+        if result_info["truncated"]:
+            print(f"   - Result truncated ({result_info['truncation_reason']}) after {result_info['rows']} rows.")
+        return {**state, "result": result_df, "result_info": result_info, "result_handle": ResultHandle(sql_query)}
     except Exception as e:
         print(f"Error during SQL execution: {e}")
         return {**state, "error": f"SQL Execution Failed: {str(e)}"}
-    finally:
-        conn.close()
 
 
-def summarize_and_visualize(state: GraphState) -> GraphState:
-    """ S5 Node: Creates a text summary and a Vega-Lite chart spec if possible. """
-    print("--- S5 Node: Summarize and Visualize ---")
+def summarize_result(state: GraphState) -> dict:
+    """
+    S5 Node: Creates a text summary of the result.
+    Runs in parallel with `visualize_result`, so it returns only the keys it owns.
+    """
+    print("--- S5 Node: Summarize Result ---")
     if error := (state.get("validation_error") or state.get("error")):
         summary = f"I could not successfully answer the question. The final error was: {error}"
         print(summary)
-        return {**state, "summary": summary}
+        return {"summary": summary}
     
-    question = state['question']
+    question = full_question(state)
     result_df = state.get('result') 
     
-    if result_df is None: return {**state, "summary": "The query did not produce a result."}
-    if result_df.empty: return {**state, "summary": "The query ran successfully but returned no results."}
+    if result_df is None: return {"summary": "The query did not produce a result."}
+    if result_df.empty: return {"summary": "The query ran successfully but returned no results."}
     
-    # 1. Generate Text Summary
-    summary_prompt = f"User question: '{question}'.\nQuery result:\n{result_df.to_string(max_rows=10)}\nProvide a concise, natural language summary of the result.\n**Summary:**"
-    summary = llm.invoke(summary_prompt).strip()
+    result_info = state.get('result_info') or {}
+    truncation_note = ""
+    if result_info.get("truncated"):
+        truncation_note = f"\nNote: the result was truncated to the first {result_info['rows']} rows ({result_info['truncation_reason']})."
+    summary_prompt = f"User question: '{question}'.\nQuery result:\n{result_df.to_string(max_rows=10)}{truncation_note}\nProvide a concise, natural language summary of the result.\n**Summary:**"
+    summary, ttft_ms = generate(get_resources().llm, summary_prompt, "summarize_result")
+    summary = summary.strip()
+    if truncation_note:
+        summary += f"\n\n_{truncation_note.strip()}_"
     print(f"Generated Summary: {summary}")
-    state['summary'] = summary
+    print(f"   - First token after {ttft_ms:.0f} ms")
+    return {"summary": summary, "llm_ttft": {"summarize_result": ttft_ms}}
+
+
+def visualize_result(state: GraphState) -> dict:
+    """
+    S5 Node: Creates a Vega-Lite chart spec if the result is suitable.
+    Specs are built by rules from the result's shape and dtypes; the LLM is only asked
+    for shapes the rules do not cover, and only when CHART_LLM_FALLBACK is enabled.
+    Runs in parallel with `summarize_result`, so it returns only the keys it owns.
+    """
+    print("--- S5 Node: Visualize Result ---")
+    question = state['question']
+    result_df = state.get('result')
+    if state.get("error") or result_df is None or result_df.empty:
+        return {"visualization_spec": None}
+
+    vis_spec = build_chart_spec(result_df, question)
+    if vis_spec is not None:
+        mark = vis_spec['mark'] if isinstance(vis_spec['mark'], str) else vis_spec['mark']['type']
+        print(f"   - Built Vega-Lite spec from rules (mark: {mark}).")
+        return {"visualization_spec": vis_spec}
+
+    if not CHART_LLM_FALLBACK or not (1 < len(result_df) <= 30):
+        print("   - Result shape is not chartable by rules; skipping visualization.")
+        return {"visualization_spec": None}
 
-    # 2. Attempt to Generate Visualization
-    vis_spec = None
     try:
-        if 1 < len(result_df) <= 30 and len(result_df.columns) == 2:
-            cols = result_df.columns
-            if pd.api.types.is_string_dtype(result_df[cols[0]]) and pd.api.types.is_numeric_dtype(result_df[cols[1]]):
-                print("   - Data is suitable for visualization. Generating chart spec...")
-                data_for_prompt = result_df.to_dict(orient='records')
-                vis_prompt = f"""Create a Vega-Lite JSON spec for a bar chart for this data.
-- The x-axis should be '{cols[0]}', type nominal, with a title.
-- The y-axis should be '{cols[1]}', type quantitative, with a title.
+        print("   - No chart rule matches. Asking the LLM for a chart spec...")
+        data_for_prompt = json.loads(result_df.to_json(orient='records', date_format='iso'))
+        vis_prompt = f"""Create a Vega-Lite JSON spec for the chart that best represents this data.
+- Columns: {', '.join(f"'{c}' ({result_df[c].dtype})" for c in result_df.columns)}
+- Give every axis a title.
 - Title: "{question}"
 Data:
 {json.dumps(data_for_prompt)}
 
 Vega-Lite JSON Spec:
 """
-                vis_response = llm.invoke(vis_prompt)
-                json_start = vis_response.find('{'); json_end = vis_response.rfind('}') + 1
-                vis_spec = json.loads(vis_response[json_start:json_end])
-                print("   - Successfully generated Vega-Lite spec.")
+        vis_response, _ = generate(get_resources().llm, vis_prompt, "visualize_result", stream=False)
+        json_start = vis_response.find('{'); json_end = vis_response.rfind('}') + 1
+        vis_spec = json.loads(vis_response[json_start:json_end])
+        print("   - Successfully generated Vega-Lite spec.")
     except Exception as e:
         print(f"   - Visualization generation failed: {e}")
         vis_spec = None
 
-    return {**state, "visualization_spec": vis_spec}
\ No newline at end of file
+    return {"visualization_spec": vis_spec}
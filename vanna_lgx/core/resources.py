@@ -0,0 +1,192 @@
+# vanna_lgx/core/resources.py
+
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from vanna_lgx.config import (
+    OLLAMA_BASE_URL,
+    SYNTHESIS_MODEL,
+    ANSWER_CACHE_ENABLED,
+    RESULT_CACHE_ENABLED,
+    SQL_TEMPLATES_ENABLED,
+    COLUMN_INDEX_ENABLED,
+)
+
+_MISSING = object()
+
+
+class ApproximateTokenizer:
+    """Counts words and punctuation marks; a stand-in when the tiktoken encoding cannot be loaded."""
+
+    def encode(self, text: str) -> List[str]:
+        return re.findall(r"\w+|[^\w\s]", text)
+
+
+class AgentResources:
+    """
+    The clients and lookups shared by the agent nodes: schema info, the Ollama LLM and
+    embedding clients, the tokenizer, the vector store collections, the question rewriter,
+    the SQL templates, the answer cache and the SQL result cache.
+
+    Nothing is created at import time. Each resource is built on first access (thread-safely)
+    and can be injected through the constructor instead, e.g. in tests or benchmarks.
+    `warm_up` builds everything ahead of the first question, optionally in the background.
+    """
+
+    def __init__(self, **overrides):
+        self._values: Dict[str, object] = dict(overrides)
+        self._lock = threading.RLock()
+        self.warm_up_seconds: Optional[float] = None
+
+    def _get(self, name: str, factory: Callable[[], object]):
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                value = self._values.get(name, _MISSING)
+                if value is _MISSING:
+                    value = factory()
+                    self._values[name] = value
+        return value
+
+    @property
+    def schema_info(self) -> Dict[str, Set[str]]:
+        from vanna_lgx.utils.db_utils import get_schema_info
+        return self._get("schema_info", get_schema_info)
+
+    @property
+    def llm(self):
+        def build():
+            from langchain_ollama import OllamaLLM as Ollama
+            return Ollama(base_url=OLLAMA_BASE_URL, model=SYNTHESIS_MODEL)
+        return self._get("llm", build)
+
+    @property
+    def embeddings(self):
+        from vanna_lgx.utils.embedding_cache import get_cached_embeddings
+        return self._get("embeddings", get_cached_embeddings)
+
+    @property
+    def tokenizer(self):
+        def build():
+            import tiktoken
+            try:
+                return tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # The encoding is downloaded on first use; offline boxes may not have it
+                print(f"--- tiktoken unavailable ({e}); using an approximate tokenizer ---")
+                return ApproximateTokenizer()
+        return self._get("tokenizer", build)
+
+    @property
+    def vector_store(self):
+        from vanna_lgx.utils.vector_store import open_vector_store
+        return self._get("vector_store", open_vector_store)
+
+    def collection(self, name: str):
+        return self._get(f"collection:{name}", lambda: self.vector_store.get_collection(name=name))
+
+    def optional_collection(self, name: str):
+        """Like `collection`, but None when the collection has not been ingested (yet)."""
+        def build():
+            try:
+                return self.vector_store.get_collection(name=name)
+            except Exception:
+                return None
+        return self._get(f"optional_collection:{name}", build)
+
+    @property
+    def column_info(self) -> Dict[str, Dict]:
+        from vanna_lgx.utils.db_utils import get_column_info
+        return self._get("column_info", get_column_info)
+
+    @property
+    def question_rewriter(self):
+        def build():
+            from vanna_lgx.utils.question_rewriter import QuestionRewriter, load_glossary
+            from vanna_lgx.utils.reranker import schema_vocabulary
+            return QuestionRewriter(load_glossary(), schema_vocabulary(self.schema_info))
+        return self._get("question_rewriter", build)
+
+    @property
+    def sql_templates(self):
+        def build():
+            if not SQL_TEMPLATES_ENABLED:
+                return None
+            from vanna_lgx.utils.sql_templates import TemplateLibrary
+            return TemplateLibrary(self.schema_info)
+        return self._get("sql_templates", build)
+
+    @property
+    def answer_cache(self):
+        def build():
+            if not ANSWER_CACHE_ENABLED:
+                return None
+            from vanna_lgx.utils.answer_cache import AnswerCache
+            # Near-duplicates need the values a question names, which the template library knows
+            templates = self.sql_templates
+            return AnswerCache(question_values=templates.question_values if templates is not None else None)
+        return self._get("answer_cache", build)
+
+    @property
+    def result_cache(self):
+        def build():
+            if not RESULT_CACHE_ENABLED:
+                return None
+            from vanna_lgx.utils.result_cache import ResultCache
+            return ResultCache()
+        return self._get("result_cache", build)
+
+    def warm_up(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Builds every resource ahead of the first question. With background=True this runs
+        in a daemon thread and returns it; a node that needs a resource still being built
+        simply waits for it.
+        """
+        def run():
+            start = time.perf_counter()
+            try:
+                self.schema_info
+                self.tokenizer
+                self.llm
+                self.embeddings
+                self.answer_cache
+                self.result_cache
+                self.question_rewriter
+                self.sql_templates
+                for name in ("ddl", "sql_examples", "docs"):
+                    self.collection(name)
+                if COLUMN_INDEX_ENABLED:
+                    self.column_info
+                    self.optional_collection("columns")
+                self.warm_up_seconds = time.perf_counter() - start
+                print(f"--- Resources warmed up in {self.warm_up_seconds:.2f}s ---")
+            except Exception as e:
+                print(f"--- Resource warm-up failed: {e} ---")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="vanna-lgx-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+_resources: Optional[AgentResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_resources() -> AgentResources:
+    """Returns the process-wide resources, creating the (still empty) container on first use."""
+    global _resources
+    with _resources_lock:
+        if _resources is None:
+            _resources = AgentResources()
+        return _resources
+
+
+def set_resources(resources: AgentResources):
+    """Injects a resources container, e.g. with stand-in clients for tests or benchmarks."""
+    global _resources
+    with _resources_lock:
+        _resources = resources
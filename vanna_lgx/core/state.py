@@ -1,8 +1,21 @@
 # vanna_lgx/core/state.py - S5 VERSION
 
-from typing import TypedDict, List, Dict
+from typing import Annotated, TypedDict, Any, List, Dict
 import pandas as pd
 
+def merge_dicts(left: Dict | None, right: Dict | None) -> Dict:
+    """Reducer for per-node dicts written by nodes that may run in parallel; None clears it (a new turn)."""
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+def add_metrics(left: List[Dict] | None, right: List[Dict] | None) -> List[Dict]:
+    """Reducer for the node records; a record that starts a run (a new turn of a session) clears the older ones."""
+    right = right or []
+    if any(record.get("starts_run") for record in right):
+        return list(right)
+    return (left or []) + right
+
 class GraphState(TypedDict):
     """
     Represents the state of our graph for Stage S5.
@@ -10,20 +23,49 @@ class GraphState(TypedDict):
     # Input
     question: str
     rewritten_question: str      # <-- NEW: For the refined question
+    question_embedding: List[float]
+    rewrite: Dict                # {method, score, expansions, memoized}; method is rules (no LLM call) or llm
+    template: Dict | None        # {source, template_question, similarity, slots} of the SQL template that answered, if any
+
+    # Session (the previous turn's values are still in the state when a turn starts)
+    turn: Dict                   # {number, question} of the current turn
+    run_id: str                  # Id of the current turn's run, keying its background prefetches
+    previous_turn: Dict | None   # {question, sql_query, clean_context, schema_pruning, retrieval_distances, columns, rows, preview} of the last answered turn
+    follow_up: bool              # The question refines previous_turn's SQL
+
+    # Answer cache
+    cache_hit: bool
+    cache_similarity: float
+    cached_question: str
     
     # Context
     db_schema: str
     retrieved_examples: List[str]
     retrieved_docs: List[str]
-    clean_context: Dict
+    clean_context: Dict          # {ddl, examples, docs, scores}; scores maps each reranked example / doc to [0, 1]
+    retrieval_timings: Dict[str, float]  # Per-collection query latency in ms
+    retrieval_distances: Dict[str, float]  # Document -> distance from the rewritten question
+    schema_pruning: Dict         # Table -> {kept_columns, total_columns} for DDL pruned with the column index
+    rerank: Dict                 # {candidates, judged, judge} of the local reranker; judge is skipped/ok/failed
+    context_packing: Dict        # {budget, used_tokens, input_tokens, kept, truncated, dropped} of the SQL prompt context
     
     # SQL
     sql_query: str
     validation_error: str | None
+    validation_issues: List[Dict]  # Structured {kind, message, reference, suggestions} validator findings
+    repair_feedback: str
     repair_attempts: int
     
     # Output
     result: pd.DataFrame | None
+    result_info: Dict            # {rows, truncated, truncation_reason, approx_bytes, elapsed_ms, cached}
+    result_handle: Any           # Lazy ResultHandle over the complete (untruncated) result
     summary: str
     visualization_spec: Dict | None # <-- NEW: To hold Vega-Lite JSON
-    error: str | None
\ No newline at end of file
+    error: str | None
+
+    # Streaming
+    llm_ttft: Annotated[Dict[str, float], merge_dicts]  # Time to first LLM token per node, in ms
+
+    # Instrumentation
+    metrics: Annotated[List[Dict], add_metrics]  # One {node, ms, llm_calls, prompt/completion_tokens, calls} record per node run
@@ -1,35 +1,143 @@
 # vanna_lgx/main.py - S5 FINAL VERSION
 
 import json
+import uuid
 from vanna_lgx.core.graph import build_s5_graph
+from vanna_lgx.core.resources import get_resources
+from vanna_lgx.config import WARM_UP_IN_BACKGROUND, SESSIONS_ENABLED
+from vanna_lgx.utils.cancellation import CancelToken, cancellable
+from vanna_lgx.utils.db_utils import get_pool
+from vanna_lgx.utils.instrumentation import record_run
+from vanna_lgx.utils.query_executor import ResultHandle
+from vanna_lgx.utils.sessions import SessionCheckpointer, session_config
+
+def print_summary(node_output):
+    print("\n" + node_output.get("summary", "No summary was generated."))
+
+def print_visualization(node_output):
+    # S5 CHANGE: Check for and print the visualization spec
+    if vis_spec := node_output.get("visualization_spec"):
+        print("\n--- Visualization Spec (Vega-Lite JSON) ---")
+        print(json.dumps(vis_spec, indent=2))
+        print("-------------------------------------------")
+
+def print_token_event(event, streamed_nodes, active_nodes):
+    """ Prints streamed LLM tokens inline, prefixed by the node that generates them. """
+    node = event["node"]
+    if event.get("done"):
+        active_nodes.discard(node)
+        print(f"\n[{node}] first token after {event['ttft_ms']:.0f} ms")
+        return
+    if node not in active_nodes:
+        active_nodes.add(node)
+        streamed_nodes.add(node)
+        print(f"\n[{node}] ", end="")
+    print(event["token"], end="", flush=True)
+
+def print_run_metrics(summary):
+    """ Prints where the seconds of the run went, slowest nodes first. """
+    print(f"Run {summary['run_id'][:8]}: {summary['llm_calls']} LLM calls, {summary['prompt_tokens']} prompt / "
+          f"{summary['completion_tokens']} completion tokens, {summary['repair_attempts']} repair(s).")
+    for node, stats in sorted(summary["nodes"].items(), key=lambda item: -item[1]["ms"]):
+        runs = f" x{stats['runs']}" if stats["runs"] > 1 else ""
+        print(f"   - {node}{runs}: {stats['ms']:.0f} ms")
 
 def main():
     print("Vanna-LGX (Stage S5): The Complete Agent")
     print("-----------------------------------------")
     
-    app = build_s5_graph()
+    # Questions are the turns of one session, so follow-ups can refine the previous answer
+    checkpointer = SessionCheckpointer() if SESSIONS_ENABLED else None
+    app = build_s5_graph(checkpointer)
+    session_id = str(uuid.uuid4())
+    result_handle = None
+    # Build clients, schema info and collections while the user types the first question
+    get_resources().warm_up(background=WARM_UP_IN_BACKGROUND)
     
     while True:
-        question = input("Ask a question about the database (or type 'exit' to quit): ")
+        question = input("Ask a question about the database (or type 'new' for a new session, "
+                         "'export <file.parquet|.csv|.arrow>' to save the last result, 'exit' to quit): ")
         if question.lower() == 'exit': break
+        if question.lower().startswith('export '):
+            if result_handle is None:
+                print("There is no result to export yet.\n")
+                continue
+            try:
+                # Streams the complete, untruncated result batch by batch
+                path = result_handle.arrow().export(question[len('export '):].strip())
+                print(f"Exported {result_handle.arrow().num_rows} rows to {path}.\n")
+            except Exception as e:
+                print(f"Export failed: {e}\n")
+            continue
+        if result_handle is not None:
+            # The session still references the handle, so its spool is removed here rather than by the GC
+            result_handle.close()
+            result_handle = None
+        if question.lower() == 'new':
+            if checkpointer is not None:
+                checkpointer.delete_thread(session_id)
+            session_id = str(uuid.uuid4())
+            print("Started a new session.\n")
+            continue
         
         inputs = {
             "question": question,
             "repair_attempts": 0
         }
         
-        final_state = app.invoke(inputs)
-        
+        # Stream node updates so the summary and the chart (parallel branches) are
+        # printed in whichever order they finish, and LLM tokens as they are generated.
         print("\n--- Final Result ---")
-        print(final_state.get("summary", "No summary was generated."))
-        
-        # S5 CHANGE: Check for and print the visualization spec
-        if vis_spec := final_state.get("visualization_spec"):
-            print("\n--- Visualization Spec (Vega-Lite JSON) ---")
-            print(json.dumps(vis_spec, indent=2))
-            print("-------------------------------------------\n")
-        else:
-            print("--------------------\n")
+        streamed_nodes, active_nodes = set(), set()
+        run_metrics, repair_attempts = [], 0
+        result_handle = None
+        config = session_config(session_id) if checkpointer is not None else None
+        cancel = CancelToken()
+        try:
+            for mode, chunk in app.stream(inputs, cancellable(config, cancel), stream_mode=["updates", "custom"]):
+                if mode == "custom":
+                    print_token_event(chunk, streamed_nodes, active_nodes)
+                    continue
+                for node_name, node_output in chunk.items():
+                    run_metrics.extend(node_output.get("metrics", []))
+                    repair_attempts = node_output.get("repair_attempts", repair_attempts)
+                    result_handle = node_output.get("result_handle") or result_handle
+                    if node_name == "start_turn" and node_output.get("follow_up"):
+                        print(f"(Follow-up to: '{node_output['previous_turn']['question']}')")
+                    elif node_name == "answer_cache_lookup" and node_output.get("cache_hit"):
+                        print(f"(Served from answer cache, similarity {node_output['cache_similarity']:.3f}, "
+                              f"matched question: '{node_output['cached_question']}')")
+                        result_handle = ResultHandle(node_output['sql_query'])
+                        print_summary(node_output)
+                        print_visualization(node_output)
+                    elif node_name == "summarize_result" and node_name not in streamed_nodes:
+                        print_summary(node_output)
+                    elif node_name == "visualize_result":
+                        print_visualization(node_output)
+        except BaseException:
+            cancel.cancel()  # Ctrl-C or a failure: the run's sync nodes must stop too
+            raise
+        print("--------------------\n")
+        print_run_metrics(record_run(run_metrics, question, repair_attempts))
+
+        if (answer_cache := get_resources().answer_cache) is not None:
+            stats = answer_cache.stats()
+            print(f"Answer cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+        if (result_cache := get_resources().result_cache) is not None:
+            stats = result_cache.stats()
+            print(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries, "
+                  f"{stats['bytes'] / 2**20:.1f} MiB.")
+        if (sql_templates := get_resources().sql_templates) is not None:
+            stats = sql_templates.stats()
+            print(f"SQL templates: {stats['matches']} matches, {stats['misses']} misses, "
+                  f"{stats['templates']} from examples, {stats['learned']} learned.")
+        if checkpointer is not None:
+            stats = checkpointer.stats()
+            print(f"Sessions: {stats['sessions']} held, {stats['bytes'] / 2**20:.1f} MiB, "
+                  f"{stats['evictions']} evicted, {stats['expirations']} expired.")
+        pool = get_pool().stats()
+        print(f"DB pool: {pool['in_use']}/{pool['max_size']} in use, {pool['idle']} idle, "
+              f"{pool['created']} opened, healthy={pool['healthy']}.\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
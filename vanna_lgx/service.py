@@ -0,0 +1,252 @@
+# vanna_lgx/service.py - Async, multi-tenant query service
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from vanna_lgx.core.graph import build_s5_graph
+from vanna_lgx.core.resources import get_resources
+from vanna_lgx.utils.cancellation import CancelToken, cancellable
+from vanna_lgx.utils.instrumentation import record_run, REGISTRY
+from vanna_lgx.config import (
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_WORKERS,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_MAX_PENDING_PER_TENANT,
+    SERVICE_REQUEST_TIMEOUT_SECONDS,
+    SERVICE_MAX_RESULT_ROWS,
+)
+
+
+class ServiceOverloadedError(Exception):
+    """Raised by `submit` when the queue (or the tenant's share of it) is full."""
+
+
+def serialize_answer(state: Dict, max_rows: int = SERVICE_MAX_RESULT_ROWS) -> Dict:
+    """Converts a final graph state into a JSON-safe answer."""
+    answer = {
+        "summary": state.get("summary"),
+        "sql_query": state.get("sql_query"),
+        "visualization_spec": state.get("visualization_spec"),
+        "error": state.get("error") or state.get("validation_error"),
+        "cache_hit": bool(state.get("cache_hit")),
+    }
+    result = state.get("result")
+    if result is not None:
+        answer["columns"] = [str(c) for c in result.columns]
+        answer["rows"] = json.loads(result.head(max_rows).to_json(orient="values", date_format="iso"))
+        answer["total_rows"] = len(result)
+    return answer
+
+
+class QueryService:
+    """
+    Runs many questions concurrently against one compiled agent graph.
+
+    Requests go through a bounded asyncio queue (backpressure: `submit` fails fast when it
+    is full or when a tenant already has too many pending requests) and are processed by
+    a fixed number of worker tasks with `ainvoke`. Each request can be cancelled or time
+    out on its own without stalling the others. Ollama calls are bounded process-wide by
+    OLLAMA_MAX_CONCURRENCY and SQLite access by the connection pool size.
+
+    The nodes stay sync because the same graph also runs under the CLI, Streamlit and the
+    benchmarks, and their clients (Ollama streaming, SQLite, the vector stores) are blocking.
+    `ainvoke` runs them in executor threads, which cancelling its task does not stop, so every
+    request carries a CancelToken in its config: once it is set, the run's Ollama slot is
+    released, its SQLite statement interrupted, and its remaining nodes and tokens skipped.
+    scripts/check_service_cancellation.py checks that timed-out requests free their slots.
+    """
+
+    def __init__(self, app=None, workers: int = SERVICE_WORKERS, queue_size: int = SERVICE_QUEUE_SIZE,
+                 max_pending_per_tenant: int = SERVICE_MAX_PENDING_PER_TENANT,
+                 request_timeout: float = SERVICE_REQUEST_TIMEOUT_SECONDS):
+        self.app = app or build_s5_graph()
+        self.workers = workers
+        self.max_pending_per_tenant = max_pending_per_tenant
+        self.request_timeout = request_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending_by_tenant: Dict[str, int] = defaultdict(int)
+        self._worker_tasks = []
+        self._ids = itertools.count(1)
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0, "timed_out": 0}
+
+    async def start(self):
+        # Sync nodes run in the loop's default executor; size it for the worker count.
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.workers * 2))
+        get_resources().warm_up(background=True)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    def submit(self, question: str, tenant: str = "default") -> str:
+        """Queues a question and returns its request id, or raises ServiceOverloadedError."""
+        if self._pending_by_tenant[tenant] >= self.max_pending_per_tenant:
+            self.stats["rejected"] += 1
+            raise ServiceOverloadedError(f"Tenant '{tenant}' already has {self.max_pending_per_tenant} pending requests.")
+        request_id = f"req-{next(self._ids)}"
+        try:
+            self._queue.put_nowait((request_id, tenant, question, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise ServiceOverloadedError("The request queue is full, try again later.")
+        self._futures[request_id] = asyncio.get_running_loop().create_future()
+        self._pending_by_tenant[tenant] += 1
+        self.stats["submitted"] += 1
+        return request_id
+
+    async def result(self, request_id: str) -> Dict:
+        """Waits for and returns the answer of a submitted request."""
+        try:
+            return await self._futures[request_id]
+        finally:
+            self._futures.pop(request_id, None)
+
+    async def ask(self, question: str, tenant: str = "default") -> Dict:
+        return await self.result(self.submit(question, tenant))
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancels a queued or running request. Returns False if it is unknown or already finished."""
+        future = self._futures.get(request_id)
+        if future is None or future.done():
+            return False
+        if task := self._tasks.get(request_id):
+            task.cancel()
+        future.set_result({"request_id": request_id, "status": "cancelled"})
+        self.stats["cancelled"] += 1
+        return True
+
+    async def _run(self, request_id: str, question: str) -> Dict:
+        inputs = {"question": question, "repair_attempts": 0}
+        cancel = CancelToken()
+        try:
+            state = await asyncio.wait_for(self.app.ainvoke(inputs, cancellable(None, cancel)),
+                                           timeout=self.request_timeout)
+        except BaseException:
+            cancel.cancel()  # Stops the sync nodes still running in executor threads and cleans up after them
+            raise
+        metrics = record_run(state.get("metrics", []), question, state.get("repair_attempts", 0), run_id=request_id)
+        return {"request_id": request_id, "status": "done", **serialize_answer(state), "metrics": metrics}
+
+    async def _worker(self, index: int):
+        while True:
+            request_id, tenant, question, queued_at = await self._queue.get()
+            future = self._futures.get(request_id)
+            try:
+                if future is None or future.done():  # Cancelled while queued
+                    continue
+                started = time.perf_counter()
+                task = self._tasks[request_id] = asyncio.create_task(self._run(request_id, question))
+                try:
+                    answer = await task
+                    self.stats["completed"] += 1
+                except asyncio.TimeoutError:
+                    answer = {"request_id": request_id, "status": "timeout",
+                              "error": f"The request exceeded {self.request_timeout}s."}
+                    self.stats["timed_out"] += 1
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():  # The worker itself is being stopped
+                        raise
+                    continue  # The request was cancelled; `cancel` already answered it
+                except Exception as e:
+                    answer = {"request_id": request_id, "status": "error", "error": str(e)}
+                    self.stats["failed"] += 1
+                answer["queue_seconds"] = round(started - queued_at, 3)
+                answer["run_seconds"] = round(time.perf_counter() - started, 3)
+                if not future.done():
+                    future.set_result(answer)
+            finally:
+                self._tasks.pop(request_id, None)
+                self._pending_by_tenant[tenant] -= 1
+                self._queue.task_done()
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "queued": self._queue.qsize(), "running": len(self._tasks)}
+
+
+async def handle_client(service: QueryService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    JSON-lines protocol, one connection can carry many concurrent requests:
+      -> {"question": "...", "tenant": "team-a"}   <- {"request_id": "...", "status": "queued"}
+      -> {"cancel": "req-1"}                       <- {"request_id": "req-1", "cancelled": true}
+      -> {"stats": true}                           <- {...service counters...}
+      -> {"metrics": true}                         <- {"prometheus": "...text exposition format..."}
+    Answers are sent as {"request_id", "status": "done" | "error" | "timeout" | "cancelled", ...}
+    as soon as they are ready, in completion order.
+    """
+    write_lock = asyncio.Lock()
+    pending = set()
+
+    async def send(message: Dict):
+        async with write_lock:
+            writer.write((json.dumps(message, default=str) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    async def deliver(request_id: str):
+        await send(await service.result(request_id))
+
+    try:
+        while line := await reader.readline():
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                await send({"status": "error", "error": "Invalid JSON."})
+                continue
+            if "cancel" in message:
+                await send({"request_id": message["cancel"], "cancelled": service.cancel(message["cancel"])})
+            elif message.get("stats"):
+                await send(service.snapshot())
+            elif message.get("metrics"):
+                await send({"prometheus": REGISTRY.prometheus_text()})
+            elif question := message.get("question"):
+                try:
+                    request_id = service.submit(question, message.get("tenant", "default"))
+                except ServiceOverloadedError as e:
+                    await send({"status": "rejected", "error": str(e)})
+                    continue
+                await send({"request_id": request_id, "status": "queued"})
+                task = asyncio.create_task(deliver(request_id))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+    finally:
+        for task in pending:
+            task.cancel()
+        writer.close()
+
+
+async def serve(host: str, port: int, workers: int):
+    service = QueryService(workers=workers)
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: handle_client(service, r, w), host, port)
+    print(f"Vanna-LGX query service listening on {host}:{port} with {workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async, multi-tenant Vanna-LGX query service (JSON lines over TCP).")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# vanna_lgx/utils/answer_cache.py
+
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from vanna_lgx.config import (
+    DB_PATH,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from vanna_lgx.utils.instrumentation import timed_call
+from vanna_lgx.utils.vector_store import knowledge_files
+
+# Bumped whenever the answers table changes; an older cache is dropped, not migrated
+SCHEMA_VERSION = 2
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cases the question and collapses punctuation and whitespace for exact matching."""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def knowledge_fingerprint() -> str:
+    """
+    Fingerprints the SQLite database and the vector store holding the knowledge base.
+    Any change to these files changes the fingerprint and invalidates cached answers.
+    """
+    parts = []
+    for path in [DB_PATH] + knowledge_files():
+        try:
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    A persistent (SQLite-backed) cache of final agent answers.
+    Entries are matched exactly on the normalized question, or by embedding similarity
+    above a threshold. A near-duplicate must name the same values as the cached question
+    (see `question_values`), since questions differing only in a region, a vendor or a
+    day count read alike but have different answers; without `question_values` only exact
+    matches are served. Entries expire after a TTL and the least recently used ones are
+    evicted once the cache grows beyond max_entries.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+                 question_values: Optional[Callable[[str], List[str]]] = None):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.question_values = question_values
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version;").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS answers")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    normalized_question TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    question_values TEXT,
+                    embedding BLOB NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    sql_query TEXT,
+                    result TEXT,
+                    result_info TEXT,
+                    summary TEXT,
+                    visualization_spec TEXT,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _purge(self, conn: sqlite3.Connection, fingerprint: str):
+        """Drops entries that are expired or were computed against a different DB / knowledge base."""
+        conn.execute(
+            "DELETE FROM answers WHERE fingerprint != ? OR created_at < ?",
+            (fingerprint, time.time() - self.ttl_seconds),
+        )
+
+    def _values_key(self, question: str) -> Optional[str]:
+        return json.dumps(self.question_values(question)) if self.question_values is not None else None
+
+    def get(self, question: str, embedding: Optional[List[float]] = None) -> Optional[Dict]:
+        """Returns the cached answer (with a 'cache_similarity' key) or None on a miss."""
+        normalized = normalize_question(question)
+        fingerprint = knowledge_fingerprint()
+        with timed_call("sqlite", "answer_cache_get"), self._lock, self._connect() as conn:
+            self._purge(conn, fingerprint)
+            row = conn.execute(
+                "SELECT * FROM answers WHERE normalized_question = ?", (normalized,)
+            ).fetchone()
+            similarity = 1.0
+
+            values = self._values_key(question) if row is None and embedding is not None else None
+            if values is not None:
+                query = np.asarray(embedding, dtype=np.float32)
+                # Only entries naming the same values can be near-duplicates
+                candidates = conn.execute(
+                    "SELECT normalized_question, embedding FROM answers WHERE question_values = ? AND length(embedding) = ?",
+                    (values, query.nbytes),
+                ).fetchall()
+                if candidates:
+                    matrix = np.frombuffer(b"".join(c["embedding"] for c in candidates), dtype=np.float32)
+                    matrix = matrix.reshape(len(candidates), query.size)
+                    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                    scores = matrix @ query / np.where(norms == 0, 1, norms)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        similarity = float(scores[best])
+                        row = conn.execute("SELECT * FROM answers WHERE normalized_question = ?",
+                                           (candidates[best]["normalized_question"],)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE answers SET last_used_at = ? WHERE normalized_question = ?",
+                (time.time(), row["normalized_question"]),
+            )
+            self.hits += 1
+
+        result = pd.read_json(io.StringIO(row["result"]), orient="split") if row["result"] else None
+        return {
+            "cached_question": row["question"],
+            "sql_query": row["sql_query"],
+            "result": result,
+            # A truncated result is served as truncated, with the reason the summary reports
+            "result_info": json.loads(row["result_info"]) if row["result_info"] else None,
+            "summary": row["summary"],
+            "visualization_spec": json.loads(row["visualization_spec"]) if row["visualization_spec"] else None,
+            "cache_similarity": similarity,
+        }
+
+    def put(self, question: str, embedding: List[float], answer: Dict):
+        """Stores a successful answer and evicts least recently used entries beyond max_entries."""
+        result = answer.get("result")
+        result_json = result.to_json(orient="split", date_format="iso") if result is not None else None
+        result_info = answer.get("result_info")
+        vis_spec = answer.get("visualization_spec")
+        values = self._values_key(question)
+        now = time.time()
+        with timed_call("sqlite", "answer_cache_put"), self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_question(question),
+                    question,
+                    values,
+                    np.asarray(embedding, dtype=np.float32).tobytes(),
+                    knowledge_fingerprint(),
+                    answer.get("sql_query"),
+                    result_json,
+                    json.dumps(result_info) if result_info else None,
+                    answer.get("summary"),
+                    json.dumps(vis_spec) if vis_spec else None,
+                    now,
+                    now,
+                ),
+            )
+            conn.execute(
+                """DELETE FROM answers WHERE normalized_question NOT IN (
+                       SELECT normalized_question FROM answers ORDER BY last_used_at DESC LIMIT ?
+                   )""",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
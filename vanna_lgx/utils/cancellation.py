@@ -0,0 +1,102 @@
+# vanna_lgx/utils/cancellation.py
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from langgraph.config import get_config
+
+# Key of a run's CancelToken in the graph config's "configurable" dict
+CANCEL_TOKEN_KEY = "cancel_token"
+
+
+class RunCancelled(Exception):
+    """Raised inside a graph run whose CancelToken has been set (cancelled or timed-out request)."""
+
+
+class CancelToken:
+    """
+    Cancels one graph run from another thread.
+
+    The graph's nodes are sync and run in executor threads under `ainvoke`, which asyncio can
+    abandon but not stop. They check the token instead: before every node, while waiting for an
+    Ollama slot and between streamed tokens. Callbacks registered with `on_cancel` run in the
+    cancelling thread, so what a blocked call holds (its Ollama slot, a running SQLite
+    statement) is released as soon as the run is cancelled. A node that fails cancels its run
+    too (see instrument_node), so `add_callback` also cleans up after failed runs.
+    """
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def raise_if_cancelled(self):
+        if self._cancelled:
+            raise RunCancelled("The run was cancelled.")
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Calls `callback` when the token is cancelled, or at once if it already is."""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+        """Calls `callback` if the token is cancelled while the block runs; raises RunCancelled if it already is."""
+        with self._lock:
+            self.raise_if_cancelled()
+            self._callbacks.append(callback)
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+
+def cancellable(config: Optional[Dict], token: CancelToken) -> Dict:
+    """A copy of the graph config `config` (None for none) that makes `token` the run's CancelToken."""
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), CANCEL_TOKEN_KEY: token}
+    return config
+
+
+def current_token() -> Optional[CancelToken]:
+    """The CancelToken of the running graph run, or None outside a run or for runs that cannot be cancelled."""
+    try:
+        return get_config().get("configurable", {}).get(CANCEL_TOKEN_KEY)
+    except RuntimeError:
+        return None
+
+
+@contextmanager
+def on_cancel(callback: Callable[[], None]) -> Iterator[None]:
+    """`CancelToken.on_cancel` for the running graph run; a no-op when it cannot be cancelled."""
+    token = current_token()
+    if token is None:
+        yield
+        return
+    with token.on_cancel(callback):
+        yield
+
+
+def at_cancel(callback: Callable[[], None]):
+    """`CancelToken.add_callback` for the running graph run; a no-op when it cannot be cancelled."""
+    if (token := current_token()) is not None:
+        token.add_callback(callback)
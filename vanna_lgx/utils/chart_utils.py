@@ -0,0 +1,113 @@
+# vanna_lgx/utils/chart_utils.py
+
+import json
+import re
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+MAX_BAR_CATEGORIES = 30
+MAX_GROUPED_BAR_ROWS = 60
+MAX_LINE_POINTS = 1000
+MAX_HISTOGRAM_VALUES = 5000
+
+TIME_NAME_PATTERN = re.compile(r"(date|time|day|week|month|year|_at$|_on$|timestamp)", re.IGNORECASE)
+
+
+def is_time_like(series: pd.Series) -> bool:
+    """True for datetime columns, and for text columns whose name and values both look like dates."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    if not pd.api.types.is_string_dtype(series) or not TIME_NAME_PATTERN.search(str(series.name)):
+        return False
+    parsed = pd.to_datetime(series.dropna().head(20), errors="coerce")
+    return len(parsed) > 0 and parsed.notna().all()
+
+
+def is_categorical(series: pd.Series) -> bool:
+    return (pd.api.types.is_string_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype)
+            or pd.api.types.is_bool_dtype(series))
+
+
+def is_quantitative(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _records(df: pd.DataFrame) -> List[Dict]:
+    """JSON-safe records (numpy scalars and timestamps become plain JSON values)."""
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def _spec(df: pd.DataFrame, title: str, mark, encoding: Dict) -> Dict:
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": title,
+        "data": {"values": _records(df)},
+        "mark": mark,
+        "encoding": encoding,
+    }
+
+
+def _field(name: str, field_type: str, **extra) -> Dict:
+    return {"field": name, "type": field_type, "title": name.replace("_", " "), **extra}
+
+
+def build_chart_spec(df: pd.DataFrame, title: str) -> Optional[Dict]:
+    """
+    Builds a Vega-Lite spec directly from the shape and dtypes of a result DataFrame.
+    Covered shapes:
+    - (time-like, number) [+ optional category] -> line chart
+    - (category, number)                        -> bar chart
+    - (category, category, number)              -> grouped bar chart
+    - (number)                                  -> histogram
+    Returns None for shapes the rules do not cover.
+    """
+    if df is None or len(df) < 2:
+        return None
+    cols = list(df.columns)
+
+    if len(cols) == 1:
+        col = cols[0]
+        if is_quantitative(df[col]) and len(df) <= MAX_HISTOGRAM_VALUES:
+            return _spec(df, title, "bar", {
+                "x": _field(col, "quantitative", bin={"maxbins": 30}),
+                "y": {"aggregate": "count", "type": "quantitative", "title": "count"},
+            })
+        return None
+
+    if len(cols) == 2:
+        dim, measure = cols
+        if not is_quantitative(df[measure]):
+            return None
+        if is_time_like(df[dim]) and len(df) <= MAX_LINE_POINTS:
+            return _spec(df, title, {"type": "line", "point": True}, {
+                "x": _field(dim, "temporal"),
+                "y": _field(measure, "quantitative"),
+            })
+        if is_categorical(df[dim]) and len(df) <= MAX_BAR_CATEGORIES:
+            return _spec(df, title, "bar", {
+                "x": _field(dim, "nominal", sort="-y"),
+                "y": _field(measure, "quantitative"),
+            })
+        return None
+
+    if len(cols) == 3:
+        first, second, measure = cols
+        if not is_quantitative(df[measure]):
+            return None
+        if is_time_like(df[first]) and is_categorical(df[second]) and len(df) <= MAX_LINE_POINTS:
+            return _spec(df, title, {"type": "line", "point": True}, {
+                "x": _field(first, "temporal"),
+                "y": _field(measure, "quantitative"),
+                "color": _field(second, "nominal"),
+            })
+        if is_categorical(df[first]) and is_categorical(df[second]) and len(df) <= MAX_GROUPED_BAR_ROWS:
+            return _spec(df, title, "bar", {
+                "x": _field(first, "nominal"),
+                "xOffset": {"field": second},
+                "y": _field(measure, "quantitative"),
+                "color": _field(second, "nominal"),
+            })
+
+    return None
@@ -0,0 +1,85 @@
+# vanna_lgx/utils/context_packer.py
+
+from typing import Dict, List, Optional, Tuple
+
+from vanna_lgx.config import CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_TRUNCATED_TOKENS
+
+# Sections in the order the SQL prompt uses them. The schema is packed first: without it no
+# query can be written. Examples and docs then compete for the rest by reranker score or distance.
+SECTIONS = ("ddl", "examples", "docs")
+# A truncated SQL example would teach the model broken SQL, so examples are only ever dropped.
+TRUNCATABLE = {"ddl", "docs"}
+
+
+def _truncate(text: str, max_tokens: int, tokenizer) -> Tuple[str, int]:
+    """Keeps whole lines from the start of the text while they fit in max_tokens."""
+    kept, used = [], 0
+    for line in text.splitlines():
+        tokens = len(tokenizer.encode(line + "\n"))
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept), used
+
+
+def _preview(text: str) -> str:
+    first_line = text.strip().splitlines()[0] if text.strip() else ""
+    return first_line[:80]
+
+
+def pack_context(clean_context: Dict[str, List[str]], tokenizer, distances: Optional[Dict[str, float]] = None,
+                 scores: Optional[Dict[str, float]] = None, budget: int = CONTEXT_TOKEN_BUDGET,
+                 min_truncated_tokens: int = CONTEXT_MIN_TRUNCATED_TOKENS) -> Tuple[Dict[str, List[str]], Dict]:
+    """
+    Fits the judged context into a token budget for the SQL prompt.
+
+    Items are ordered by reranker score (highest first) when `scores` has one, then by
+    retrieval distance (closest first; items with neither keep their order after the others).
+    DDL is packed before examples and docs. An item that does not fit is truncated to whole
+    lines when it is DDL or a doc and at least `min_truncated_tokens` remain, otherwise it is
+    dropped. Returns the packed context (same shape as `clean_context`) and a report of what
+    was kept, truncated and dropped.
+    """
+    distances, scores = distances or {}, scores or {}
+    report = {"budget": budget, "used_tokens": 0, "input_tokens": 0, "kept": 0, "truncated": [], "dropped": []}
+    packed: Dict[str, List[str]] = {section: [] for section in SECTIONS}
+
+    def rank(doc):
+        if doc in scores:
+            return (0, -scores[doc])
+        return (1, distances.get(doc, float("inf")))
+
+    def ranked(section):
+        items = [doc for doc in clean_context.get(section, []) if doc.strip()]
+        return sorted(items, key=rank)
+
+    candidates = [("ddl", doc) for doc in ranked("ddl")]
+    candidates += sorted(
+        [(section, doc) for section in ("examples", "docs") for doc in ranked(section)],
+        key=lambda item: rank(item[1]),
+    )
+
+    remaining = budget
+    for section, doc in candidates:
+        tokens = len(tokenizer.encode(doc))
+        report["input_tokens"] += tokens
+        entry = {"section": section, "tokens": tokens, "preview": _preview(doc),
+                 "distance": distances.get(doc), "score": scores.get(doc)}
+        if tokens <= remaining:
+            packed[section].append(doc)
+            remaining -= tokens
+            report["kept"] += 1
+        elif section in TRUNCATABLE and remaining >= min_truncated_tokens:
+            text, used = _truncate(doc, remaining, tokenizer)
+            if text.strip():
+                packed[section].append(text)
+                remaining -= used
+                report["truncated"].append({**entry, "kept_tokens": used})
+            else:
+                report["dropped"].append(entry)
+        else:
+            report["dropped"].append(entry)
+
+    report["used_tokens"] = budget - remaining
+    return packed, report
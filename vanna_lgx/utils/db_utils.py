@@ -2,12 +2,141 @@
 
 import sqlite3
 import re
-from typing import Dict, Set
-from vanna_lgx.config import DB_PATH
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+from vanna_lgx.config import (
+    DB_PATH,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE_KB,
+)
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    return sqlite3.connect(DB_PATH)
+def get_readonly_connection(path: str = DB_PATH, check_same_thread: bool = True):
+    """
+    Opens the SQLite database read-only (URI mode=ro plus PRAGMA query_only), so statements
+    prepared on it can never write. Performance pragmas are applied to every connection.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA query_only = ON;")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE};")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB};")  # Negative values are KiB
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    return conn
+
+class ReadOnlyConnectionPool:
+    """
+    A thread-safe pool of read-only SQLite connections, shared by every graph invocation
+    (and every Streamlit session) in the process. Connections are health-checked when
+    they are handed out and replaced if they are broken.
+    """
+
+    def __init__(self, path: str = DB_PATH, max_size: int = DB_POOL_SIZE,
+                 timeout_seconds: float = DB_POOL_TIMEOUT_SECONDS):
+        self.path = path
+        self.max_size = max_size
+        self.timeout_seconds = timeout_seconds
+        self._idle = []
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._counters = {"acquired": 0, "created": 0, "discarded": 0, "waits": 0, "timeouts": 0}
+        self._wait_seconds = 0.0
+
+    def _healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout_seconds
+        with self._condition:
+            if not self._idle and self._in_use >= self.max_size:
+                self._counters["waits"] += 1
+                wait_start = time.monotonic()
+                while not self._idle and self._in_use >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise TimeoutError(f"No SQLite connection became available within {self.timeout_seconds}s.")
+                    self._condition.wait(remaining)
+                self._wait_seconds += time.monotonic() - wait_start
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._counters["acquired"] += 1
+
+        try:
+            if conn is not None and not self._healthy(conn):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = get_readonly_connection(self.path, check_same_thread=False)
+                with self._condition:
+                    self._counters["created"] += 1
+            return conn
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._condition:
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._condition.notify()
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._condition:
+            self._counters["discarded"] += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrows a connection for the duration of the `with` block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self) -> Dict:
+        """Utilisation and health of the pool."""
+        with self._condition:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "utilisation": self._in_use / self.max_size,
+                "total_wait_seconds": round(self._wait_seconds, 3),
+                "healthy": all(self._healthy(conn) for conn in self._idle),
+                **self._counters,
+            }
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+_pool: Optional[ReadOnlyConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ReadOnlyConnectionPool:
+    """Returns the process-wide read-only connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ReadOnlyConnectionPool()
+        return _pool
 
 def get_full_schema(conn: sqlite3.Connection) -> str:
     """
@@ -23,17 +152,40 @@ def get_schema_info() -> Dict[str, Set[str]]:
     Connects to the DB and extracts a dictionary mapping table names to a set of their column names.
     This is used by the SQL linter for fast schema checks.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    
-    schema_info = {}
-    for table_name_tuple in tables:
-        table_name = table_name_tuple[0]
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = {row[1] for row in cursor.fetchall()}
-        schema_info[table_name] = columns
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tables = cursor.fetchall()
+        
+        schema_info = {}
+        for table_name_tuple in tables:
+            table_name = table_name_tuple[0]
+            cursor.execute(f"PRAGMA table_info({table_name});")
+            columns = {row[1] for row in cursor.fetchall()}
+            schema_info[table_name] = columns
         
-    conn.close()
-    return schema_info
\ No newline at end of file
+    return schema_info
+
+
+def get_column_info(conn: Optional[sqlite3.Connection] = None) -> Dict[str, Dict]:
+    """
+    Column definitions and foreign keys of every table, from PRAGMA table_info and
+    PRAGMA foreign_key_list: {table: {"columns": [{name, type, notnull, pk}], "foreign_keys": [...]}}.
+    """
+    if conn is None:
+        with get_pool().connection() as pooled:
+            return get_column_info(pooled)
+
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")]
+    column_info = {}
+    for table in tables:
+        columns = [
+            {"name": name, "type": col_type or "", "notnull": bool(notnull), "pk": pk}
+            for _, name, col_type, notnull, _, pk in conn.execute(f'PRAGMA table_info("{table}");')
+        ]
+        foreign_keys = [
+            {"column": row[3], "ref_table": row[2], "ref_column": row[4]}
+            for row in conn.execute(f'PRAGMA foreign_key_list("{table}");')
+        ]
+        column_info[table] = {"columns": columns, "foreign_keys": foreign_keys}
+    return column_info
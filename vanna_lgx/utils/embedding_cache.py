@@ -0,0 +1,119 @@
+# vanna_lgx/utils/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_ollama import OllamaEmbeddings
+
+from vanna_lgx.utils.llm_utils import ollama_slot
+from vanna_lgx.utils.instrumentation import timed_call
+from vanna_lgx.config import (
+    OLLAMA_BASE_URL,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_BATCH_SIZE,
+)
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content address of an embedding: the model name plus a hash of the text."""
+    return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+class CachedEmbeddings:
+    """
+    A drop-in wrapper around OllamaEmbeddings with a two-tier, content-addressed cache:
+    an in-memory LRU in front of an on-disk SQLite store. Only texts that were never
+    embedded with the same model reach the Ollama embedding endpoint, in batches of
+    `batch_size` texts (each batch is stored as soon as it arrives).
+    """
+
+    def __init__(self, embeddings: OllamaEmbeddings, path: str = EMBEDDING_CACHE_PATH,
+                 max_memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = embeddings.model
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Resolves keys from memory first, then from disk (promoting disk hits into memory)."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("d", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, array("d", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed_call("embedding", self.model, texts=len(texts)) as call:
+            keys = [embedding_key(self.model, text) for text in texts]
+            found = self._lookup(keys)
+
+            to_embed = {key: text for key, text in zip(keys, texts) if key not in found}
+            self.hits += len(texts) - len(to_embed)
+            self.misses += len(to_embed)
+            call["computed"] = len(to_embed)
+            pending = list(to_embed.items())
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                with ollama_slot():
+                    vectors = self.embeddings.embed_documents([text for _, text in batch])
+                new_items = {key: [float(x) for x in vector] for (key, _), vector in zip(batch, vectors)}
+                self._store(new_items)
+                found.update(new_items)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "memory_items": len(self._memory)}
+
+
+def get_cached_embeddings(model: str = EMBEDDING_MODEL, base_url: Optional[str] = OLLAMA_BASE_URL) -> CachedEmbeddings:
+    """Builds the cached Ollama embedding client shared by the agent nodes and the ingestion scripts."""
+    return CachedEmbeddings(OllamaEmbeddings(model=model, base_url=base_url))
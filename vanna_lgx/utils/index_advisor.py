@@ -0,0 +1,329 @@
+# vanna_lgx/utils/index_advisor.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from vanna_lgx.config import (
+    SQL_WORKLOAD_LOG_PATH,
+    INDEX_ADVISOR_MAX_COLUMNS,
+)
+from vanna_lgx.utils.sql_validator import tokenize, table_references
+
+INDEX_PREFIX = "idx_advisor_"
+EQUALITY_OPS = {"=", "==", "IN", "IS"}
+RANGE_OPS = {"<", ">", "<=", ">=", "BETWEEN"}
+# Keywords that start a clause; columns are attributed to the innermost clause they appear in
+CLAUSES = {"SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "ON", "UNION", "EXCEPT", "INTERSECT"}
+
+_log_lock = threading.Lock()
+
+
+# --- Workload log ---
+
+def log_statement(sql: str, info: Dict, path: str = SQL_WORKLOAD_LOG_PATH):
+    """Appends one executed statement and its execution info to the workload log (JSON lines)."""
+    record = {"ts": time.time(), "sql": sql.strip(), "elapsed_ms": round(info.get("elapsed_ms", 0.0), 3),
+              "rows": info.get("rows"), "truncated": info.get("truncated", False)}
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _log_lock, open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_workload(path: str = SQL_WORKLOAD_LOG_PATH, since: Optional[float] = None) -> List[Dict]:
+    """
+    The logged statements grouped by their text: [{sql, count, total_ms, max_ms}], slowest total first.
+    Statements logged before `since` (a UNIX timestamp) are skipped.
+    """
+    grouped: Dict[str, Dict] = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since is not None and record.get("ts", 0) < since:
+                    continue
+                key = " ".join(record["sql"].rstrip(";").split())
+                entry = grouped.setdefault(key, {"sql": record["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += record.get("elapsed_ms", 0.0)
+                entry["max_ms"] = max(entry["max_ms"], record.get("elapsed_ms", 0.0))
+    except OSError:
+        return []
+    return sorted(grouped.values(), key=lambda e: e["total_ms"], reverse=True)
+
+
+# --- Column usage ---
+
+def column_usage(sql: str, schema_info: Dict[str, Set[str]]) -> Dict[str, Dict]:
+    """
+    The columns a statement uses per table, by role: {table: {"equality": [...], "range": [...],
+    "group_by": [...], "order_by": [...], "other": [...]}}. Equality and range columns come from
+    WHERE and JOIN ... ON conditions; unqualified columns are resolved to the only referenced table
+    that has them.
+    """
+    tokens = tokenize(sql.strip().rstrip(";"))
+    refs, _ = table_references(tokens)
+    tables = {name.lower(): name for name in schema_info}
+    columns = {name.lower(): {c.lower(): c for c in cols} for name, cols in schema_info.items()}
+    aliases = {}
+    for name, alias in refs:
+        if name.lower() in tables:
+            aliases[name.lower()] = name.lower()
+            if alias:
+                aliases[alias.lower()] = name.lower()
+    referenced = sorted(set(aliases.values()))
+
+    usage: Dict[str, Dict[str, List[str]]] = {}
+
+    def add(table: str, column: str, role: str):
+        roles = usage.setdefault(tables[table], {"equality": [], "range": [], "group_by": [], "order_by": [], "other": []})
+        name = columns[table][column]
+        if name not in roles[role]:
+            roles[role].append(name)
+
+    clause_stack, clause = [], "SELECT"
+    for i, (kind, value) in enumerate(tokens):
+        upper = value.upper()
+        if value == "(":
+            clause_stack.append(clause)
+            continue
+        if value == ")":
+            clause = clause_stack.pop() if clause_stack else clause
+            continue
+        if kind == "ident" and upper in CLAUSES:
+            clause = upper
+            continue
+        if kind != "ident":
+            continue
+
+        # Column reference: `qualifier.column` or a bare name known to a referenced table
+        if i + 2 < len(tokens) and tokens[i + 1][1] == "." and tokens[i + 2][0] == "ident":
+            continue  # The qualifier; handled when the column token is reached
+        if i >= 2 and tokens[i - 1][1] == ".":
+            table = aliases.get(tokens[i - 2][1].lower())
+            candidates = [table] if table and value.lower() in columns.get(table, {}) else []
+            start = i - 2
+        else:
+            if i + 1 < len(tokens) and tokens[i + 1][1] == "(":
+                continue  # A function name
+            candidates = [t for t in referenced if value.lower() in columns[t]]
+            start = i
+        if len(candidates) != 1:
+            continue
+        table, column = candidates[0], value.lower()
+
+        if clause in ("WHERE", "ON"):
+            after = tokens[i + 1][1].upper() if i + 1 < len(tokens) else ""
+            before = tokens[start - 1][1].upper() if start > 0 else ""
+            negated = after == "NOT" or before == "NOT" or (after == "IS" and i + 2 < len(tokens) and tokens[i + 2][1].upper() == "NOT")
+            if negated:
+                role = "other"
+            elif after in EQUALITY_OPS or before in ("=", "=="):
+                role = "equality"
+            elif after in RANGE_OPS or before in RANGE_OPS:
+                role = "range"
+            else:
+                role = "other"
+        elif clause == "GROUP":
+            role = "group_by"
+        elif clause == "ORDER":
+            role = "order_by"
+        else:
+            role = "other"
+        add(table, column, role)
+    return usage
+
+
+def query_plan(sql: str, conn: sqlite3.Connection) -> List[str]:
+    """The detail lines of EXPLAIN QUERY PLAN; empty when the statement does not compile."""
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql.strip().rstrip(';')}")]
+    except sqlite3.Error:
+        return []
+
+
+def scanned_tables(plan: List[str]) -> Set[str]:
+    """Tables read by a full scan (no index), or sorted through a temporary B-tree, in a plan."""
+    sorts = any("USE TEMP B-TREE" in detail for detail in plan)
+    scanned = set()
+    for detail in plan:
+        match = re.match(r"SCAN (?:TABLE )?(\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX)?", detail)
+        if match and (not match.group(2) or sorts):
+            scanned.add(match.group(1).lower())
+    return scanned
+
+
+# --- Proposals ---
+
+def candidate_columns(roles: Dict[str, List[str]], max_columns: int = INDEX_ADVISOR_MAX_COLUMNS) -> Tuple[List[str], bool]:
+    """
+    The index for one statement on one table: equality columns first, then one range column, or
+    else the GROUP BY or ORDER BY columns; then the other columns the statement reads, so the index
+    covers it, as long as the index stays within `max_columns`. Returns (columns, covering).
+    """
+    key = list(roles["equality"])
+    if roles["range"]:
+        key.append(roles["range"][0])
+    elif roles["group_by"]:
+        key += [c for c in roles["group_by"] if c not in key]
+    elif roles["order_by"]:
+        key += [c for c in roles["order_by"] if c not in key]
+    if not key:
+        return [], False
+    rest = [c for role in ("range", "group_by", "order_by", "other") for c in roles[role] if c not in key]
+    if len(key) + len(set(rest)) <= max_columns:
+        return key + list(dict.fromkeys(rest)), True
+    return key[:max_columns], False
+
+
+def index_name(table: str, columns: List[str]) -> str:
+    name = f"{INDEX_PREFIX}{table}_{'_'.join(columns)}"
+    if len(name) > 60:
+        name = f"{INDEX_PREFIX}{table}_{hashlib.sha1(','.join(columns).encode()).hexdigest()[:10]}"
+    return name.lower()
+
+
+def existing_indexes(conn: sqlite3.Connection, table: str) -> List[List[str]]:
+    """The column lists of the table's existing indexes (including those behind UNIQUE / PRIMARY KEY)."""
+    indexes = []
+    for row in conn.execute(f'PRAGMA index_list("{table}");'):
+        indexes.append([info[2] for info in conn.execute(f'PRAGMA index_info("{row[1]}");')])
+    return indexes
+
+
+def _index_sql(table: str, columns: List[str]) -> str:
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    return f'CREATE INDEX IF NOT EXISTS "{index_name(table, columns)}" ON "{table}" ({quoted});'
+
+
+def plan_quality(plan: List[str], index: str) -> Optional[Tuple[int, bool, bool]]:
+    """
+    How well a plan uses `index`: (constrained columns, covering, no temporary B-tree), or None
+    when the plan does not use it at all.
+    """
+    uses = [detail for detail in plan if re.search(rf"INDEX {index}\b", detail)]
+    if not uses:
+        return None
+    constrained = sum(len(re.findall(r"\w+(?:=|>|<|>=|<=)\?", detail)) for detail in uses)
+    covering = all("COVERING INDEX" in detail for detail in uses)
+    return constrained, covering, not any("USE TEMP B-TREE" in detail for detail in plan)
+
+
+def _served(ddl: List[str], table: str, columns: List[str], statements: List[str]) -> Dict[str, Tuple[int, bool, bool]]:
+    """The plan quality of every statement that uses the index, in an empty in-memory copy of the schema."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        for statement in ddl:
+            conn.execute(statement)
+        conn.execute(_index_sql(table, columns))
+        served = {}
+        for sql in statements:
+            quality = plan_quality(query_plan(sql, conn), index_name(table, columns))
+            if quality is not None:
+                served[sql] = quality
+        return served
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+def advise(workload: List[Dict], conn: sqlite3.Connection, schema_info: Dict[str, Set[str]],
+           max_columns: int = INDEX_ADVISOR_MAX_COLUMNS) -> List[Dict]:
+    """
+    Proposes indexes for the logged workload, ranked by estimated benefit.
+
+    Only statements whose current plan scans a table (or sorts through a temporary B-tree) are
+    considered, and candidates matching an existing index are dropped. Since an index derived from
+    one statement often serves others, every candidate is checked with EXPLAIN QUERY PLAN against
+    all scanning statements on its table, in an empty in-memory copy of the schema; it serves a
+    statement when the plan constrains, covers and sorts at least as well as with the statement's
+    own candidate. Candidates are then picked greedily: the one serving the most remaining logged
+    execution time first. That time is the proposal's estimated benefit.
+    """
+    ddl = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL AND name NOT LIKE 'sqlite_%';")]
+    candidates: Dict[Tuple[str, Tuple[str, ...]], List[str]] = {}
+    for entry in workload:
+        scanned = scanned_tables(query_plan(entry["sql"], conn))
+        if not scanned:
+            continue
+        # Plans name aliased tables by their alias
+        for name, alias in table_references(tokenize(entry["sql"]))[0]:
+            if alias and alias.lower() in scanned:
+                scanned.add(name.lower())
+        for table, roles in column_usage(entry["sql"], schema_info).items():
+            if table.lower() not in scanned:
+                continue
+            columns, _ = candidate_columns(roles, max_columns)
+            if columns:
+                candidates.setdefault((table, tuple(columns)), []).append(entry["sql"])
+
+    plans: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Tuple]] = {}
+    for table, columns in candidates:
+        if any(existing[:len(columns)] == list(columns) for existing in existing_indexes(conn, table)):
+            continue
+        statements = sorted({sql for (t, _), sqls in candidates.items() if t == table for sql in sqls})
+        plans[(table, columns)] = _served(ddl, table, list(columns), statements)
+
+    # A statement counts as served by an index whose plan is at least as good as with its own candidate
+    own = {sql: plans[key][sql] for key, sqls in candidates.items() if key in plans for sql in sqls if sql in plans[key]}
+    served: Dict[Tuple[str, Tuple[str, ...]], Dict[str, bool]] = {
+        key: {sql: quality[1] for sql, quality in qualities.items()
+              if sql in own and all(a >= b for a, b in zip(quality, own[sql]))}
+        for key, qualities in plans.items()
+    }
+
+    by_sql = {entry["sql"]: entry for entry in workload}
+    remaining = {sql for plans in served.values() for sql in plans}
+
+    def benefit(key) -> float:
+        return sum(by_sql[sql]["total_ms"] for sql in served[key] if sql in remaining)
+
+    proposals = []
+    while served:
+        best = max(served, key=lambda key: (benefit(key), -len(key[1])))  # Narrower index on ties
+        plans = {sql: covering for sql, covering in served.pop(best).items() if sql in remaining}
+        if not plans:
+            break
+        remaining -= set(plans)
+        table, columns = best
+        statements = [by_sql[sql] for sql in plans]
+        proposals.append({
+            "name": index_name(table, list(columns)),
+            "table": table,
+            "columns": list(columns),
+            "covering": all(plans.values()),
+            "sql": _index_sql(table, list(columns)),
+            "statements": len(statements),
+            "executions": sum(s["count"] for s in statements),
+            "estimated_benefit_ms": round(sum(s["total_ms"] for s in statements), 3),
+            "examples": [s["sql"] for s in statements[:3]],
+        })
+    return proposals
+
+
+def create_indexes(proposals: List[Dict], conn: sqlite3.Connection) -> List[Dict]:
+    """
+    Builds the proposed indexes on a writable connection and refreshes the planner statistics.
+    Returns [{name, seconds}] for each index built.
+    """
+    built = []
+    for proposal in proposals:
+        start = time.perf_counter()
+        conn.execute(proposal["sql"])
+        conn.commit()
+        built.append({"name": proposal["name"], "seconds": round(time.perf_counter() - start, 3)})
+    if built:
+        conn.execute("ANALYZE;")
+        conn.commit()
+    return built
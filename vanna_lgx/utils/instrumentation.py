@@ -0,0 +1,187 @@
+# vanna_lgx/utils/instrumentation.py
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from vanna_lgx.config import METRICS_JSONL_PATH, METRICS_EXPORT_JSONL
+from vanna_lgx.utils.cancellation import current_token
+
+# The external calls (LLM, embedding, vector store, SQLite) made by the node that is currently
+# running in this context. Set by `instrument_node`; None outside a node.
+_current_calls: ContextVar[Optional[List[Dict]]] = ContextVar("vanna_lgx_calls", default=None)
+
+
+def is_recording() -> bool:
+    """True inside an instrumented node, so callers can skip work (e.g. token counting) otherwise."""
+    return _current_calls.get() is not None
+
+
+def record_call(kind: str, name: str, ms: float, **fields):
+    """Attributes one external call to the running node. A no-op outside an instrumented node."""
+    calls = _current_calls.get()
+    if calls is not None:
+        calls.append({"kind": kind, "name": name, "ms": round(ms, 3), **fields})
+
+
+@contextmanager
+def timed_call(kind: str, name: str, **fields) -> Iterator[Dict]:
+    """
+    Times the block and records it as one call. The yielded dict can be filled with extra
+    fields (row counts, cache hits, ...) inside the block.
+    """
+    extra = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        record_call(kind, name, (time.perf_counter() - start) * 1000, **extra)
+
+
+def count_tokens(text: str) -> int:
+    from vanna_lgx.core.resources import get_resources
+    return len(get_resources().tokenizer.encode(text))
+
+
+def instrument_node(name: str, node: Callable[[Dict], Dict], starts_run: bool = False) -> Callable[[Dict], Dict]:
+    """
+    Wraps a graph node so that every run appends one record to the state's `metrics`:
+    {node, ms, llm_calls, prompt_tokens, completion_tokens, calls}, where `calls` lists the
+    LLM, embedding, vector store and SQLite calls the node made. The record of a node that
+    `starts_run` is flagged so that it replaces the records of a session's previous turn.
+    Nodes of a cancelled run raise RunCancelled instead of running, and a node that raises
+    cancels its run.
+    """
+    @functools.wraps(node)
+    def wrapper(state: Dict) -> Dict:
+        if (cancel := current_token()) is not None:
+            cancel.raise_if_cancelled()
+        calls: List[Dict] = []
+        token = _current_calls.set(calls)
+        start = time.perf_counter()
+        try:
+            output = node(state)
+        except BaseException:
+            if cancel is not None:
+                cancel.cancel()  # The run fails: its parallel branch stops and its cleanups run
+            raise
+        finally:
+            _current_calls.reset(token)
+        llm_calls = [c for c in calls if c["kind"] == "llm"]
+        record = {
+            "node": name,
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+            "llm_calls": len(llm_calls),
+            "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in llm_calls),
+            "completion_tokens": sum(c.get("completion_tokens", 0) for c in llm_calls),
+            "calls": list(calls),  # Snapshot: late background calls must not mutate the state
+        }
+        if starts_run:
+            record["starts_run"] = True
+        # Nodes may hand back the whole incoming state; only this run's record is new.
+        return {**output, "metrics": [record]}
+    return wrapper
+
+
+def summarize_metrics(metrics: List[Dict], repair_attempts: int = 0) -> Dict:
+    """Aggregates one run's node records into per-node and per-call-kind totals."""
+    nodes: Dict[str, Dict] = {}
+    call_kinds: Dict[str, Dict] = defaultdict(lambda: {"count": 0, "ms": 0.0})
+    for record in metrics:
+        node = nodes.setdefault(record["node"], {"runs": 0, "ms": 0.0, "llm_calls": 0,
+                                                 "prompt_tokens": 0, "completion_tokens": 0})
+        node["runs"] += 1
+        for key in ("ms", "llm_calls", "prompt_tokens", "completion_tokens"):
+            node[key] += record[key]
+        for call in record["calls"]:
+            call_kinds[call["kind"]]["count"] += 1
+            call_kinds[call["kind"]]["ms"] += call["ms"]
+    for stats in [*nodes.values(), *call_kinds.values()]:
+        stats["ms"] = round(stats["ms"], 3)
+    return {
+        "node_ms": round(sum(n["ms"] for n in nodes.values()), 3),
+        "llm_calls": sum(n["llm_calls"] for n in nodes.values()),
+        "prompt_tokens": sum(n["prompt_tokens"] for n in nodes.values()),
+        "completion_tokens": sum(n["completion_tokens"] for n in nodes.values()),
+        "retries": sum(n["runs"] - 1 for n in nodes.values()),  # Node re-runs, i.e. the repair loop
+        "repair_attempts": repair_attempts,
+        "nodes": nodes,
+        "calls": dict(call_kinds),
+    }
+
+
+def export_jsonl(metrics: List[Dict], run_id: str, question: str = "", path: str = METRICS_JSONL_PATH):
+    """Appends one JSON line per node record of a run, tagged with the run id and question."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    timestamp = time.time()
+    with open(path, "a") as f:
+        for record in metrics:
+            f.write(json.dumps({"run_id": run_id, "ts": timestamp, "question": question, **record}) + "\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide counters over every instrumented run, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, metrics: List[Dict], repair_attempts: int = 0):
+        with self._lock:
+            c = self._counters
+            c["vanna_lgx_runs_total"][""] += 1
+            c["vanna_lgx_repair_attempts_total"][""] += repair_attempts
+            runs_per_node = defaultdict(int)
+            for record in metrics:
+                node = _labels(node=record["node"])
+                runs_per_node[record["node"]] += 1
+                c["vanna_lgx_node_runs_total"][node] += 1
+                c["vanna_lgx_node_seconds_total"][node] += record["ms"] / 1000
+                c["vanna_lgx_llm_tokens_total"][_labels(node=record["node"], type="prompt")] += record["prompt_tokens"]
+                c["vanna_lgx_llm_tokens_total"][_labels(node=record["node"], type="completion")] += record["completion_tokens"]
+                for call in record["calls"]:
+                    labels = _labels(kind=call["kind"], name=call["name"])
+                    c["vanna_lgx_calls_total"][labels] += 1
+                    c["vanna_lgx_call_seconds_total"][labels] += call["ms"] / 1000
+            for node, runs in runs_per_node.items():
+                c["vanna_lgx_node_retries_total"][_labels(node=node)] += runs - 1
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            for metric in sorted(self._counters):
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(self._counters[metric].items()):
+                    lines.append(f"{metric}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def record_run(metrics: List[Dict], question: str = "", repair_attempts: int = 0,
+               run_id: Optional[str] = None) -> Dict:
+    """
+    Finishes the instrumentation of one graph run: adds it to the process-wide registry,
+    appends it to the JSON lines export (if METRICS_EXPORT_JSONL) and returns its summary.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    REGISTRY.observe(metrics, repair_attempts)
+    if METRICS_EXPORT_JSONL:
+        try:
+            export_jsonl(metrics, run_id, question)
+        except OSError as e:
+            print(f"--- Could not export metrics: {e} ---")
+    return {"run_id": run_id, **summarize_metrics(metrics, repair_attempts)}
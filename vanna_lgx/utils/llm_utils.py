@@ -0,0 +1,131 @@
+# vanna_lgx/utils/llm_utils.py
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from langgraph.config import get_stream_writer
+
+from vanna_lgx.config import STREAM_TOKENS, OLLAMA_MAX_CONCURRENCY
+from vanna_lgx.utils.cancellation import current_token
+from vanna_lgx.utils.instrumentation import is_recording, record_call, count_tokens
+
+# Bounds the number of in-flight requests to Ollama across all concurrent graph runs.
+_ollama_slots = threading.BoundedSemaphore(OLLAMA_MAX_CONCURRENCY)
+# Slots currently held, counted alongside the semaphore (which does not expose its count)
+_slots_in_use = 0
+_slots_lock = threading.Lock()
+# How often a cancellable run waiting for a slot checks whether it was cancelled
+_SLOT_POLL_SECONDS = 0.05
+
+
+def _acquire_slot(timeout=None) -> bool:
+    global _slots_in_use
+    if not _ollama_slots.acquire(timeout=timeout):
+        return False
+    with _slots_lock:
+        _slots_in_use += 1
+    return True
+
+
+def _release_slot():
+    global _slots_in_use
+    with _slots_lock:
+        _slots_in_use -= 1
+    _ollama_slots.release()
+
+
+@contextmanager
+def ollama_slot() -> Iterator[None]:
+    """
+    Holds one of the OLLAMA_MAX_CONCURRENCY request slots for the duration of the block.
+    In a cancellable run, waiting stops and the slot is released as soon as the run is
+    cancelled, even while the call holding it is still blocked on Ollama.
+    """
+    cancel = current_token()
+    if cancel is None:
+        _acquire_slot()
+        try:
+            yield
+        finally:
+            _release_slot()
+        return
+
+    cancel.raise_if_cancelled()
+    while not _acquire_slot(timeout=_SLOT_POLL_SECONDS):
+        cancel.raise_if_cancelled()
+    released = threading.Lock()
+
+    def release():
+        if released.acquire(blocking=False):  # Once, by the cancelling thread or by this one
+            _release_slot()
+
+    try:
+        with cancel.on_cancel(release):
+            yield
+    finally:
+        release()
+
+
+def free_ollama_slots() -> int:
+    """The number of Ollama request slots not held by any call right now."""
+    with _slots_lock:
+        return OLLAMA_MAX_CONCURRENCY - _slots_in_use
+
+
+def _stream_writer():
+    """The LangGraph custom-stream writer of the running node, or None outside a graph run."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return None
+
+
+def _record_llm_call(node: str, prompt: str, text: str, ms: float, ttft_ms: float, streamed: bool):
+    if is_recording():
+        record_call("llm", node, ms, ttft_ms=round(ttft_ms, 3), streamed=streamed,
+                    prompt_tokens=count_tokens(prompt), completion_tokens=count_tokens(text))
+
+
+def generate(llm, prompt: str, node: str, stream: bool = STREAM_TOKENS) -> Tuple[str, float]:
+    """
+    Calls the LLM and returns (text, time_to_first_token_ms).
+
+    With streaming on, tokens are pushed as they arrive through LangGraph's custom stream
+    as {"node", "token"} events, followed by one {"node", "done", "ttft_ms"} event, so
+    callers using stream_mode="custom" can render partial output. Without streaming the
+    whole completion is the first token. Every call holds an Ollama concurrency slot and
+    is recorded (with prompt and completion token counts) by the instrumented node.
+    Cancellable runs always stream, so that a cancelled call stops at its next token.
+    """
+    cancel = current_token()
+    with ollama_slot():
+        start = time.perf_counter()
+        writer = _stream_writer() if stream else None
+        if writer is None and cancel is None:
+            text = llm.invoke(prompt)
+            ms = (time.perf_counter() - start) * 1000
+            _record_llm_call(node, prompt, text, ms, ms, streamed=False)
+            return text, ms
+
+        parts, ttft_ms = [], None
+        tokens = llm.stream(prompt)
+        try:
+            for token in tokens:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                parts.append(token)
+                if writer is not None:
+                    writer({"node": node, "token": token})
+        finally:
+            tokens.close()  # Drops the connection of a cancelled generation
+    ms = (time.perf_counter() - start) * 1000
+    ttft_ms = ttft_ms if ttft_ms is not None else ms
+    text = "".join(parts)
+    _record_llm_call(node, prompt, text, ms, ttft_ms, streamed=writer is not None)
+    if writer is not None:
+        writer({"node": node, "done": True, "ttft_ms": ttft_ms})
+    return text, ttft_ms
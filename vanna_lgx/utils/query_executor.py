@@ -0,0 +1,179 @@
+# vanna_lgx/utils/query_executor.py
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+
+from vanna_lgx.config import (
+    QUERY_TIMEOUT_SECONDS,
+    QUERY_MAX_ROWS,
+    QUERY_MAX_BYTES,
+    QUERY_FETCH_CHUNK_ROWS,
+    QUERY_PROGRESS_OPS,
+)
+from vanna_lgx.utils.db_utils import get_readonly_connection
+from vanna_lgx.utils.instrumentation import record_call
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query exceeds its wall-clock budget before producing any row (or, when
+    streaming a complete result, before the last one)."""
+
+
+class QueryDeadline:
+    """
+    A wall-clock budget for the SQLite work of one statement, enforced by a progress handler
+    that interrupts the statement from inside the VM. Only the time spent inside `with deadline:`
+    blocks (execute and fetch calls) is counted, so streaming a result to a slow consumer does
+    not use up the budget, while a runaway statement is still interrupted.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, timeout_seconds: float = QUERY_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self.remaining = timeout_seconds
+        self._started = None
+        self._deadline = float("inf")
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > self._deadline else 0, QUERY_PROGRESS_OPS)
+
+    def __enter__(self) -> "QueryDeadline":
+        self._started = time.monotonic()
+        self._deadline = self._started + self.remaining
+        return self
+
+    def __exit__(self, *exc_info):
+        self.remaining -= time.monotonic() - self._started
+        self._deadline = float("inf")
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def check(self, error: sqlite3.OperationalError):
+        """Re-raises an interruption by this deadline as a QueryTimeoutError; other errors as they are."""
+        if self.expired and "interrupted" in str(error):
+            raise QueryTimeoutError(f"Query exceeded the {self.timeout_seconds}s timeout.") from error
+        raise error
+
+
+def execute_bounded(sql: str, conn: sqlite3.Connection,
+                    timeout_seconds: float = QUERY_TIMEOUT_SECONDS,
+                    max_rows: int = QUERY_MAX_ROWS,
+                    max_bytes: int = QUERY_MAX_BYTES,
+                    chunk_size: int = QUERY_FETCH_CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Executes a query under a wall-clock timeout and a row / memory budget.
+
+    The timeout is enforced by SQLite's progress handler, which interrupts the statement
+    from inside the VM. Rows are fetched in chunks, and fetching stops as soon as the row
+    or the (estimated) memory budget is exhausted. Returns the DataFrame and an info dict:
+    {rows, truncated, truncation_reason, approx_bytes, elapsed_ms}.
+    """
+    start = time.monotonic()
+    deadline = QueryDeadline(conn, timeout_seconds)
+
+    chunks, rows, approx_bytes, truncation_reason = [], 0, 0, None
+    cursor = None
+    try:
+        with deadline:
+            cursor = conn.execute(sql)
+            columns = [d[0] for d in cursor.description or []]
+            while True:
+                batch = cursor.fetchmany(min(chunk_size, max_rows - rows))
+                if not batch:
+                    break
+                chunk = pd.DataFrame.from_records(batch, columns=columns)
+                chunks.append(chunk)
+                rows += len(chunk)
+                approx_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+                if approx_bytes >= max_bytes:
+                    truncation_reason = "memory_limit"
+                    break
+                if rows >= max_rows:
+                    if cursor.fetchone() is not None:
+                        truncation_reason = "row_limit"
+                    break
+    except sqlite3.OperationalError as e:
+        if not chunks:
+            deadline.check(e)
+        elif "interrupted" not in str(e) or not deadline.expired:
+            raise
+        truncation_reason = "timeout"
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.set_progress_handler(None, 0)
+
+    if chunks:
+        result_df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    else:
+        result_df = pd.DataFrame(columns=columns)
+
+    info = {
+        "rows": len(result_df),
+        "truncated": truncation_reason is not None,
+        "truncation_reason": truncation_reason,
+        "approx_bytes": approx_bytes,
+        "elapsed_ms": (time.monotonic() - start) * 1000,
+    }
+    record_call("sqlite", "execute", info["elapsed_ms"], rows=info["rows"], truncated=info["truncated"])
+    return result_df, info
+
+
+class ResultHandle:
+    """
+    A lazy handle on the complete result of a query. Nothing is fetched until
+    `iter_chunks` is called, which re-runs the query on its own read-only connection
+    and yields DataFrame chunks, so full exports never have to fit in memory.
+    `arrow()` spools the result in Arrow form for paginated reads and file exports;
+    `close()` removes the spool once the result is no longer shown.
+    """
+
+    def __init__(self, sql: str, chunk_size: int = QUERY_FETCH_CHUNK_ROWS):
+        self.sql = sql
+        self.chunk_size = chunk_size
+        self._arrow = None
+        self._lock = threading.Lock()
+
+    def arrow(self):
+        """The `ArrowResult` of the query, created on first use and shared by later calls."""
+        with self._lock:
+            if self._arrow is None:
+                # pyarrow is only needed once a result is paged or exported
+                from vanna_lgx.utils.result_store import ArrowResult
+                self._arrow = ArrowResult(self.sql)
+            return self._arrow
+
+    def close(self):
+        """Removes the Arrow spool, if any; a later `arrow()` call starts a new one."""
+        with self._lock:
+            if self._arrow is not None:
+                self._arrow.close()
+                self._arrow = None
+
+    def iter_chunks(self, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yields the complete result in DataFrame chunks. There is no row cap, but the SQLite work
+        of the whole iteration stays within QUERY_TIMEOUT_SECONDS (see `QueryDeadline`).
+        """
+        conn = get_readonly_connection()
+        deadline = QueryDeadline(conn)
+        try:
+            with deadline:
+                cursor = conn.execute(self.sql)
+            columns = [d[0] for d in cursor.description or []]
+            while True:
+                with deadline:
+                    batch = cursor.fetchmany(chunk_size or self.chunk_size)
+                if not batch:
+                    break
+                yield pd.DataFrame.from_records(batch, columns=columns)
+        except sqlite3.OperationalError as e:
+            deadline.check(e)
+        finally:
+            conn.close()
+
+    def __repr__(self) -> str:
+        return f"ResultHandle({self.sql!r})"
@@ -0,0 +1,156 @@
+# vanna_lgx/utils/question_rewriter.py
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from vanna_lgx.config import KNOWLEDGE_BASE_PATH, REWRITE_EXPLICITNESS_THRESHOLD, REWRITE_MEMO_ITEMS
+from vanna_lgx.utils.answer_cache import normalize_question
+from vanna_lgx.utils.reranker import words
+
+# Glossary lines of the knowledge docs: "- ONT (Optical Network Terminal): ... also known as a CPE, user modem, or user device."
+GLOSSARY_LINE = re.compile(r"^\s*[-*]\s*([A-Za-z0-9][\w/-]*)\s*\(([^)]+)\)\s*:\s*(.+)$")
+ALIASES = re.compile(r"\b(?:also known as|also called|aka)\s+(?:an?\s+|the\s+)?([^.;]+)", re.IGNORECASE)
+
+# Words that say how to query, not what: they neither ground nor blur a question.
+QUERY_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "has", "have", "had",
+    "what", "which", "who", "whose", "when", "where", "how", "why", "many", "much",
+    "show", "list", "give", "get", "find", "return", "display", "tell", "me", "us", "i", "we", "there",
+    "count", "number", "total", "sum", "average", "avg", "mean", "max", "maximum", "min", "minimum",
+    "distinct", "unique", "each", "every", "per", "all", "any", "top", "most", "least", "highest", "lowest",
+    "first", "last", "latest", "recent", "day", "week", "month", "year", "hour", "today", "yesterday",
+    "of", "in", "on", "at", "by", "for", "to", "from", "with", "without", "and", "or", "not", "no",
+    "than", "more", "less", "over", "under", "between", "above", "below", "it", "its", "their", "that", "this",
+    "these", "those", "please", "can", "you", "order", "sorted", "group", "grouped",
+}
+
+
+def parse_glossary(text: str) -> Dict[str, str]:
+    """
+    Maps every alias of a glossary term (lower-cased) to the term: its expansion, the names listed
+    after "also known as", and the last word of a multi-word alias when no other glossary line
+    mentions it (e.g. "user modem" also registers "modem").
+    """
+    entries = []
+    for line in text.splitlines():
+        match = GLOSSARY_LINE.match(line)
+        if not match:
+            continue
+        term, expansion, description = match.groups()
+        aliases = [expansion]
+        for listed in ALIASES.findall(description):
+            aliases += [a.strip() for a in re.split(r",|\bor\b|\band\b", listed) if a.strip()]
+        entries.append((term, aliases, line.lower()))
+
+    glossary = {}
+    for term, aliases, _ in entries:
+        glossary[term.lower()] = term
+        for alias in aliases:
+            alias = " ".join(re.sub(r"^(?:an?|the)\s+", "", alias, flags=re.IGNORECASE).split())
+            glossary.setdefault(alias.lower(), term)
+            head = alias.split()[-1].lower()
+            others = [other for other_term, _, other in entries if other_term != term]
+            if " " in alias and head not in glossary and not any(re.search(rf"\b{re.escape(head)}", o) for o in others):
+                glossary[head] = term
+    return glossary
+
+
+def load_glossary(docs_path: str = os.path.join(KNOWLEDGE_BASE_PATH, "docs")) -> Dict[str, str]:
+    """The glossary of all .txt files in the knowledge docs folder (empty when there is none)."""
+    glossary = {}
+    try:
+        filenames = sorted(f for f in os.listdir(docs_path) if f.endswith(".txt"))
+    except OSError:
+        return glossary
+    for filename in filenames:
+        with open(os.path.join(docs_path, filename), "r", encoding="utf-8") as f:
+            for alias, term in parse_glossary(f.read()).items():
+                glossary.setdefault(alias, term)
+    return glossary
+
+
+class QuestionRewriter:
+    """
+    The deterministic rewrite stage in front of the LLM rewriter. Glossary aliases are replaced by
+    their term with one compiled regex (longest alias first), then the question is scored by how
+    explicit it is: the share of its content words that are table / column names or glossary terms.
+    Quoted literals, numbers and capitalized words inside the sentence count as values and are ignored;
+    unknown words and unresolved acronyms lower the score.
+
+    Final rewrites, from either stage, are memoized per normalized question in an LRU.
+    """
+
+    def __init__(self, glossary: Dict[str, str], vocabulary: Set[str],
+                 threshold: float = REWRITE_EXPLICITNESS_THRESHOLD, max_memo_items: int = REWRITE_MEMO_ITEMS):
+        self.glossary = glossary
+        self.vocabulary = set(vocabulary) | {w for term in glossary.values() for w in words(term)}
+        self.threshold = threshold
+        self.max_memo_items = max_memo_items
+        aliases = sorted(glossary, key=len, reverse=True)
+        self._matcher = re.compile(
+            r"\b(" + "|".join(r"\s+".join(map(re.escape, a.split())) for a in aliases) + r")(e?s)?\b", re.IGNORECASE
+        ) if aliases else None
+        self._memo: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expand(self, question: str) -> Dict:
+        """Replaces glossary aliases by their term: {"question", "expansions": [{alias, term}]}."""
+        expansions = []
+
+        def replace(match: re.Match) -> str:
+            alias, plural = match.group(1), match.group(2) or ""
+            term = self.glossary[" ".join(alias.lower().split())]
+            if alias == term:
+                return match.group(0)
+            expansions.append({"alias": alias + plural, "term": term})
+            return term + ("s" if plural else "")
+
+        rewritten = self._matcher.sub(replace, question) if self._matcher else question
+        return {"question": rewritten, "expansions": expansions}
+
+    def explicitness(self, question: str) -> Dict:
+        """{"score", "grounded", "unknown"}: the score is grounded / (grounded + unknown) content words."""
+        text = re.sub(r"'[^']*'|\"[^\"]*\"", " ", question)  # Quoted literals are values
+        grounded, unknown = [], []
+        for position, token in enumerate(re.findall(r"[A-Za-z][A-Za-z0-9_-]*", text)):
+            terms = [w for w in words(token) if w not in QUERY_WORDS and not w.isdigit()]
+            if not terms:
+                continue
+            if all(w in self.vocabulary for w in terms):
+                grounded.append(token)
+            elif position > 0 and token[0].isupper() and not token.isupper():
+                continue  # A capitalized word inside the sentence names a value (a region, a model...)
+            else:
+                unknown.append(token)
+        total = len(grounded) + len(unknown)
+        return {"score": round(len(grounded) / total, 4) if grounded else 0.0, "grounded": grounded, "unknown": unknown}
+
+    def rewrite(self, question: str) -> Dict:
+        """The deterministic rewrite: {"question", "expansions", "score", "unknown", "confident"}."""
+        expanded = self.expand(question)
+        scored = self.explicitness(expanded["question"])
+        return {**expanded, "score": scored["score"], "unknown": scored["unknown"],
+                "confident": scored["score"] >= self.threshold}
+
+    def recall(self, question: str) -> Optional[Dict]:
+        with self._lock:
+            key = normalize_question(question)
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        return None
+
+    def remember(self, question: str, result: Dict):
+        with self._lock:
+            key = normalize_question(question)
+            self._memo[key] = result
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_memo_items:
+                self._memo.popitem(last=False)
+
+    def needs_llm(self, question: str) -> bool:
+        """True when neither the memo nor the deterministic rewrite can answer the question."""
+        return self.recall(question) is None and not self.rewrite(question)["confident"]
@@ -0,0 +1,120 @@
+# vanna_lgx/utils/reranker.py
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from vanna_lgx.config import (
+    RERANK_EMBEDDING_WEIGHT,
+    RERANK_COSINE_FLOOR,
+    RERANK_COSINE_CEILING,
+    RERANK_KEEP_THRESHOLD,
+    RERANK_AMBIGUITY_MARGIN,
+)
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+KEEP = "keep"
+DROP = "drop"
+AMBIGUOUS = "ambiguous"
+
+
+def rerank_text(doc: str) -> str:
+    """
+    The text a knowledge entry was embedded with by scripts.refresh_knowledge_base, so its
+    embedding is normally served from the embedding cache: the question for SQL examples,
+    the whole text for docs.
+    """
+    if doc.lstrip().upper().startswith("QUESTION:"):
+        return doc.split("\nSQL:", 1)[0].strip()[len("Question:"):].strip()
+    return doc
+
+
+def words(text: str) -> List[str]:
+    """
+    Lower-cased words, with identifiers also split on underscores and a plural 's' removed:
+    the terms of the lexical rerank score and of the question rewriter's vocabulary.
+    """
+    found = []
+    for word in re.findall(r"[A-Za-z0-9_]+", text.lower()):
+        parts = [word] + (word.split("_") if "_" in word else [])
+        found += [p[:-1] if len(p) > 3 and p.endswith("s") else p for p in parts if p]
+    return found
+
+
+def schema_vocabulary(schema_info: Dict[str, Set[str]]) -> Set[str]:
+    """Table and column names and their underscore-separated parts, the terms the lexical score counts."""
+    names = [name for table, columns in schema_info.items() for name in (table, *columns)]
+    return {word for word in words(" ".join(names)) if len(word) > 1}
+
+
+def bm25_scores(query_terms: List[str], docs_terms: List[List[str]]) -> List[float]:
+    """Okapi BM25 of each document for the query, with document frequencies taken over `docs_terms`."""
+    n_docs = len(docs_terms)
+    avg_len = sum(len(terms) for terms in docs_terms) / n_docs if n_docs else 0.0
+    doc_freq = Counter(term for terms in docs_terms for term in set(terms))
+    scores = []
+    for terms in docs_terms:
+        counts = Counter(terms)
+        score = 0.0
+        for term in set(query_terms):
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / (avg_len or 1)))
+        scores.append(score)
+    return scores
+
+
+def calibrated_cosine(query_embedding: List[float], doc_embeddings: List[List[float]]) -> List[float]:
+    """Cosine similarities mapped from [RERANK_COSINE_FLOOR, RERANK_COSINE_CEILING] to [0, 1]."""
+    if not doc_embeddings:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float64)
+    docs = np.asarray(doc_embeddings, dtype=np.float64)
+    norms = np.linalg.norm(docs, axis=1) * np.linalg.norm(query)
+    cosines = docs @ query / np.where(norms == 0, 1.0, norms)
+    scaled = (cosines - RERANK_COSINE_FLOOR) / (RERANK_COSINE_CEILING - RERANK_COSINE_FLOOR)
+    return np.clip(scaled, 0.0, 1.0).tolist()
+
+
+def score_candidates(question: str, query_embedding: List[float], docs: List[str], doc_embeddings: List[List[float]],
+                     vocabulary: Set[str]) -> List[Dict]:
+    """
+    Scores every candidate document for the question in [0, 1]: a weighted sum of the calibrated
+    embedding cosine and BM25 over the schema terms of the question (relative to the best
+    candidate). Questions mentioning no table or column name are scored by the embedding alone.
+    """
+    semantic = calibrated_cosine(query_embedding, doc_embeddings)
+    query_terms = [word for word in words(question) if word in vocabulary]
+    lexical = bm25_scores(query_terms, [[w for w in words(doc) if w in vocabulary] for doc in docs])
+    best = max(lexical, default=0.0)
+    weight = RERANK_EMBEDDING_WEIGHT if best > 0 else 1.0
+
+    scored = []
+    for sem, lex in zip(semantic, lexical):
+        lex = lex / best if best > 0 else 0.0
+        scored.append({"score": round(weight * sem + (1 - weight) * lex, 4),
+                       "semantic": round(sem, 4), "lexical": round(lex, 4)})
+    return scored
+
+
+def decide(score: float, threshold: float = RERANK_KEEP_THRESHOLD, margin: float = RERANK_AMBIGUITY_MARGIN) -> str:
+    """KEEP or DROP when the score is clearly above or below the threshold, else AMBIGUOUS."""
+    if score >= threshold + margin:
+        return KEEP
+    if score < threshold - margin:
+        return DROP
+    return AMBIGUOUS
+
+
+def split_candidates(scored: List[Dict]) -> Tuple[List[int], List[int], List[int]]:
+    """Indices of the candidates to keep, to drop and to send to the judge."""
+    decisions = [decide(s["score"]) for s in scored]
+    return tuple([i for i, d in enumerate(decisions) if d == kind] for kind in (KEEP, DROP, AMBIGUOUS))
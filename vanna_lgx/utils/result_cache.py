@@ -0,0 +1,245 @@
+# vanna_lgx/utils/result_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from vanna_lgx.config import (
+    DB_PATH,
+    QUERY_MAX_ROWS,
+    QUERY_MAX_BYTES,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_ENTRY_FRACTION,
+    RESULT_CACHE_TIME_DEPENDENT_TTL_SECONDS,
+)
+from vanna_lgx.utils.instrumentation import record_call
+from vanna_lgx.utils.query_executor import execute_bounded
+
+SQL_TOKEN = re.compile(
+    r"(?P<comment>--[^\n]*|/\*.*?(?:\*/|$))"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r"|(?P<blob>[xX]'[0-9A-Fa-f]*')"
+    r"|(?P<quoted>\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|`(?:[^`]|``)*`)"
+    r"|(?P<number>0[xX][0-9A-Fa-f]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_$]*)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>.)",
+    re.DOTALL,
+)
+# Results of SQL using these can differ between two runs on the same data
+NONDETERMINISTIC = {"RANDOM", "RANDOMBLOB", "CHANGES", "TOTAL_CHANGES", "LAST_INSERT_ROWID"}
+TIME_DEPENDENT = {"CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP"}
+
+
+def _canonical_number(text: str) -> str:
+    if text[:2].lower() == "0x":
+        return str(int(text, 16))
+    if re.fullmatch(r"\d+", text):
+        return str(int(text))
+    return repr(float(text))  # 1.50, 1.5e0 and 01.5 are the same REAL
+
+
+def normalize_sql(sql: str) -> Tuple[str, bool, bool]:
+    """
+    The canonical text of a statement: comments and trailing semicolons removed, whitespace
+    collapsed, keywords and identifiers upper-cased (SQLite compares them case-insensitively)
+    and numeric literals written one way. String literals are kept as they are.
+    Returns (normalized_sql, deterministic, time_dependent).
+    """
+    tokens, deterministic, time_dependent = [], True, False
+    for match in SQL_TOKEN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("comment", "space"):
+            continue
+        if kind == "word":
+            text = text.upper()
+            deterministic &= text not in NONDETERMINISTIC
+            time_dependent |= text in TIME_DEPENDENT
+        elif kind == "number":
+            text = _canonical_number(text)
+        elif kind == "string":
+            time_dependent |= text.lower() == "'now'"
+        elif kind == "blob":
+            text = text.upper()
+        tokens.append(text)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(tokens), deterministic, time_dependent
+
+
+def result_labels(sql: str, conn: sqlite3.Connection) -> Optional[List[str]]:
+    """
+    The column labels `sql` itself produces (SQLite labels expressions with their text as written),
+    read from a LIMIT 0 wrapper that returns before computing any row. None when it cannot be wrapped.
+    """
+    try:
+        cursor = conn.execute(f"SELECT * FROM ({sql.strip().rstrip(';')}) LIMIT 0")
+        try:
+            return [d[0] for d in cursor.description or []]
+        finally:
+            cursor.close()
+    except sqlite3.Error:
+        return None
+
+
+class ResultCache:
+    """
+    An in-memory cache of query results, keyed on the normalized SQL and the execution limits,
+    so different phrasings that produce the same SQL run it only once.
+
+    Each entry is tagged with the database version it was computed against: the identity, size
+    and mtime of the database file and its WAL, plus a generation that is bumped whenever a
+    pooled connection sees its PRAGMA data_version change. Entries of an older version are
+    dropped on lookup. Results are stored column by column, low-cardinality text columns as
+    categoricals, and least recently used entries are evicted beyond `max_bytes`.
+    """
+
+    def __init__(self, path: str = DB_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 max_entry_fraction: float = RESULT_CACHE_MAX_ENTRY_FRACTION,
+                 time_dependent_ttl_seconds: float = RESULT_CACHE_TIME_DEPENDENT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self.time_dependent_ttl_seconds = time_dependent_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._data_versions: Dict[int, int] = {}  # id(connection) -> last PRAGMA data_version it reported
+        self._lock = threading.Lock()
+
+    def database_version(self, conn: sqlite3.Connection) -> Tuple:
+        data_version = conn.execute("PRAGMA data_version;").fetchone()[0]
+        with self._lock:
+            previous = self._data_versions.get(id(conn))
+            if previous is not None and previous != data_version:
+                self._generation += 1  # Another connection committed since this one last looked
+            self._data_versions[id(conn)] = data_version
+            generation = self._generation
+        version = [generation]
+        for path in (self.path, self.path + "-wal"):
+            try:
+                stat = os.stat(path)
+                version += [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    @staticmethod
+    def key(normalized_sql: str, max_rows: int, max_bytes: int) -> str:
+        return hashlib.sha256(f"{max_rows}:{max_bytes}:{normalized_sql}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _compact(df: pd.DataFrame) -> Tuple[Dict, int]:
+        columns = {}
+        for position, name in enumerate(df.columns):
+            series = df.iloc[:, position]
+            textual = series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+            if textual and len(series) > 1 and series.nunique(dropna=False) <= len(series) // 2:
+                values = pd.Categorical(series)
+            else:
+                values = series.to_numpy(copy=True)
+            columns[position] = (name, series.dtype, values)
+        size = 0
+        for _, _, values in columns.values():
+            if isinstance(values, pd.Categorical):
+                size += int(values.memory_usage(deep=True))
+            elif values.dtype == object:
+                size += int(pd.Series(values).memory_usage(index=False, deep=True))  # Counts the Python objects
+            else:
+                size += int(values.nbytes)
+        return columns, size
+
+    @staticmethod
+    def _expand(columns: Dict, labels: Optional[List[str]]) -> pd.DataFrame:
+        names = [name for name, _, _ in columns.values()]
+        if labels is not None and len(labels) == len(names) and len(set(names)) == len(names):
+            names = labels
+        data = {}
+        for i, (_, dtype, values) in columns.items():
+            data[i] = pd.Series(values, copy=True).astype(dtype, copy=False)
+        df = pd.DataFrame(data)
+        df.columns = names
+        return df
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["bytes"]
+            self.evictions += 1
+
+    def get(self, key: str, version: Tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expired = entry["expires_at"] is not None and time.time() > entry["expires_at"]
+            if entry["version"] != version or expired:
+                del self._entries[key]
+                self._bytes -= entry["bytes"]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, version: Tuple, df: pd.DataFrame, info: Dict, time_dependent: bool):
+        columns, size = self._compact(df)
+        if size > self.max_entry_bytes:
+            return
+        expires_at = time.time() + self.time_dependent_ttl_seconds if time_dependent else None
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)["bytes"]
+            self._entries[key] = {"version": version, "columns": columns, "info": info, "bytes": size,
+                                  "expires_at": expires_at}
+            self._bytes += size
+            self._evict()
+
+    def execute(self, sql: str, conn: sqlite3.Connection, max_rows: int = QUERY_MAX_ROWS,
+                max_bytes: int = QUERY_MAX_BYTES, **limits) -> Tuple[pd.DataFrame, Dict]:
+        """
+        `execute_bounded` behind the cache. A hit returns a fresh copy of the stored result with the
+        column labels of `sql` and `cached=True` in the info; misses are executed and stored, except
+        for non-deterministic SQL and results cut short by the timeout.
+        """
+        start = time.perf_counter()
+        normalized, deterministic, time_dependent = normalize_sql(sql)
+        if not deterministic:
+            return execute_bounded(sql, conn, max_rows=max_rows, max_bytes=max_bytes, **limits)
+
+        key = self.key(normalized, max_rows, max_bytes)
+        version = self.database_version(conn)
+        entry = self.get(key, version)
+        if entry is not None:
+            result_df = self._expand(entry["columns"], result_labels(sql, conn))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.hits += 1
+            record_call("result_cache", "hit", elapsed_ms, rows=len(result_df))
+            return result_df, {**entry["info"], "elapsed_ms": elapsed_ms, "cached": True,
+                               "saved_ms": entry["info"]["elapsed_ms"]}
+
+        with self._lock:
+            self.misses += 1
+        result_df, info = execute_bounded(sql, conn, max_rows=max_rows, max_bytes=max_bytes, **limits)
+        if info["truncation_reason"] != "timeout":
+            self.put(key, version, result_df, info, time_dependent)
+        return result_df, {**info, "cached": False}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
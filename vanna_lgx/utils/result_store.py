@@ -0,0 +1,269 @@
+# vanna_lgx/utils/result_store.py
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from vanna_lgx.config import DB_PATH, QUERY_TIMEOUT_SECONDS, RESULT_SPOOL_PATH, RESULT_SPOOL_BATCH_ROWS
+from vanna_lgx.utils.db_utils import get_readonly_connection
+from vanna_lgx.utils.query_executor import QueryDeadline
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "csv": (".csv", "text/csv"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+EXPORT_EXTENSIONS = {".parquet": "parquet", ".pq": "parquet", ".csv": "csv",
+                     ".arrow": "arrow", ".ipc": "arrow", ".feather": "arrow"}
+
+
+def arrow_type(values: List) -> pa.DataType:
+    """The Arrow type of one column of SQLite values; the null type when all of them are NULL."""
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return pa.null()
+    if kinds <= {int}:
+        return pa.int64()
+    if kinds <= {int, float}:
+        return pa.float64()
+    if kinds <= {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def widen(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    """The narrowest type holding the values of both types: int64 widens to float64, anything else to string."""
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if {current, new} == {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+
+def to_record_batch(rows: List[Tuple], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Converts fetched rows to a record batch of `schema` column by column, without going
+    through pandas. String columns take any value as text; values that fit neither their
+    numeric nor binary column raise a ValueError.
+    """
+    arrays = []
+    for field, values in zip(schema, zip(*rows)):
+        if field.type == pa.string():
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        try:
+            arrays.append(pa.array(values, type=field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError) as e:
+            raise ValueError(f"Column '{field.name}' mixes value types ({field.type} expected): {e}") from e
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _release(directory: str, resources: Dict):
+    # Must not reference the ArrowResult, so that it can run when the result is garbage collected
+    if (conn := resources.pop("conn", None)) is not None:
+        conn.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class ArrowResult:
+    """
+    The complete result of a query in Apache Arrow form, spooled lazily to disk.
+
+    The query runs on its own read-only connection, and rows are only fetched when a page,
+    a batch or an export needs them. Every fetched batch of `batch_rows` rows is written to
+    its own Arrow IPC segment under a private spool directory, so memory holds at most one
+    batch while fetching. Pages and exports read the segments memory-mapped: slices and
+    record batches are zero-copy views, and only the requested page is converted to pandas.
+
+    SQLite columns have no fixed type, so the schema is inferred from the values: when a later
+    batch holds a wider type (REAL in an INTEGER column, text in a numeric one), the column is
+    widened and the earlier segments are rewritten in the new schema. The SQLite work of all
+    fetches together stays within `timeout_seconds`, like any other query of the agent.
+    The spool directory is removed by `close()` or when the result is garbage collected.
+    """
+
+    def __init__(self, sql: str, spool_path: str = RESULT_SPOOL_PATH,
+                 batch_rows: int = RESULT_SPOOL_BATCH_ROWS, db_path: str = DB_PATH,
+                 timeout_seconds: float = QUERY_TIMEOUT_SECONDS):
+        self.sql = sql
+        self.batch_rows = batch_rows
+        self.db_path = db_path
+        self.timeout_seconds = timeout_seconds
+        os.makedirs(spool_path, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="result-", dir=spool_path)
+        self.schema: Optional[pa.Schema] = None
+        self.complete = False
+        self.fetch_ms = 0.0
+        self._segments: List[Tuple[str, int]] = []  # (path, rows) in result order
+        self._exports: Dict[str, str] = {}
+        self._cursor: Optional[sqlite3.Cursor] = None
+        self._deadline: Optional[QueryDeadline] = None
+        self._error: Optional[Exception] = None  # A failed fetch fails every later one the same way
+        self._resources: Dict = {}
+        self._lock = threading.RLock()
+        self._finalizer = weakref.finalize(self, _release, self.directory, self._resources)
+
+    @property
+    def rows_fetched(self) -> int:
+        return sum(rows for _, rows in self._segments)
+
+    @property
+    def num_rows(self) -> Optional[int]:
+        """The number of rows of the result, or None until it has been fetched completely."""
+        return self.rows_fetched if self.complete else None
+
+    def _close_connection(self):
+        self._cursor = self._deadline = None
+        if (conn := self._resources.pop("conn", None)) is not None:
+            conn.close()
+
+    def _finish(self):
+        self.complete = True
+        self._close_connection()
+
+    def _widen_schema(self, rows: List[Tuple]):
+        batch_types = [arrow_type(list(values)) for values in zip(*rows)]
+        schema = pa.schema([(field.name, widen(field.type, t)) for field, t in zip(self.schema, batch_types)])
+        if schema.equals(self.schema):
+            return
+        for path, _ in self._segments:
+            # Written next to the segment and renamed over it; pages still reading the old file keep it mapped
+            table = pa.Table.from_batches([self._read_segment(path)]).cast(schema)
+            with pa.ipc.new_file(path + ".tmp", schema) as writer:
+                writer.write_table(table)
+            os.replace(path + ".tmp", path)
+        self.schema = schema
+
+    def _fetch_batch(self) -> bool:
+        """Fetches and spools the next batch; False once the result is exhausted."""
+        if self._error is not None:
+            raise self._error
+        if self.complete:
+            return False
+        start = time.monotonic()
+        if self._deadline is None:
+            # Streamlit serves every rerun from another thread
+            conn = self._resources["conn"] = get_readonly_connection(self.db_path, check_same_thread=False)
+            self._deadline = QueryDeadline(conn, self.timeout_seconds)
+        try:
+            if self._cursor is None:
+                with self._deadline:
+                    self._cursor = self._resources["conn"].execute(self.sql)
+                self.schema = pa.schema([(d[0], pa.null()) for d in self._cursor.description or []])
+            with self._deadline:
+                rows = self._cursor.fetchmany(self.batch_rows)
+        except sqlite3.OperationalError as e:
+            deadline = self._deadline
+            self._close_connection()
+            try:
+                deadline.check(e)  # A QueryTimeoutError once the deadline has passed
+            except Exception as error:
+                self._error = error
+                raise
+        if rows:
+            self._widen_schema(rows)
+            path = os.path.join(self.directory, f"{len(self._segments):06d}.arrow")
+            with pa.ipc.new_file(path, self.schema) as writer:
+                writer.write_batch(to_record_batch(rows, self.schema))
+            self._segments.append((path, len(rows)))
+        if len(rows) < self.batch_rows:
+            self._finish()
+        self.fetch_ms += (time.monotonic() - start) * 1000
+        return bool(rows)
+
+    def _ensure(self, rows: int):
+        while self.rows_fetched < rows and self._fetch_batch():
+            pass
+
+    def _ensure_complete(self):
+        while self._fetch_batch():
+            pass
+
+    @staticmethod
+    def _read_segment(path: str) -> pa.RecordBatch:
+        # The batch's buffers keep the memory map open for as long as they are referenced
+        return pa.ipc.open_file(pa.memory_map(path)).get_batch(0)
+
+    def page(self, number: int, size: int) -> pd.DataFrame:
+        """Rows [number * size, (number + 1) * size) as a DataFrame, fetching only as far as needed."""
+        with self._lock:
+            offset = number * size
+            self._ensure(offset + size)
+            slices, segment_start = [], 0
+            for path, rows in self._segments:
+                segment_end = segment_start + rows
+                if segment_end > offset and segment_start < offset + size:
+                    begin = max(offset - segment_start, 0)
+                    slices.append(self._read_segment(path).slice(begin, min(offset + size, segment_end) - segment_start - begin))
+                segment_start = segment_end
+            schema = self.schema
+        return pa.Table.from_batches(slices, schema=schema).to_pandas()
+
+    def iter_batches(self) -> Iterator[pa.RecordBatch]:
+        """
+        Yields the record batches of the complete result. It is fetched completely first, since
+        a late batch can still widen the schema; the batches are then read one at a time.
+        """
+        with self._lock:
+            self._ensure_complete()
+            paths = [path for path, _ in self._segments]
+        for path in paths:
+            yield self._read_segment(path)
+
+    def export(self, path: Optional[str] = None, file_format: Optional[str] = None) -> str:
+        """
+        Writes the complete result to a Parquet, CSV or Arrow IPC file, one spooled record batch
+        at a time, and returns its path. The format defaults to the one of the file extension. Without
+        a path the file is written to the spool directory once and reused by later calls.
+        """
+        if file_format is None:
+            file_format = EXPORT_EXTENSIONS.get(os.path.splitext(path or "")[1].lower(), "")
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format for '{path}'; use one of "
+                             f"{', '.join(extension for extension, _ in EXPORT_FORMATS.values())}.")
+        with self._lock:  # Pages wait for a running export instead of fetching alongside it
+            if path is None and file_format in self._exports:
+                return self._exports[file_format]
+            self._ensure_complete()
+            target = path or os.path.join(self.directory, "export" + EXPORT_FORMATS[file_format][0])
+            if file_format == "parquet":
+                writer = pq.ParquetWriter(target, self.schema)
+            elif file_format == "csv":
+                writer = pa_csv.CSVWriter(target, self.schema)
+            else:
+                writer = pa.ipc.new_file(target, self.schema)
+            with writer:
+                for batch in self.iter_batches():
+                    writer.write_batch(batch)
+            if path is None:
+                self._exports[file_format] = target
+            return target
+
+    def close(self):
+        """Closes the connection of an unfinished fetch and removes the spool directory."""
+        with self._lock:
+            self._cursor = self._deadline = None
+            self.complete = True
+            self._segments, self._exports = [], {}
+            self._finalizer()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            spooled = sum(os.path.getsize(p) for p, _ in self._segments if os.path.exists(p))
+            return {"rows_fetched": self.rows_fetched, "complete": self.complete, "segments": len(self._segments),
+                    "spooled_bytes": spooled, "fetch_ms": self.fetch_ms}
+
+    def __repr__(self) -> str:
+        return f"ArrowResult({self.sql!r}, rows_fetched={self.rows_fetched}, complete={self.complete})"
@@ -0,0 +1,108 @@
+# vanna_lgx/utils/retrieval.py
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from vanna_lgx.config import RETRIEVAL_MAX_WORKERS
+from vanna_lgx.utils.cancellation import at_cancel
+from vanna_lgx.utils.instrumentation import record_call
+
+# Shared pool for vector store queries. Chroma releases the GIL while searching,
+# so collection queries issued from here genuinely overlap.
+RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval")
+
+# Run id (see start_turn) -> the futures of the run's prefetch; concurrent runs may ask the same question
+_prefetches: Dict[str, Dict[Tuple[str, ...], Future]] = {}
+_prefetches_lock = threading.Lock()
+
+
+def _timed_query(label: str, collection, query_embedding: List[float], n_results: int) -> Dict[str, Tuple[Dict, float]]:
+    start = time.perf_counter()
+    results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
+    return {label: (results, (time.perf_counter() - start) * 1000)}
+
+
+def _timed_batch(store, query_embedding: List[float], requests: Dict[str, Tuple[object, int]]) -> Dict[str, Tuple[Dict, float]]:
+    start = time.perf_counter()
+    results = store.query_many(query_embedding, requests)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {label: (result, elapsed_ms) for label, result in results.items()}
+
+
+def _submit(query_embedding: List[float], requests: Dict[str, Tuple[object, int]]) -> Dict[Tuple[str, ...], Future]:
+    """
+    Collections of a store with batched queries (the NumPy index) are searched in a single task;
+    the others get one task per collection. Each future resolves to {label: (results, ms)}.
+    """
+    futures, batches = {}, {}
+    for label, (collection, n_results) in requests.items():
+        store = getattr(collection, "vector_store", None)
+        if store is not None and store.batched_queries:
+            batches.setdefault(id(store), (store, {}))[1][label] = (collection, n_results)
+        else:
+            futures[(label,)] = RETRIEVAL_POOL.submit(_timed_query, label, collection, query_embedding, n_results)
+    for store, batch in batches.values():
+        futures[tuple(batch)] = RETRIEVAL_POOL.submit(_timed_batch, store, query_embedding, batch)
+    return futures
+
+
+def _collect(futures: Dict[Tuple[str, ...], Future]) -> Tuple[Dict[str, Dict], Dict[str, float]]:
+    results, timings = {}, {}
+    for future in futures.values():
+        for label, (result, elapsed_ms) in future.result().items():
+            results[label], timings[label] = result, elapsed_ms
+            record_call("vector_store", label, elapsed_ms)  # Attributed to the node consuming the results
+    return results, timings
+
+
+def query_collections(query_embedding: List[float], requests: Dict[str, Tuple[object, int]]) -> Tuple[Dict[str, Dict], Dict[str, float]]:
+    """
+    Runs one query per collection concurrently with the same embedding (one batched query for
+    the collections of the NumPy index). `requests` maps a label to (collection, n_results).
+    Returns the raw results and the per-collection latency in milliseconds, plus a 'total'
+    entry for the whole stage.
+    """
+    start = time.perf_counter()
+    results, timings = _collect(_submit(query_embedding, requests))
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return results, timings
+
+
+def start_prefetch(run_id: str, query_embedding: List[float], requests: Dict[str, Tuple[object, int]]):
+    """
+    Starts the collection queries in the background so they overlap with whatever the
+    caller does next. A later node of the same run picks the results up with
+    `take_prefetch(run_id)`. If the run is cancelled or fails first, the prefetch is discarded.
+    """
+    futures = _submit(query_embedding, requests)
+    with _prefetches_lock:
+        _prefetches[run_id] = futures
+    at_cancel(lambda: discard_prefetch(run_id))
+
+
+def take_prefetch(run_id: str) -> Optional[Tuple[Dict[str, Dict], Dict[str, float]]]:
+    """Returns (and forgets) the results and per-collection timings of a prefetch, or None if there is none."""
+    with _prefetches_lock:
+        futures = _prefetches.pop(run_id, None)
+    return _collect(futures) if futures is not None else None
+
+
+def discard_prefetch(run_id: str):
+    """Forgets a prefetch whose results are no longer needed (e.g. after an answer cache hit)."""
+    with _prefetches_lock:
+        futures = _prefetches.pop(run_id, None)
+    for future in (futures or {}).values():
+        future.cancel()
+
+
+def documents(results: Dict) -> List[str]:
+    """Extracts the documents of the first (and only) query embedding from a Chroma result."""
+    return (results.get('documents') or [[]])[0]
+
+
+def distances(results: Dict) -> Dict[str, float]:
+    """Maps each document of a Chroma result to its distance from the query (lower is closer)."""
+    docs = documents(results)
+    return dict(zip(docs, (results.get('distances') or [[]])[0]))
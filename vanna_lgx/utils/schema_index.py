@@ -0,0 +1,116 @@
+# vanna_lgx/utils/schema_index.py
+
+import re
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from vanna_lgx.config import COLUMN_SAMPLE_VALUES
+
+# Longest sample value / description kept per column
+MAX_SAMPLE_CHARS = 40
+MAX_NOTE_CHARS = 100
+
+
+def sample_values(conn: sqlite3.Connection, table: str, column: str, limit: int = COLUMN_SAMPLE_VALUES) -> List[str]:
+    """A few distinct, non-null values of a column, as short strings."""
+    rows = conn.execute(
+        f'SELECT DISTINCT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL LIMIT ?;', (limit,)
+    ).fetchall()
+    return [str(row[0])[:MAX_SAMPLE_CHARS] for row in rows]
+
+
+def column_document(table: str, column: Dict, description: str, samples: List[str]) -> str:
+    """The text embedded for one column in the 'columns' collection."""
+    lines = [f"Table: {table}", f"Column: {column['name']} ({column['type'] or 'ANY'})"]
+    if description:
+        lines.append(f"Description: {description}")
+    if samples:
+        lines.append(f"Sample values: {', '.join(samples)}")
+    return "\n".join(lines)
+
+
+def column_metadata(table: str, column: Dict, description: str, samples: List[str]) -> Dict:
+    return {
+        "table": table,
+        "column": column["name"],
+        "type": column["type"],
+        "pk": bool(column["pk"]),
+        "description": " ".join(description.split())[:MAX_NOTE_CHARS],
+        "samples": ", ".join(samples[:3]),
+    }
+
+
+def key_columns(table_info: Dict) -> Set[str]:
+    """Primary and foreign key columns, which are kept in every pruned DDL."""
+    keys = {c["name"] for c in table_info["columns"] if c["pk"]}
+    keys |= {fk["column"] for fk in table_info["foreign_keys"]}
+    return keys
+
+
+def render_ddl(table: str, table_info: Dict, keep: Optional[Set[str]] = None,
+               notes: Optional[Dict[str, str]] = None) -> str:
+    """
+    Renders a CREATE TABLE statement from PRAGMA information, limited to the `keep` columns
+    (all columns if None). Omitted columns are counted in a trailing comment, and `notes`
+    (description and sample values) are added as comments next to the kept columns.
+    The result contains no blank lines, so it survives the "\\n\\n" splitting of db_schema.
+    """
+    notes = notes or {}
+    columns = [c for c in table_info["columns"] if keep is None or c["name"] in keep]
+    single_pk = sum(1 for c in table_info["columns"] if c["pk"]) == 1
+    lines = []
+    for column in columns:
+        line = f"    {column['name']} {column['type']}".rstrip()
+        if column["pk"] and single_pk:
+            line += " PRIMARY KEY"
+        elif column["notnull"]:
+            line += " NOT NULL"
+        lines.append((line, notes.get(column["name"])))
+    kept = {c["name"] for c in columns}
+    for fk in table_info["foreign_keys"]:
+        if fk["column"] in kept:
+            lines.append((f"    FOREIGN KEY ({fk['column']}) REFERENCES {fk['ref_table']}({fk['ref_column']})", None))
+
+    body = []
+    for i, (line, note) in enumerate(lines):
+        line += "," if i < len(lines) - 1 else ""
+        body.append(f"{line}  -- {note}" if note else line)
+    omitted = len(table_info["columns"]) - len(columns)
+    if omitted:
+        body.append(f"    -- {omitted} other columns omitted")
+    return f"CREATE TABLE {table} (\n" + "\n".join(body) + "\n);"
+
+
+def _note(metadata: Dict) -> Optional[str]:
+    parts = [(metadata.get("description") or "").rstrip(".")]
+    if metadata.get("samples"):
+        parts.append(f"e.g. {metadata['samples']}")
+    return "; ".join(p for p in parts if p) or None
+
+
+def prune_schema(tables: List[str], ddls: List[str], column_hits: List[Dict], column_info: Dict[str, Dict],
+                 extra_text: str = "") -> Tuple[List[str], Dict[str, Dict]]:
+    """
+    Replaces each retrieved table's DDL by a pruned one holding only its key columns, the
+    columns retrieved from the column index and the columns mentioned in `extra_text`
+    (e.g. the retrieved SQL examples). Tables without any retrieved column, or unknown to
+    `column_info`, keep their full DDL. Returns the DDLs and a per-table report.
+    """
+    hits_by_table: Dict[str, Dict[str, Dict]] = {}
+    for metadata in column_hits:
+        hits_by_table.setdefault(metadata["table"], {})[metadata["column"]] = metadata
+    mentioned = {word.lower() for word in re.findall(r"\w+", extra_text)}
+
+    pruned, report = [], {}
+    for table, ddl in zip(tables, ddls):
+        table_info = column_info.get(table)
+        hits = hits_by_table.get(table, {})
+        if table_info is None or not hits:
+            pruned.append(ddl)
+            continue
+        keep = key_columns(table_info) | set(hits)
+        keep |= {c["name"] for c in table_info["columns"] if c["name"].lower() in mentioned}
+        notes = {name: note for name, metadata in hits.items() if (note := _note(metadata))}
+        pruned.append(render_ddl(table, table_info, keep, notes))
+        report[table] = {"kept_columns": sorted(keep), "total_columns": len(table_info["columns"])}
+    return pruned, report
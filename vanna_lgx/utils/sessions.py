@@ -0,0 +1,233 @@
+# vanna_lgx/utils/sessions.py
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from vanna_lgx.config import (
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_BYTES,
+    SESSION_TTL_SECONDS,
+    SESSION_FOLLOW_UP_MAX_WORDS,
+)
+
+# Openings that only make sense as a continuation of the previous question
+FOLLOW_UP_START = re.compile(
+    r"^\s*(?:and|but|now|then|also|instead|what about|how about|same|only|just|except|excluding|without"
+    r"|break (?:it|that|this|them) down|drill down|narrow|filter|sort|order|group|limit|show only)\b",
+    re.IGNORECASE,
+)
+# References to the previous answer
+FOLLOW_UP_REFERENCE = re.compile(
+    r"\b(?:those|these|them|that list|the same|same ones|previous|above (?:result|list|query)|that query|this query)\b",
+    re.IGNORECASE,
+)
+# Openings that continue the previous question only in short questions ("for London?", "in the last week")
+FOLLOW_UP_SHORT_START = re.compile(r"^\s*(?:for|in|with|by|per|from|where|which of|what of)\b", re.IGNORECASE)
+
+
+def is_follow_up(question: str, max_words: int = SESSION_FOLLOW_UP_MAX_WORDS) -> bool:
+    """True when the question refines the previous one ("now only for London", "sort those by power")."""
+    if FOLLOW_UP_START.search(question) or FOLLOW_UP_REFERENCE.search(question):
+        return True
+    return len(question.split()) <= max_words and bool(FOLLOW_UP_SHORT_START.search(question))
+
+
+def approximate_bytes(value: Any) -> int:
+    """A rough, recursive memory estimate of a state value; DataFrames are measured deeply."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_bytes(k) + approximate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(approximate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SessionCheckpointer(BaseCheckpointSaver):
+    """
+    An in-memory LangGraph checkpointer for conversation sessions (one thread_id per session).
+
+    Unlike InMemorySaver it keeps only the latest checkpoint of each thread and holds the channel
+    values by reference, so DataFrames and result handles are neither serialized nor copied at
+    every step. Sessions idle for longer than `ttl_seconds` expire, and the least recently used
+    ones are evicted beyond `max_sessions` or `max_bytes` (estimated per channel value, and only
+    re-measured when a value changes).
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, max_bytes: int = SESSION_MAX_BYTES,
+                 ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+        # (thread_id, checkpoint_ns) -> {checkpoint, metadata, parent_id, writes, sizes, bytes, touched_at}
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(config: Dict) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _drop(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["bytes"]
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["touched_at"] <= self.ttl_seconds:
+                break
+            self._drop(key)
+            self.expirations += 1
+
+    def _evict(self, keep: Tuple[str, str]):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_sessions or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._drop(key)
+            self.evictions += 1
+
+    def get_tuple(self, config: Dict) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            checkpoint = entry["checkpoint"]
+            requested_id = get_checkpoint_id(config)
+            if requested_id and requested_id != checkpoint["id"]:
+                return None  # Only the latest checkpoint of a session is kept
+            entry["touched_at"] = time.monotonic()
+            self._entries.move_to_end(key)
+            thread_id, checkpoint_ns = key
+            parent_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                              "checkpoint_id": entry["parent_id"]}} if entry["parent_id"] else None
+            return CheckpointTuple(
+                config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                         "checkpoint_id": checkpoint["id"]}},
+                checkpoint={**checkpoint, "channel_values": dict(checkpoint["channel_values"])},
+                metadata=entry["metadata"],
+                parent_config=parent_config,
+                pending_writes=[(task_id, channel, value) for task_id, channel, value in entry["writes"].values()],
+            )
+
+    def list(self, config: Optional[Dict], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[Dict] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            keys = list(self._entries)
+        thread_id = config["configurable"]["thread_id"] if config else None
+        for key in keys:
+            if thread_id is not None and key[0] != thread_id:
+                continue
+            found = self.get_tuple({"configurable": {"thread_id": key[0], "checkpoint_ns": key[1]}})
+            if found is None or (filter and any(found.metadata.get(k) != v for k, v in filter.items())):
+                continue
+            yield found
+            if limit is not None:
+                limit -= 1
+                if limit <= 0:
+                    return
+
+    def put(self, config: Dict, checkpoint: Dict, metadata: Dict, new_versions: Dict) -> Dict:
+        key = self._key(config)
+        with self._lock:
+            self._expire()
+            previous = self._entries.get(key)
+            values = {}
+            if previous is not None:
+                values = {k: v for k, v in previous["checkpoint"]["channel_values"].items()
+                          if k in checkpoint["channel_versions"]}
+            values.update(checkpoint["channel_values"])
+            for channel in new_versions:
+                if channel not in checkpoint["channel_values"]:
+                    values.pop(channel, None)
+
+            sizes = {}
+            for channel, value in values.items():
+                known = previous["sizes"].get(channel) if previous is not None else None
+                sizes[channel] = known if known is not None and known[0] is value else (value, approximate_bytes(value))
+            size = sum(measured for _, measured in sizes.values())
+
+            self._drop(key)
+            self._entries[key] = {
+                "checkpoint": {**checkpoint, "channel_values": values,
+                               "channel_versions": dict(checkpoint["channel_versions"]),
+                               "versions_seen": {k: dict(v) for k, v in checkpoint["versions_seen"].items()}},
+                "metadata": get_checkpoint_metadata(config, metadata),
+                "parent_id": config["configurable"].get("checkpoint_id"),
+                "writes": {},
+                "sizes": sizes,
+                "bytes": size,
+                "touched_at": time.monotonic(),
+            }
+            self._bytes += size
+            self._evict(keep=key)
+        return {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: Dict, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        key = self._key(config)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["checkpoint"]["id"] != config["configurable"].get("checkpoint_id"):
+                return
+            for index, (channel, value) in enumerate(writes):
+                write_key = (task_id, WRITES_IDX_MAP.get(channel, index))
+                if write_key[1] >= 0 and write_key in entry["writes"]:
+                    continue
+                entry["writes"][write_key] = (task_id, channel, value)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == thread_id]:
+                self._drop(key)
+
+    async def aget_tuple(self, config: Dict) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[Dict], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[Dict] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for found in self.list(config, filter=filter, before=before, limit=limit):
+            yield found
+
+    async def aput(self, config: Dict, checkpoint: Dict, metadata: Dict, new_versions: Dict) -> Dict:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: Dict, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire()
+            return {"sessions": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions, "expirations": self.expirations}
+
+
+def session_config(session_id: str) -> Dict:
+    """The graph config that runs a question as the next turn of `session_id`."""
+    return {"configurable": {"thread_id": session_id}}
@@ -0,0 +1,346 @@
+# vanna_lgx/utils/sql_templates.py
+
+import json
+import os
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+from vanna_lgx.config import (
+    DB_PATH,
+    KNOWLEDGE_BASE_PATH,
+    SQL_TEMPLATE_PATH,
+    SQL_TEMPLATE_MATCH_THRESHOLD,
+    SQL_TEMPLATE_MAX_SLOT_VALUES,
+    SQL_TEMPLATE_MAX_LEARNED,
+)
+from vanna_lgx.utils.db_utils import get_pool
+from vanna_lgx.utils.result_cache import SQL_TOKEN
+
+EXAMPLES_PATH = os.path.join(KNOWLEDGE_BASE_PATH, "sql_examples", "examples.json")
+
+# The column a literal is compared to: "olt_region = 'London'", "t.olt_name LIKE 'OLT-%'"
+COMPARED_COLUMN = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)[\"`\]]?\s*(?:==?|!=|<>|<=|>=|<|>|\bLIKE\b)\s*$", re.IGNORECASE)
+# A date modifier such as date('now', '-30 days') and the day count it is phrased with
+DAY_MODIFIER = re.compile(r"'([+-])(\d+) days?'", re.IGNORECASE)
+DAY_WINDOW = re.compile(r"(?<![\w.])(\d+)(?=\s+days?\b)", re.IGNORECASE)
+NUMBER = re.compile(r"(?<![\w.-])\d+(?![\w.])")
+QUOTED = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+# Words that change what a query computes or filters: a question and its template must use the same ones
+QUERY_OPERATORS = {
+    "not", "no", "without", "except", "excluding", "never", "other", "only", "and", "or",
+    "more", "less", "fewer", "above", "below", "over", "under", "before", "after", "between", "since", "until",
+    "top", "bottom", "most", "least", "highest", "lowest", "first", "last", "latest", "oldest", "newest",
+    "count", "number", "total", "sum", "average", "avg", "mean", "max", "maximum", "min", "minimum",
+    "distinct", "unique", "each", "per", "by", "group", "ascending", "descending",
+}
+# Words that neither filter nor compute anything; every other word of a question must be in its template's question
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "has", "have", "had",
+    "what", "which", "who", "whose", "how", "many", "much", "show", "list", "give", "get", "find", "return",
+    "display", "tell", "me", "us", "i", "we", "you", "can", "please", "there", "it", "its", "their",
+    "this", "that", "these", "those", "of", "for", "to", "in", "on", "at", "with", "from", "all",
+}
+
+
+def _literal_pattern(value: str) -> re.Pattern:
+    return re.compile(r"(?<![\w-])" + re.escape(value) + r"(?![\w-])", re.IGNORECASE)
+
+
+def value_shape(value: str) -> Optional[str]:
+    """
+    A regex for values shaped like `value`: "OLT-CityA-123" gives OLT-[A-Za-z]+-\\d+ (upper-case
+    words are kept, other letters and digits generalized). None for plain words, which only a
+    list of known values can recognize.
+    """
+    runs = re.findall(r"[A-Za-z]+|\d+|[^A-Za-z\d]+", value)
+    if len(runs) < 2 or not any(not run.isalpha() for run in runs):
+        return None
+    parts = []
+    for run in runs:
+        if run.isalpha():
+            parts.append(re.escape(run) if run.isupper() and len(run) > 1 else "[A-Za-z]+")
+        elif run.isdigit():
+            parts.append(r"\d+")
+        else:
+            parts.append(re.escape(run))
+    return "".join(parts)
+
+
+def slot_type(slot: Dict) -> str:
+    """The placeholder a slot leaves in the question skeleton: its column, 'days' or 'number'."""
+    return slot["column"] if slot["kind"] == "value" else slot["kind"]
+
+
+def skeleton(question: str, spans: List[Tuple[int, int, str]]) -> List[str]:
+    """The question's words with each (start, end, type) span replaced by a <type> placeholder."""
+    text, position = "", 0
+    for start, end, label in sorted(spans):
+        text += question[position:start] + f" <{label}> "
+        position = end
+    text += question[position:]
+    return re.findall(r"<[^>]+>|[a-z0-9]+", text.lower())
+
+
+def extract_template(question: str, sql: str, source: str, schema_info: Dict[str, Set[str]]) -> Dict:
+    """
+    Turns a (question, SQL) pair into a template. Every SQL literal that also appears in the
+    question becomes a typed slot: a string compared to a known column ("value", typed by the
+    column), a day window of a date modifier ("days") or an integer ("number"). Literals the
+    question does not mention stay fixed in the SQL.
+    """
+    columns = {column.lower() for table_columns in schema_info.values() for column in table_columns}
+    slots, spans, sql_parts, used, position = [], [], [], set(), 0
+
+    def claim(pattern: re.Pattern, accept=lambda m: True) -> Optional[Tuple[int, int]]:
+        for match in pattern.finditer(question):
+            span = match.span(1) if pattern.groups else match.span()
+            if span not in used and accept(match):
+                used.add(span)
+                return span
+        return None
+
+    for token in SQL_TOKEN.finditer(sql):
+        kind, text = token.lastgroup, token.group()
+        slot, span = None, None
+        if kind == "string" and (day := DAY_MODIFIER.fullmatch(text)):
+            if span := claim(DAY_WINDOW, lambda m: int(m.group(1)) == int(day.group(2))):
+                slot = {"kind": "days", "sign": day.group(1)}
+        elif kind == "string":
+            value = text[1:-1].replace("''", "'")
+            compared = COMPARED_COLUMN.search(sql[:token.start()])
+            if value.strip() and compared and compared.group(1).lower() in columns:
+                if span := claim(_literal_pattern(value)):
+                    start, end = span
+                    quoted = question[start - 1:start] in ("'", '"') and question[end:end + 1] == question[start - 1:start]
+                    slot = {"kind": "value", "column": compared.group(1).lower(), "quoted": quoted,
+                            "shape": value_shape(value)}
+        elif kind == "number" and text.isdigit():
+            if span := claim(NUMBER, lambda m: int(m.group()) == int(text)):
+                slot = {"kind": "number"}
+        if slot is None:
+            continue
+        start, end = span
+        spans.append((start, end, slot_type(slot)))
+        slot["position"] = start
+        sql_parts.append(sql[position:token.start()])
+        sql_parts.append(len(slots))
+        slots.append(slot)
+        position = token.end()
+    sql_parts.append(sql[position:])
+
+    return {"question": question, "sql": sql, "source": source, "skeleton": skeleton(question, spans),
+            "sql_parts": sql_parts, "slots": slots}
+
+
+def render_slot(slot: Dict, value) -> str:
+    if slot["kind"] == "days":
+        return f"'{slot['sign']}{int(value)} days'"
+    if slot["kind"] == "number":
+        return str(int(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def fill_template(template: Dict, values: List) -> str:
+    return "".join(part if isinstance(part, str) else render_slot(template["slots"][part], values[part])
+                   for part in template["sql_parts"])
+
+
+class TemplateLibrary:
+    """
+    Parameterized SQL templates built from the verified SQL examples and from successfully executed
+    answers (persisted at `path`). A question is matched against each template by finding values for
+    its slots (the column's known values, quoted strings or strings shaped like the example value,
+    "N days", integers) and comparing the remaining words with the template question's. Questions
+    naming a value or number no slot accounts for, having a word the template question lacks (other
+    than stop words: "offline", "London"...) or using other operator words ("not", "top",
+    "average"...), never match, so a filter or aggregate is never silently dropped or changed.
+
+    Known values are read with SELECT DISTINCT for the slot columns having at most
+    `max_slot_values` of them, and re-read when the database file changes.
+    """
+
+    def __init__(self, schema_info: Dict[str, Set[str]], path: str = SQL_TEMPLATE_PATH,
+                 examples_path: str = EXAMPLES_PATH, threshold: float = SQL_TEMPLATE_MATCH_THRESHOLD,
+                 max_slot_values: int = SQL_TEMPLATE_MAX_SLOT_VALUES, max_learned: int = SQL_TEMPLATE_MAX_LEARNED,
+                 db_path: str = DB_PATH):
+        self.schema_info = schema_info
+        self.path = path
+        self.threshold = threshold
+        self.max_slot_values = max_slot_values
+        self.max_learned = max_learned
+        self.db_path = db_path
+        self.matches = 0
+        self.misses = 0
+        self._values: Dict[str, Optional[Dict[str, str]]] = {}  # column -> {lower-cased value: value}, None if too many
+        self._values_version = None
+        self._lock = threading.RLock()
+        self.templates = [extract_template(e["question"], e["sql"], "example", schema_info)
+                          for e in self._read(examples_path) if e.get("question") and e.get("sql")]
+        self.templates = [t for t in self.templates if t["slots"]]
+        self.learned = [t for t in self._read(path) if t.get("slots")]
+
+    @staticmethod
+    def _read(path: str) -> List[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.learned, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def known_values(self, column: str) -> Optional[Dict[str, str]]:
+        """The distinct values of `column` across tables, or None when there are too many to list."""
+        try:
+            stat = os.stat(self.db_path)
+            version = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            version = None
+        with self._lock:
+            if version != self._values_version:
+                self._values, self._values_version = {}, version
+            if column in self._values:
+                return self._values[column]
+            values = {}
+            with get_pool().connection() as conn:
+                for table, table_columns in self.schema_info.items():
+                    name = next((c for c in table_columns if c.lower() == column), None)
+                    if name is None:
+                        continue
+                    rows = conn.execute(f'SELECT DISTINCT "{name}" FROM "{table}" WHERE typeof("{name}") = \'text\' '
+                                        f'LIMIT {self.max_slot_values + 1};').fetchall()
+                    values.update((row[0].lower(), row[0]) for row in rows)
+            self._values[column] = values if len(values) <= self.max_slot_values else None
+            return self._values[column]
+
+    def question_values(self, question: str) -> List[str]:
+        """
+        The values a question names, sorted: its numbers, quoted strings and the known values of every
+        column that has few enough of them. Two questions naming different values ("London" and "Leeds",
+        "7 days" and "30 days", "online" and "offline") have different answers however alike they read.
+        """
+        values = {str(int(m.group())) for m in NUMBER.finditer(question)}
+        values |= {m.group(m.lastindex) for m in QUOTED.finditer(question)}
+        lowered = question.lower()
+        columns = {column.lower() for table_columns in self.schema_info.values() for column in table_columns}
+        for column in sorted(columns):
+            for value, canonical in (self.known_values(column) or {}).items():
+                if value in lowered and _literal_pattern(value).search(question):
+                    values.add(canonical)
+        return sorted(values)
+
+    def _candidates(self, question: str, slot: Dict) -> List[Tuple[int, int, str]]:
+        if slot["kind"] == "days":
+            return [(m.start(1), m.end(1), m.group(1)) for m in DAY_WINDOW.finditer(question)]
+        if slot["kind"] == "number":
+            return [(m.start(), m.end(), m.group()) for m in NUMBER.finditer(question)]
+        known = self.known_values(slot["column"])
+        found = []
+        if known:
+            for value in sorted(known, key=len, reverse=True):
+                found += [(m.start(), m.end(), known[value]) for m in _literal_pattern(value).finditer(question)]
+        if slot["quoted"]:
+            found += [(m.start(m.lastindex), m.end(m.lastindex), m.group(m.lastindex)) for m in QUOTED.finditer(question)]
+        if slot["shape"]:
+            found += [(m.start(), m.end(), m.group()) for m in re.finditer(
+                r"(?<![\w-])" + slot["shape"] + r"(?![\w-])", question, re.IGNORECASE)]
+        return found
+
+    def _unexplained(self, question: str, spans: List[Tuple[int, int]], columns: Set[str]) -> bool:
+        """True when the question names a known value, a quoted string or a number outside the slot spans."""
+        def outside(start: int, end: int) -> bool:
+            return not any(s <= start and end <= e for s, e in spans)
+        if any(outside(*m.span()) for m in NUMBER.finditer(question)):
+            return True
+        if any(outside(*m.span(m.lastindex)) for m in QUOTED.finditer(question)):
+            return True
+        for column in columns:
+            for value in self.known_values(column) or {}:
+                if any(outside(*m.span()) for m in _literal_pattern(value).finditer(question)):
+                    return True
+        return False
+
+    def _match_one(self, template: Dict, question: str, columns: Set[str]) -> Optional[Dict]:
+        slots = template["slots"]
+        claimed: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        for slot in slots:
+            label = slot_type(slot)
+            for start, end, value in self._candidates(question, slot):
+                previous = claimed.get((start, end))
+                if previous is not None and previous[0] != label:
+                    return None  # The same words would fill two different slot types
+                claimed.setdefault((start, end), (label, value))  # Known values (canonical spelling) come first
+        # Longest candidates first; a candidate inside a longer one is not a separate value
+        chosen = []
+        for (start, end), (label, value) in sorted(claimed.items(), key=lambda item: item[0][0] - item[0][1]):
+            if not any(s < end and start < e for s, e, _, _ in chosen):
+                chosen.append((start, end, label, value))
+        chosen.sort()
+
+        values: List = [None] * len(slots)
+        for label in {slot_type(slot) for slot in slots}:
+            indices = sorted((i for i, s in enumerate(slots) if slot_type(s) == label), key=lambda i: slots[i]["position"])
+            found = [value for _, _, found_label, value in chosen if found_label == label]
+            if len(found) != len(indices):
+                return None
+            for i, value in zip(indices, found):
+                values[i] = value
+        if self._unexplained(question, [(s, e) for s, e, _, _ in chosen], columns):
+            return None
+
+        words = skeleton(question, [(s, e, label) for s, e, label, _ in chosen])
+        if any(w not in STOP_WORDS and w not in template["skeleton"] for w in words):
+            return None  # A word no slot accounts for, such as an extra filter the SQL would not apply
+        if sorted(w for w in words if w in QUERY_OPERATORS) != sorted(w for w in template["skeleton"] if w in QUERY_OPERATORS):
+            return None
+        similarity = SequenceMatcher(None, template["skeleton"], words, autojunk=False).ratio()
+        return {"sql": fill_template(template, values), "similarity": round(similarity, 4),
+                "source": template["source"], "template_question": template["question"],
+                "slots": [{"type": slot_type(slot), "value": value} for slot, value in zip(slots, values)]}
+
+    def match(self, question: str) -> Optional[Dict]:
+        """The best template match at or above the threshold: {sql, similarity, source, template_question, slots}."""
+        with self._lock:
+            templates = self.templates + self.learned
+        columns = {slot["column"] for t in templates for slot in t["slots"] if slot["kind"] == "value"}
+        best = None
+        for template in templates:
+            found = self._match_one(template, question, columns)
+            if found is not None and (best is None or found["similarity"] > best["similarity"]):
+                best = found
+        with self._lock:
+            if best is not None and best["similarity"] >= self.threshold:
+                self.matches += 1
+                return best
+            self.misses += 1
+        return None
+
+    def learn(self, question: str, sql: str) -> Optional[Dict]:
+        """
+        Adds a template for an answered question, unless it has no slot or an existing template
+        already has the same skeleton and slot types. Learned templates are saved to `path`.
+        """
+        template = extract_template(question, sql, "answer", self.schema_info)
+        if not template["slots"]:
+            return None
+        signature = (template["skeleton"], [slot_type(s) for s in template["slots"]])
+        with self._lock:
+            if any((t["skeleton"], [slot_type(s) for s in t["slots"]]) == signature
+                   for t in self.templates + self.learned):
+                return None
+            self.learned = (self.learned + [template])[-self.max_learned:]
+            self._save()
+        return template
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"matches": self.matches, "misses": self.misses,
+                    "templates": len(self.templates), "learned": len(self.learned)}
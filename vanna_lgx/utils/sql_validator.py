@@ -0,0 +1,249 @@
+# vanna_lgx/utils/sql_validator.py
+
+import difflib
+import re
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from vanna_lgx.utils.instrumentation import timed_call
+
+# Issue kinds reported to the repair loop
+SYNTAX_ERROR = "syntax_error"
+NOT_READ_ONLY = "not_read_only"
+MULTIPLE_STATEMENTS = "multiple_statements"
+UNKNOWN_TABLE = "unknown_table"
+UNKNOWN_ALIAS = "unknown_alias"
+UNKNOWN_COLUMN = "unknown_column"
+UNKNOWN_FUNCTION = "unknown_function"
+WRONG_ARGUMENTS = "wrong_arguments"
+COMPILE_ERROR = "compile_error"
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<qident>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<param>[?:@$][A-Za-z0-9_]*)
+  | (?P<op>\|\||<>|<=|>=|==|!=|<<|>>|.)
+""", re.VERBOSE | re.DOTALL)
+
+# Words that can follow a table reference and therefore are never its alias
+CLAUSE_KEYWORDS = {
+    "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "NATURAL", "FULL", "ON", "USING",
+    "GROUP", "ORDER", "LIMIT", "OFFSET", "HAVING", "UNION", "EXCEPT", "INTERSECT", "WINDOW",
+    "AS", "INDEXED", "NOT", "RETURNING", "SELECT", "FROM", "VALUES", "WITH",
+}
+READ_ONLY_STARTS = {"SELECT", "WITH", "VALUES"}
+SCHEMA_NAMES = {"MAIN", "TEMP"}
+
+SQLITE_FUNCTIONS = [
+    "abs", "avg", "coalesce", "count", "date", "datetime", "group_concat", "ifnull", "iif", "instr",
+    "julianday", "length", "lower", "ltrim", "max", "min", "nullif", "printf", "replace", "round",
+    "rtrim", "strftime", "substr", "sum", "time", "total", "trim", "typeof", "unixepoch", "upper",
+    "row_number", "rank", "dense_rank", "lag", "lead", "first_value", "last_value", "ntile",
+    "cast", "like", "glob", "random", "hex", "quote", "char", "unicode", "json_extract",
+]
+
+
+def tokenize(sql: str) -> List[Tuple[str, str]]:
+    """Splits SQL into (kind, value) tokens, dropping whitespace and comments and unquoting identifiers."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(sql):
+        kind, value = match.lastgroup, match.group()
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "qident":
+            value, kind = value[1:-1], "ident"
+        tokens.append((kind, value))
+    return tokens
+
+
+def _is_word(token: Tuple[str, str]) -> bool:
+    return token[0] == "ident"
+
+
+def _issue(kind: str, message: str, reference: str = "", suggestions: Optional[List[str]] = None) -> Dict:
+    return {"kind": kind, "message": message, "reference": reference, "suggestions": suggestions or []}
+
+
+def _suggest(name: str, candidates) -> List[str]:
+    lowered = {c.lower(): c for c in candidates}
+    return [lowered[m] for m in difflib.get_close_matches(name.lower(), list(lowered), n=3, cutoff=0.6)]
+
+
+def _cte_names(tokens: List[Tuple[str, str]]) -> Set[str]:
+    """Names defined by `WITH name [(cols)] AS (` clauses, compared case-insensitively."""
+    names = set()
+    for i, (kind, value) in enumerate(tokens):
+        if kind != "ident" or value.upper() != "AS" or i + 1 >= len(tokens) or tokens[i + 1][1] != "(":
+            continue
+        j = i - 1
+        if j >= 0 and tokens[j][1] == ")":  # optional column list
+            depth = 0
+            while j >= 0:
+                depth += tokens[j][1] == ")"
+                depth -= tokens[j][1] == "("
+                if depth == 0:
+                    break
+                j -= 1
+            j -= 1
+        if j >= 1 and _is_word(tokens[j]) and (tokens[j - 1][1] in (",",) or tokens[j - 1][1].upper() in ("WITH", "RECURSIVE")):
+            names.add(tokens[j][1].lower())
+    return names
+
+
+def _read_alias(tokens: List[Tuple[str, str]], i: int) -> Tuple[Optional[str], int]:
+    """Reads an optional `[AS] alias` starting at index i."""
+    if i < len(tokens) and tokens[i][1].upper() == "AS":
+        i += 1
+        if i < len(tokens) and _is_word(tokens[i]):
+            return tokens[i][1], i + 1
+        return None, i
+    if i < len(tokens) and _is_word(tokens[i]) and tokens[i][1].upper() not in CLAUSE_KEYWORDS:
+        return tokens[i][1], i + 1
+    return None, i
+
+
+def table_references(tokens: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, Optional[str]]], Set[str]]:
+    """
+    Finds `FROM` / `JOIN` table references as (table, alias) pairs, and the aliases given to
+    derived tables (`(SELECT ...) AS alias`), whose columns cannot be checked statically.
+    """
+    refs, derived = [], set()
+    for i, (kind, value) in enumerate(tokens):
+        if kind == "ident" and value.upper() in ("FROM", "JOIN"):
+            j = i + 1
+            while j < len(tokens) and _is_word(tokens[j]):
+                name = tokens[j][1]
+                j += 1
+                if j + 1 < len(tokens) and tokens[j][1] == "." and name.upper() in SCHEMA_NAMES:
+                    name, j = tokens[j + 1][1], j + 2
+                if j < len(tokens) and tokens[j][1] == "(":  # table-valued function, e.g. json_each(...)
+                    break
+                alias, j = _read_alias(tokens, j)
+                refs.append((name, alias))
+                if value.upper() == "FROM" and j < len(tokens) and tokens[j][1] == ",":
+                    j += 1
+                    continue
+                break
+        elif value == ")":
+            alias, _ = _read_alias(tokens, i + 1)
+            if alias:
+                derived.add(alias.lower())
+    return refs, derived
+
+
+def static_issues(sql: str, schema_info: Dict[str, Set[str]]) -> List[Dict]:
+    """Resolves table, alias and qualified column references against the schema."""
+    tokens = tokenize(sql)
+    if not tokens:
+        return [_issue(SYNTAX_ERROR, "The SQL query is empty.")]
+
+    issues = []
+    if tokens[0][1].upper() not in READ_ONLY_STARTS:
+        issues.append(_issue(NOT_READ_ONLY, f"Only read-only SELECT queries are allowed, got '{tokens[0][1].upper()}'.",
+                             tokens[0][1]))
+    statements = [t for t in tokens if t[1] == ";"]
+    if statements and any(t[1] != ";" for t in tokens[tokens.index(statements[0]):]):
+        issues.append(_issue(MULTIPLE_STATEMENTS, "Only a single SQL statement is allowed."))
+
+    tables = {name.lower(): name for name in schema_info}
+    columns = {name.lower(): {c.lower() for c in cols} for name, cols in schema_info.items()}
+    ctes = _cte_names(tokens)
+    refs, derived = table_references(tokens)
+
+    aliases = {}
+    for name, alias in refs:
+        if name.lower() not in tables and name.lower() not in ctes:
+            issues.append(_issue(UNKNOWN_TABLE, f"Table '{name}' does not exist.", name, _suggest(name, schema_info)))
+        aliases[name.lower()] = name.lower()
+        if alias:
+            aliases[alias.lower()] = name.lower()
+
+    for i in range(len(tokens) - 2):
+        if not (_is_word(tokens[i]) and tokens[i + 1][1] == "." and (_is_word(tokens[i + 2]) or tokens[i + 2][1] == "*")):
+            continue
+        qualifier, column = tokens[i][1], tokens[i + 2][1]
+        if qualifier.upper() in SCHEMA_NAMES or (i > 0 and tokens[i - 1][1] == "."):
+            continue
+        if qualifier.lower() in derived or qualifier.lower() in ctes:
+            continue
+        table = aliases.get(qualifier.lower())
+        if table is None:
+            issues.append(_issue(UNKNOWN_ALIAS, f"'{qualifier}' is not a table or alias used in the FROM clause.",
+                                 qualifier, _suggest(qualifier, aliases)))
+            continue
+        if column != "*" and table in columns and column.lower() not in columns[table]:
+            issues.append(_issue(UNKNOWN_COLUMN, f"Column '{column}' does not exist in table '{tables[table]}'.",
+                                 f"{qualifier}.{column}", _suggest(column, schema_info[tables[table]])))
+    return issues
+
+
+def _issue_from_sqlite_error(message: str, sql: str, schema_info: Dict[str, Set[str]]) -> Dict:
+    """Turns a SQLite compile error message into a structured issue with suggestions."""
+    referenced = [name for name, _ in table_references(tokenize(sql))[0]]
+    candidate_columns = set()
+    for table in schema_info:
+        if not referenced or table.lower() in {r.lower() for r in referenced}:
+            candidate_columns |= schema_info[table]
+
+    if match := re.search(r"no such table: (?:\w+\.)?(\S+)", message):
+        name = match.group(1)
+        return _issue(UNKNOWN_TABLE, f"Table '{name}' does not exist.", name, _suggest(name, schema_info))
+    if match := re.search(r"no such column: (\S+)", message):
+        name = match.group(1)
+        return _issue(UNKNOWN_COLUMN, f"Column '{name}' does not exist.", name,
+                      _suggest(name.split(".")[-1], candidate_columns))
+    if match := re.search(r"no such function: (\S+)", message):
+        name = match.group(1)
+        return _issue(UNKNOWN_FUNCTION, f"Function '{name}' is not available in SQLite.", name,
+                      _suggest(name, SQLITE_FUNCTIONS))
+    if match := re.search(r"wrong number of arguments to function (\w+)", message):
+        return _issue(WRONG_ARGUMENTS, f"Wrong number of arguments to function '{match.group(1)}'.", match.group(1))
+    if match := re.search(r'near "([^"]*)": syntax error', message):
+        return _issue(SYNTAX_ERROR, f"Syntax error near '{match.group(1)}'.", match.group(1))
+    if "incomplete input" in message:
+        return _issue(SYNTAX_ERROR, "The SQL statement is incomplete.")
+    return _issue(COMPILE_ERROR, f"SQLite rejected the query: {message}.")
+
+
+def compile_issues(sql: str, conn: sqlite3.Connection, schema_info: Dict[str, Set[str]]) -> List[Dict]:
+    """
+    Compiles the statement with EXPLAIN, which prepares it (resolving every table, column
+    and function) without running it. The connection should be read-only.
+    """
+    try:
+        with timed_call("sqlite", "explain"):
+            conn.execute(f"EXPLAIN {sql}")
+        return []
+    except sqlite3.Error as e:
+        return [_issue_from_sqlite_error(str(e), sql, schema_info)]
+
+
+def validate_sql(sql: str, schema_info: Dict[str, Set[str]], conn: Optional[sqlite3.Connection] = None) -> List[Dict]:
+    """
+    Validates a generated query before execution. Returns a list of structured issues
+    ({kind, message, reference, suggestions}); an empty list means the query is valid.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    issues = static_issues(sql, schema_info)
+    if conn is not None and not any(i["kind"] in (NOT_READ_ONLY, MULTIPLE_STATEMENTS) for i in issues):
+        # SQLite reports one error at a time; skip it when it is about a reference already reported.
+        reported = {part.lower() for i in issues for part in i["reference"].split(".") if part}
+        for issue in compile_issues(sql, conn, schema_info):
+            if not reported & {part.lower() for part in issue["reference"].split(".") if part}:
+                issues.append(issue)
+    return issues
+
+
+def format_issues(issues: List[Dict]) -> str:
+    """Formats issues as a bulleted list for the repair prompt."""
+    lines = []
+    for issue in issues:
+        line = f"- [{issue['kind']}] {issue['message']}"
+        if issue["suggestions"]:
+            line += f" Did you mean: {', '.join(issue['suggestions'])}?"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,285 @@
+# vanna_lgx/utils/vector_store.py
+
+import glob
+import json
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from vanna_lgx.config import VECTOR_STORE_BACKEND, CHROMA_PATH, VECTOR_INDEX_PATH
+
+# Results use Chroma's shape (one inner list per query embedding), so callers work with either backend:
+# {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}
+
+
+class VectorStore:
+    """
+    The knowledge collections used by the agent and the refresh scripts. Collections expose the
+    subset of the Chroma collection API the project uses: `name`, `count`, `query`, `get`,
+    `add`, `upsert` and `delete`. Distances are squared L2, Chroma's default.
+    """
+
+    # True when `query_many` is cheap enough to answer all collections in one call on one thread;
+    # otherwise callers query the collections concurrently themselves.
+    batched_queries = False
+
+    def get_collection(self, name: str):
+        raise NotImplementedError
+
+    def get_or_create_collection(self, name: str):
+        raise NotImplementedError
+
+    def delete_collection(self, name: str):
+        raise NotImplementedError
+
+    def list_collections(self) -> List[str]:
+        raise NotImplementedError
+
+    def query_many(self, query_embedding: List[float], requests: Dict[str, Tuple[object, int]]) -> Dict[str, Dict]:
+        """Top-k of one query embedding in several collections: {label: (collection, n_results)} -> {label: results}."""
+        return {
+            label: collection.query(query_embeddings=[query_embedding], n_results=n_results)
+            for label, (collection, n_results) in requests.items()
+        }
+
+
+class ChromaVectorStore(VectorStore):
+    """The Chroma persistent client at `path`. Its collections are returned as they are."""
+
+    def __init__(self, path: str = CHROMA_PATH):
+        import chromadb
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+
+    def get_collection(self, name: str):
+        return self.client.get_collection(name=name)
+
+    def get_or_create_collection(self, name: str):
+        return self.client.get_or_create_collection(name=name)
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name=name)
+
+    def list_collections(self) -> List[str]:
+        return [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+
+
+class NumpyCollection:
+    """
+    A collection stored as a float32 matrix (`<name>.<version>.f32`, memory-mapped read-only) and a
+    JSON sidecar (`<name>.json`) holding the ids, documents, metadatas and the matrix file name.
+
+    Search is exact: squared L2 distances from one matrix-vector product. Writes rewrite the matrix
+    under a new version and then atomically replace the sidecar, so readers (also in other
+    processes) never see a half-written collection; they pick up the new version on their next query.
+    """
+
+    def __init__(self, store: "NumpyVectorStore", name: str):
+        self.vector_store = store
+        self.name = name
+        self.sidecar_path = os.path.join(store.path, f"{name}.json")
+        self._write_lock = threading.Lock()
+        self._loaded_version: Optional[Tuple[int, int]] = None
+        self._data: Optional[Dict] = None
+
+    def _load(self) -> Dict:
+        """The current snapshot of the collection, reloaded when the sidecar changed on disk."""
+        stat = os.stat(self.sidecar_path)
+        version = (stat.st_ino, stat.st_mtime_ns)  # Every write replaces the sidecar, so the inode changes
+        if self._data is not None and version == self._loaded_version:
+            return self._data
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        count, dim = len(sidecar["ids"]), sidecar["dim"]
+        if count:
+            matrix = np.memmap(os.path.join(self.vector_store.path, sidecar["matrix"]), dtype=np.float32,
+                               mode="r", shape=(count, dim))
+        else:
+            matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        sidecar["matrix_data"] = matrix
+        sidecar["sq_norms"] = np.einsum("ij,ij->i", matrix, matrix, dtype=np.float64) if count else np.zeros(0)
+        sidecar["positions"] = {id_: i for i, id_ in enumerate(sidecar["ids"])}
+        self._data, self._loaded_version = sidecar, version
+        return sidecar
+
+    def count(self) -> int:
+        return len(self._load()["ids"])
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, **kwargs) -> Dict:
+        data = self._load()
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not data["ids"]:
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.shape[1] != data["dim"]:
+            raise ValueError(f"Query embeddings have dimension {queries.shape[1]}, collection '{self.name}' has {data['dim']}.")
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, for every query at once
+        products = np.asarray(data["matrix_data"] @ queries.T, dtype=np.float64)
+        all_distances = data["sq_norms"][:, None] - 2 * products + np.einsum("ij,ij->i", queries, queries, dtype=np.float64)[None, :]
+        k = min(n_results, len(data["ids"]))
+        for column in all_distances.T:
+            top = np.argpartition(column, k - 1)[:k] if k < len(column) else np.arange(len(column))
+            top = top[np.argsort(column[top], kind="stable")]
+            results["ids"].append([data["ids"][i] for i in top])
+            results["documents"].append([data["documents"][i] for i in top])
+            results["metadatas"].append([data["metadatas"][i] for i in top])
+            results["distances"].append([max(float(column[i]), 0.0) for i in top])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None, **kwargs) -> Dict:
+        data = self._load()
+        include = include or ["documents", "metadatas"]
+        positions = range(len(data["ids"])) if ids is None else [data["positions"][i] for i in ids if i in data["positions"]]
+        result = {"ids": [data["ids"][i] for i in positions]}
+        for key in ("documents", "metadatas"):
+            result[key] = [data[key][i] for i in positions] if key in include else None
+        result["embeddings"] = np.asarray(data["matrix_data"][list(positions)]) if "embeddings" in include else None
+        return result
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None, **kwargs):
+        self._write(ids, embeddings, documents, metadatas, replace=True)
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict]] = None, **kwargs):
+        """Like Chroma's `add`, ids that already exist are left unchanged."""
+        self._write(ids, embeddings, documents, metadatas, replace=False)
+
+    def delete(self, ids: List[str], **kwargs):
+        with self._write_lock:
+            data = self._load()
+            doomed = set(ids)
+            keep = [i for i, id_ in enumerate(data["ids"]) if id_ not in doomed]
+            self._save([data["ids"][i] for i in keep], np.asarray(data["matrix_data"][keep]),
+                       [data["documents"][i] for i in keep], [data["metadatas"][i] for i in keep], data["dim"])
+
+    def _write(self, ids, embeddings, documents, metadatas, replace: bool):
+        if not ids:
+            return
+        if embeddings is None:
+            raise ValueError(f"Collection '{self.name}' has no embedding function; pass embeddings.")
+        new_vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._write_lock:
+            data = self._load()
+            dim = data["dim"] or new_vectors.shape[1]
+            if new_vectors.shape[1] != dim:
+                raise ValueError(f"Embeddings have dimension {new_vectors.shape[1]}, collection '{self.name}' has {dim}.")
+            all_ids, all_documents, all_metadatas = list(data["ids"]), list(data["documents"]), list(data["metadatas"])
+            matrix = np.array(data["matrix_data"], dtype=np.float32).reshape(len(all_ids), dim)
+            positions, appended = dict(data["positions"]), []
+            for id_, vector, document, metadata in zip(ids, new_vectors, documents, metadatas):
+                if id_ in positions:
+                    if replace:
+                        i = positions[id_]
+                        matrix[i], all_documents[i], all_metadatas[i] = vector, document, metadata
+                    continue
+                positions[id_] = len(all_ids)
+                all_ids.append(id_); all_documents.append(document); all_metadatas.append(metadata)
+                appended.append(vector)
+            if appended:
+                matrix = np.vstack([matrix, np.asarray(appended, dtype=np.float32)])
+            self._save(all_ids, matrix, all_documents, all_metadatas, dim)
+
+    def _save(self, ids, matrix, documents, metadatas, dim):
+        previous = self._load().get("matrix")
+        matrix_name = f"{self.name}.{uuid.uuid4().hex[:12]}.f32" if ids else None
+        if matrix_name:
+            matrix_path = os.path.join(self.vector_store.path, matrix_name)
+            np.ascontiguousarray(matrix, dtype=np.float32).tofile(matrix_path + ".tmp")
+            os.replace(matrix_path + ".tmp", matrix_path)
+        self.vector_store.write_sidecar(self.name, {"name": self.name, "dim": dim, "matrix": matrix_name, "ids": ids,
+                                                    "documents": documents, "metadatas": metadatas})
+        if previous:
+            # Readers that still map the old file keep their mapping after the unlink
+            try:
+                os.remove(os.path.join(self.vector_store.path, previous))
+            except OSError:
+                pass
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process exact search over memory-mapped float32 matrices in `path`, one matrix plus JSON
+    sidecar per collection. Meant for knowledge bases of up to a few thousand vectors, where a
+    brute-force matrix product is faster than any client round trip. No chromadb import needed.
+    """
+
+    batched_queries = True
+
+    def __init__(self, path: str = VECTOR_INDEX_PATH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(self, name)
+            return self._collections[name]
+
+    def write_sidecar(self, name: str, sidecar: Dict):
+        path = os.path.join(self.path, f"{name}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(sidecar, f)
+        os.replace(path + ".tmp", path)
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        if not os.path.exists(os.path.join(self.path, f"{name}.json")):
+            raise ValueError(f"Collection {name} does not exist.")
+        return self._collection(name)
+
+    def get_or_create_collection(self, name: str) -> NumpyCollection:
+        if not os.path.exists(os.path.join(self.path, f"{name}.json")):
+            self.write_sidecar(name, {"name": name, "dim": None, "matrix": None, "ids": [], "documents": [], "metadatas": []})
+        return self._collection(name)
+
+    def delete_collection(self, name: str):
+        collection = self.get_collection(name)
+        matrix = collection._load().get("matrix")
+        os.remove(collection.sidecar_path)
+        if matrix:
+            os.remove(os.path.join(self.path, matrix))
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def list_collections(self) -> List[str]:
+        return sorted(os.path.basename(p)[:-len(".json")] for p in glob.glob(os.path.join(self.path, "*.json")))
+
+
+def open_vector_store(backend: str = VECTOR_STORE_BACKEND, path: Optional[str] = None) -> VectorStore:
+    """Opens the configured backend: "chroma" or "numpy"."""
+    if backend == "chroma":
+        return ChromaVectorStore(path or CHROMA_PATH)
+    if backend == "numpy":
+        return NumpyVectorStore(path or VECTOR_INDEX_PATH)
+    raise ValueError(f"Unknown vector store backend '{backend}' (expected 'chroma' or 'numpy').")
+
+
+def knowledge_files(backend: str = VECTOR_STORE_BACKEND) -> List[str]:
+    """The files that change whenever the knowledge base changes, without opening the store."""
+    if backend == "numpy":
+        return sorted(glob.glob(os.path.join(VECTOR_INDEX_PATH, "*.json")))
+    return [os.path.join(CHROMA_PATH, "chroma.sqlite3")]
+
+
+def copy_collections(source: VectorStore, target: VectorStore, names: List[str], batch_size: int = 500):
+    """Copies collections (ids, embeddings, documents and metadatas) between stores, replacing the target's."""
+    for name in names:
+        try:
+            target.delete_collection(name)
+        except Exception:
+            pass
+        data = source.get_collection(name).get(include=["embeddings", "documents", "metadatas"])
+        collection = target.get_or_create_collection(name)
+        for start in range(0, len(data["ids"]), batch_size):
+            end = start + batch_size
+            collection.upsert(ids=data["ids"][start:end], embeddings=np.asarray(data["embeddings"][start:end]).tolist(),
+                              documents=data["documents"][start:end], metadatas=data["metadatas"][start:end])